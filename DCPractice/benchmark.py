@@ -0,0 +1,190 @@
+import argparse, functools, logging, multiprocessing, os, random, tempfile, time
+import decorators, generators, metrics
+
+def _ns_per_call(func, keys):
+    start = time.perf_counter_ns()
+    for key in keys:
+        func(key)
+    return (time.perf_counter_ns() - start) / len(keys)
+
+def _workloads(calls, seed=0):
+    """
+    Returns: Dict mapping workload name to the list of keys to call with
+    """
+    rng = random.Random(seed)
+    return {
+        "all hits": [rng.randrange(100) for _ in range(calls)],
+        "zipf": [int(rng.paretovariate(1.1)) % 5000 for _ in range(calls)],
+        "all misses": list(range(calls)),
+    }
+
+def bench_cache(calls, max_size=1000):
+    """
+    Per-call time of decorators.cache against functools.lru_cache (and an
+    undecorated call) on a cheap function, so the numbers are cache
+    overhead, for a workload of repeated keys, a skewed one that evicts,
+    and one with no repeats.
+    """
+    def square(x):
+        return x * x
+
+    variants = {
+        "undecorated": lambda: square,
+        "lru_cache": lambda: functools.lru_cache(maxsize=max_size)(square),
+        "cache": lambda: decorators.cache(max_size=max_size)(square),
+        "cache ttl": lambda: decorators.cache(max_size=max_size, ttl=60)(square),
+    }
+    print(f"calls: {calls}, max_size: {max_size}")
+    for workload, keys in _workloads(calls).items():
+        print(f"  {workload}")
+        for name, make in variants.items():
+            func = make()
+            ns = _ns_per_call(func, keys)
+            info = getattr(func, "cache_info", None)
+            hits = f"  {info().hits / calls:>6.1%} hits" if info else ""
+            print(f"    {name:<12} {ns:>8,.0f} ns/call{hits}")
+
+def _slow_summary(n):
+    # stands in for an expensive per-file analysis
+    return {"total": sum(i * i for i in range(20_000)), "n": n}
+
+def bench_persistent_cache(calls):
+    """
+    A cold run of persistent_cache over calls distinct arguments, then a
+    warm restart (a fresh decorator on the same file) repeating them:
+    wall time, hit rate and mean lookup latency of each.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.sqlite")
+        print(f"calls: {calls}")
+        for run in ("cold", "warm"):
+            func = decorators.persistent_cache(path)(_slow_summary)
+            start = time.perf_counter()
+            for n in range(calls):
+                func(n)
+            seconds = time.perf_counter() - start
+            info = func.cache_info()
+            print(f"  {run}  {seconds:>7.3f}s  {info.hit_rate:>6.1%} hits  {info.lookup_ms:.3f} ms/lookup"
+                  f"  {info.current_size} results, {info.current_bytes / 1024:.1f} KB")
+
+def _clock_pair():
+    start = time.perf_counter_ns()
+    return time.perf_counter_ns() - start
+
+def bench_timer(calls):
+    """
+    Per-call overhead of decorators.timer over an undecorated call, with
+    recording on and switched off, and the cost of the two clock reads
+    every timed call needs, which is most of it on slow-clock machines.
+    Best of five runs each.
+    """
+    def identity(x):
+        return x
+
+    registry = metrics.MetricsRegistry()
+    timed = decorators.timer(identity, registry=registry)
+    muted = decorators.timer(identity, name="muted", registry=registry)
+    registry.disable("muted")
+    keys = list(range(calls))
+    best = {name: min(_ns_per_call(func, keys) for _ in range(5))
+            for name, func in (("undecorated", identity), ("timer", timed), ("timer disabled", muted),
+                               ("2 clock reads", lambda _: _clock_pair()))}
+    print(f"calls: {calls}")
+    for name, ns in best.items():
+        extra = f"  (+{ns - best['undecorated']:,.0f} ns)" if name.startswith("timer") else ""
+        print(f"  {name:<16} {ns:>8,.0f} ns/call{extra}")
+    print(registry.report())
+
+def bench_logger(calls):
+    """
+    Per-call overhead of decorators.logger over an undecorated call: with
+    its level disabled (the common production case), logging every call,
+    and sampling 1 in 100. Records go to a NullHandler so the numbers are
+    the decorator's own formatting, not I/O. Best of five runs each.
+    """
+    def identity(x):
+        return x
+
+    log = logging.getLogger("benchmark.calls")
+    log.propagate = False
+    log.addHandler(logging.NullHandler())
+    log.setLevel(logging.INFO)
+    rows = list(range(10_000))
+    variants = (("undecorated", identity), ("logger disabled", decorators.logger(identity, level=logging.DEBUG, log=log)),
+                ("logger", decorators.logger(identity, log=log)),
+                ("logger sample=100", decorators.logger(identity, sample=100, log=log)))
+    keys = list(range(calls))
+    print(f"calls: {calls}")
+    for args, label in ((keys, "int argument"), ([rows] * calls, "10k-item list argument")):
+        print(f"  {label}")
+        best = {name: min(_ns_per_call(func, args) for _ in range(5)) for name, func in variants}
+        for name, ns in best.items():
+            extra = f"  (+{ns - best['undecorated']:,.0f} ns)" if name != "undecorated" else ""
+            print(f"    {name:<18} {ns:>8,.0f} ns/call{extra}")
+
+LOG_LINE = "2024-01-01 12:00:00 | app | INFO | request handled in 12 ms for user {}\n"
+
+def _count_range(args):
+    path, start, end = args
+    return sum(1 for _ in generators.read_lines(path, start=start, end=end))
+
+def _text_lines(path):
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+def _raw_read(path):
+    with open(path, "rb", buffering=0) as f:
+        while f.read(generators.CHUNK_BYTES):
+            yield
+
+def bench_read_lines(megabytes, workers):
+    """
+    Throughput of generators.read_lines on a log file of megabytes: one
+    process against iterating a text file, the raw binary read as the
+    ceiling, and workers processes each reading a byte range (checked to
+    find every line exactly once). Single-process speed is bound by
+    building a str per line; the ranges are how it scales.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "large_file.txt")
+        with open(path, "w") as f:
+            lines = [LOG_LINE.format(i) for i in range(100_000)]
+            while f.tell() < megabytes * 2**20:
+                f.write("".join(lines))
+        size = os.path.getsize(path)
+        print(f"file: {size / 2**20:,.0f} MB, chunk: {generators.CHUNK_BYTES // 1024} KB")
+        counts = {}
+        for name, make in (("raw binary read", lambda: _raw_read(path)), ("text file iteration", lambda: _text_lines(path)),
+                           ("read_lines", lambda: generators.read_lines(path))):
+            start = time.perf_counter()
+            counts[name] = sum(1 for _ in make())
+            seconds = time.perf_counter() - start
+            print(f"  {name:<24} {size / seconds / 1e9:>6.2f} GB/s")
+        ranges = [(path, size * i // workers, size * (i + 1) // workers) for i in range(workers)]
+        start = time.perf_counter()
+        with multiprocessing.Pool(workers) as pool:
+            found = sum(pool.map(_count_range, ranges))
+        seconds = time.perf_counter() - start
+        assert found == counts["read_lines"], (found, counts["read_lines"])
+        print(f"  {f'read_lines x{workers} ranges':<24} {size / seconds / 1e9:>6.2f} GB/s  ({found:,} lines, {os.cpu_count()} CPUs)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DCPractice benchmarks")
+    parser.add_argument("--calls", type=int, default=1_000_000)
+    parser.add_argument("--megabytes", type=int, default=1024, help="file size for the lines bench")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes for the lines bench")
+    parser.add_argument("bench", nargs="?", choices=["cache", "persistent", "timer", "logger", "lines"], default="cache")
+    args = parser.parse_args()
+    if args.bench == "cache":
+        bench_cache(args.calls)
+    elif args.bench == "persistent":
+        bench_persistent_cache(args.calls)
+    elif args.bench == "timer":
+        bench_timer(args.calls)
+    elif args.bench == "logger":
+        bench_logger(args.calls)
+    elif args.bench == "lines":
+        bench_read_lines(args.megabytes, args.workers)
@@ -1,86 +1,299 @@
+from collections import OrderedDict, namedtuple
 from functools import wraps
-import time
-import logger_custom
+import asyncio, hashlib, inspect, itertools, logging, os, pickle, random, reprlib, sqlite3, threading, time
+import logger_custom, metrics
 
 logger_custom = logger_custom.setup_logger(__name__)
 
-def timer(func):
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "evictions", "max_size", "current_size"])
+SingleFlightInfo = namedtuple("SingleFlightInfo", CacheInfo._fields + ("shared",))
+PersistentCacheInfo = namedtuple("PersistentCacheInfo", ["hits", "misses", "evictions", "max_bytes", "current_size",
+                                                         "current_bytes", "hit_rate", "lookup_ms"])
+RetryInfo = namedtuple("RetryInfo", ["calls", "attempts", "successes", "give_ups"])
+# per-user cache directory rather than the working directory
+PERSISTENT_CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "dcpractice")
+PERSISTENT_CACHE_FILE = os.path.join(PERSISTENT_CACHE_DIR, "cache.sqlite")
+PERSISTENT_MAX_BYTES = 64 * 2**20 # pickled results kept per function
+PICKLE_PROTOCOL = 4 # fixed, so keys hash the same across Python versions
+MAX_VALUE_LENGTH = 80 # characters of an argument or result in a call log record
+_KWARGS_MARK = object() # separates positional from keyword arguments in cache keys
+# reprlib.Repr limit that cuts each container type
+_CONTAINER_LIMITS = {list: "maxlist", tuple: "maxtuple", dict: "maxdict", set: "maxset", frozenset: "maxfrozenset"}
+
+def timer(func=None, *, name=None, registry=metrics.registry):
     """
-    Measure and print function execution time.
-    
+    Record function execution time.
+
+    Each call's duration (time.perf_counter_ns) goes into a latency
+    histogram in registry, named after the function (module.qualname)
+    unless name is given. Calls that raise are timed too. Recording can
+    be switched off per function with registry.disable(name).
+
     Usage:
         @timer
         def slow_function():
             time.sleep(1)
-    
-    Output: "slow_function took 1.0023 seconds"
+
+        metrics.registry.snapshot()["module.slow_function"]
+        # {"count": 1, "sum_ns": ..., "p50_ns": ..., "p95_ns": ..., "p99_ns": ...}
+        print(metrics.registry.report())
     """
+    if func is None:
+        return lambda func: timer(func, name=name, registry=registry)
+    stats = registry.histogram(name or f"{func.__module__}.{func.__qualname__}")
+    buckets, clock, sub_bits = stats.buckets, time.perf_counter_ns, metrics.SUB_BITS
+
     @wraps(func)
     def time_wrapper(*args, **kwargs):
-        start = time.time()
-        r = func(*args, **kwargs)
-        end = time.time()
-        print(f"Function {func.__name__} took {end-start:.2f} seconds to execute")
-        return r
+        if not stats.enabled:
+            return func(*args, **kwargs)
+        start = clock()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            # Histogram.record inlined, the method call alone costs as much
+            ns = clock() - start
+            stats.total += ns
+            shift = ns.bit_length() - sub_bits - 1
+            if shift > 0:
+                buckets[(shift << sub_bits) + (ns >> shift)] += 1
+            else:
+                buckets[ns] += 1
     return time_wrapper
 
-def logger(func):
+def _short_repr(max_length=MAX_VALUE_LENGTH):
+    """
+    Returns: reprlib.Repr that cuts strings and other objects at max_length
+    """
+    short_repr = reprlib.Repr()
+    short_repr.maxstring = short_repr.maxother = max_length
+    return short_repr
+
+def _summarize(value, max_length=MAX_VALUE_LENGTH, short_repr=None):
+    """
+    Returns: Short repr of value for a log record: containers show their
+    first items (and their length when cut), long text is cut at max_length
+    """
+    if short_repr is None:
+        short_repr = _short_repr(max_length)
+    text = short_repr.repr(value)
+    if len(text) > max_length:
+        text = text[:max_length - 3] + "..."
+    limit = _CONTAINER_LIMITS.get(type(value))
+    if limit is not None and len(value) > getattr(short_repr, limit):
+        text += f" (len={len(value)})"
+    return text
+
+def logger(func=None, *, level=logging.INFO, sample=1, max_length=MAX_VALUE_LENGTH, log=None):
     """
     Log function calls with arguments and return value.
-    
+
+    One record per call, at level, on log (this module's logger unless
+    given): a key=value message with the function, its arguments and its
+    result or exception, the same fields in the record's `call` attribute
+    for structured handlers. Values are summarized (see _summarize), so a
+    list of a million records costs a few items. When level is disabled
+    nothing is formatted; with sample=N only one call in N is logged.
+
     Usage:
         @logger
         def add(a, b):
             return a + b
         
         add(2, 3)
-    
+
+        @logger(level=logging.DEBUG, sample=100)
+        def parse(records): ...
+
     Output:
-        "Calling add(2, 3)"
-        "add returned 5"
+        "function=add args=(2, 3) result=5"
     """
+    if func is None:
+        return lambda func: logger(func, level=level, sample=sample, max_length=max_length, log=log)
+    target = log or logger_custom
+    is_enabled, calls, name = target.isEnabledFor, itertools.count(), func.__qualname__
+    short_repr = _short_repr(max_length)
+
     @wraps(func)
     def log_wrapper(*args, **kwargs):
-        logger_custom.debug(f"Calling {func.__name__}({args, kwargs})")
-        r = func(*args, **kwargs)
-        logger_custom.info(f"{func.__name__} returned {r}")
-        return r
+        if not is_enabled(level) or (sample > 1 and next(calls) % sample):
+            return func(*args, **kwargs)
+        fields = {"function": name, "args": tuple(_summarize(a, max_length, short_repr) for a in args)}
+        if kwargs:
+            fields["kwargs"] = {k: _summarize(v, max_length, short_repr) for k, v in kwargs.items()}
+        if sample > 1:
+            fields["sample"] = f"1/{sample}"
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            fields["error"] = _summarize(e, max_length, short_repr)
+            target.log(level, _format_fields(fields), extra={"call": fields})
+            raise
+        fields["result"] = _summarize(result, max_length, short_repr)
+        target.log(level, _format_fields(fields), extra={"call": fields})
+        return result
     return log_wrapper
 
-def retry(max_attempts=3, delay=1, exceptions=(Exception,)):
+def _format_fields(fields):
+    parts = []
+    for key, value in fields.items():
+        if key == "args":
+            value = f"({', '.join(value)})"
+        elif key == "kwargs":
+            value = "{" + ", ".join(f"{k}: {v}" for k, v in value.items()) + "}"
+        parts.append(f"{key}={value}")
+    return " ".join(parts)
+
+class RetryBudget:
+    """
+    Token bucket limiting how often retrying calls may retry, shared by
+    every function decorated with the same budget.
+
+    Each retry takes a token; tokens come back at rate per second, up to
+    capacity. Once a shared dependency fails for everyone, retries stop
+    after the burst of capacity instead of multiplying its load.
+    """
+    def __init__(self, rate=1.0, capacity=10):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_acquire(self):
+        """
+        Returns: True if a token was taken, False if the budget is spent
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+def retry(max_attempts=3, delay=1, exceptions=(Exception,), backoff=2, max_delay=None, max_wait=None, budget=None):
     """
     Retry a function on failure.
-    
+
+    Waits between attempts grow exponentially with full jitter: before
+    retry n (from 0) the wait is uniform between 0 and
+    delay * backoff**n, capped at max_delay, so callers that failed
+    together don't retry in lockstep. A call gives up early, re-raising
+    the last error, when the next wait would take its total waiting past
+    max_wait or when a shared RetryBudget has no token left.
+    async def functions are retried with asyncio.sleep, without blocking
+    the thread.
+
     Args:
-        max_attempts: Maximum number of retry attempts
-        delay: Seconds to wait between retries
-        exceptions: Tuple of exceptions to catch
-    
+        max_attempts: Maximum number of attempts, the first one included
+        delay: Base wait in seconds before the first retry
+        exceptions: Tuple of exceptions to retry on; others propagate at once
+        backoff: Factor the wait limit grows by per retry
+        max_delay: Cap on a single wait, in seconds (None for no cap)
+        max_wait: Cap on the total wait of one call, in seconds (None for no cap)
+        budget: RetryBudget shared with other retrying functions
+
     Usage:
         @retry(max_attempts=3, delay=0.5)
         def flaky_api_call():
             # might fail sometimes
             pass
+
+        flaky_api_call.retry_info()  # calls, attempts, successes, give_ups
     """
     def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            for attempt in range(max_attempts):
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    if attempt == max_attempts - 1:
-                        raise
-                    print(f"Attempt {attempt + 1} failed, retrying...")
-                    time.sleep(delay)
+        counts = dict.fromkeys(RetryInfo._fields, 0)
+        lock = threading.Lock()
+
+        def _count(name):
+            with lock:
+                counts[name] += 1
+
+        def _pause(attempt, waited, error):
+            """
+            Returns: Seconds to wait before the next attempt, or None to give up
+            """
+            if attempt == max_attempts - 1:
+                reason = f"{max_attempts} attempts"
+            else:
+                limit = delay * backoff ** attempt
+                pause = random.uniform(0, limit if max_delay is None else min(limit, max_delay))
+                if max_wait is not None and waited + pause > max_wait:
+                    reason = f"{max_wait}s of waiting"
+                elif budget is not None and not budget.try_acquire():
+                    reason = "the retry budget"
+                else:
+                    logger_custom.debug(f"Attempt {attempt + 1} of {func.__name__} failed ({error!r}), retrying in {pause:.3f}s")
+                    return pause
+            _count("give_ups")
+            logger_custom.warning(f"{func.__name__} failed ({error!r}), giving up after {reason}")
+            return None
+
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                _count("calls")
+                waited = 0
+                for attempt in range(max_attempts):
+                    _count("attempts")
+                    try:
+                        result = await func(*args, **kwargs)
+                    except exceptions as e:
+                        pause = _pause(attempt, waited, e)
+                        if pause is None:
+                            raise
+                        await asyncio.sleep(pause)
+                        waited += pause
+                    else:
+                        _count("successes")
+                        return result
+        else:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                _count("calls")
+                waited = 0
+                for attempt in range(max_attempts):
+                    _count("attempts")
+                    try:
+                        result = func(*args, **kwargs)
+                    except exceptions as e:
+                        pause = _pause(attempt, waited, e)
+                        if pause is None:
+                            raise
+                        time.sleep(pause)
+                        waited += pause
+                    else:
+                        _count("successes")
+                        return result
+
+        def retry_info():
+            with lock:
+                return RetryInfo(**counts)
+
+        wrapper.retry_info = retry_info
         return wrapper
     return decorator
 
-def cache(max_size=128):
+def _make_key(args, kwargs):
+    """
+    Returns: Hashable cache key for a call with keyword arguments; their
+    order doesn't matter
+    """
+    return args + (_KWARGS_MARK,) + tuple(sorted(kwargs.items()))
+
+def cache(max_size=128, ttl=None):
     """
     Cache function results.
     Similar to lru_cache but with visible cache inspection.
-    
+
+    Keeps at most max_size results (None for no limit) and evicts the
+    least recently used one to make room. Results older than ttl seconds
+    are recomputed. Lookups, inserts and evictions are O(1) and safe to
+    call from several threads; the function itself runs outside the lock.
+    Arguments, keyword ones included, must be hashable.
+
     Usage:
         @cache(max_size=100)
         def expensive_computation(x):
@@ -93,14 +306,379 @@ def cache(max_size=128):
         expensive_computation.cache_info()
         expensive_computation.cache_clear()
     """
-    cached_results = {}
     def decorator(func):
+        cached_results = OrderedDict() # key -> (result, expiry time), least recently used first
+        lock = threading.Lock()
+        # bound once: `with lock` and attribute lookups dominate the cost of a hit
+        acquire, release, lookup, touch = lock.acquire, lock.release, cached_results.get, cached_results.move_to_end
+        hits = misses = evictions = 0
+
         @wraps(func)
-        def wrapper(*args):
-            if args in cached_results:
-                return cached_results[args]
-            result = func(*args)
-            cached_results[args] = result
+        def wrapper(*args, **kwargs):
+            nonlocal hits, misses, evictions
+            key = _make_key(args, kwargs) if kwargs else args
+            acquire()
+            try:
+                entry = lookup(key)
+                if entry is not None and (ttl is None or entry[1] > time.monotonic()):
+                    touch(key)
+                    hits += 1
+                    return entry[0]
+                misses += 1
+            finally:
+                release()
+            result = func(*args, **kwargs)
+            if max_size == 0:
+                return result
+            acquire()
+            try:
+                cached_results[key] = (result, None if ttl is None else time.monotonic() + ttl)
+                touch(key)
+                if max_size is not None and len(cached_results) > max_size:
+                    cached_results.popitem(last=False)
+                    evictions += 1
+            finally:
+                release()
             return result
+
+        def cache_info():
+            with lock:
+                return CacheInfo(hits, misses, evictions, max_size, len(cached_results))
+
+        def cache_clear():
+            nonlocal hits, misses, evictions
+            with lock:
+                cached_results.clear()
+                hits = misses = evictions = 0
+
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
+
+class _LRU:
+    """
+    Least recently used store for the memoizing decorators, with the same
+    max_size/ttl rules as cache. Not locked: callers hold their own lock
+    and count their own hits and misses.
+    """
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.results = OrderedDict() # key -> (result, expiry time)
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Returns: Tuple of (found, result)
+        """
+        entry = self.results.get(key)
+        if entry is not None and (self.ttl is None or entry[1] > time.monotonic()):
+            self.results.move_to_end(key)
+            return True, entry[0]
+        return False, None
+
+    def put(self, key, result):
+        if self.max_size == 0:
+            return
+        self.results[key] = (result, None if self.ttl is None else time.monotonic() + self.ttl)
+        self.results.move_to_end(key)
+        if self.max_size is not None and len(self.results) > self.max_size:
+            self.results.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.results.clear()
+        self.evictions = 0
+
+class _Flight:
+    """
+    A call in progress that other callers with the same arguments wait on.
+    """
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+def single_flight(max_size=128, ttl=None):
+    """
+    Cache function results, computing each one only once even when many
+    callers ask for it at the same time.
+
+    Callers with the same arguments as a call still in progress wait for
+    it and get its result instead of computing it again. Works on plain
+    functions called from several threads and on async def functions,
+    whose concurrent callers await one shared task (cancelling a caller
+    doesn't cancel the task the others wait on). An exception reaches
+    every caller waiting on that call and is not cached: the next call
+    tries again. Finished results are kept as in cache (max_size, ttl).
+
+    Usage:
+        @single_flight(max_size=100)
+        async def fetch_profile(user_id):
+            ...
+
+        await asyncio.gather(fetch_profile(1), fetch_profile(1))  # one fetch
+
+        fetch_profile.cache_info()  # hits, misses, ..., shared
+        fetch_profile.cache_clear()
+    """
+    def decorator(func):
+        store = _LRU(max_size, ttl)
+        in_flight = {} # key -> _Flight, or (event loop, key) -> asyncio.Task
+        lock = threading.Lock()
+        hits = misses = shared = 0
+
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                nonlocal hits, misses, shared
+                key = _make_key(args, kwargs) if kwargs else args
+                loop = asyncio.get_running_loop()
+                with lock:
+                    found, result = store.get(key)
+                    if found:
+                        hits += 1
+                        return result
+                    task = in_flight.get((loop, key))
+                    if task is None:
+                        misses += 1
+                        task = loop.create_task(func(*args, **kwargs))
+                        in_flight[(loop, key)] = task
+                        task.add_done_callback(lambda task: _landed(loop, key, task))
+                    else:
+                        shared += 1
+                return await asyncio.shield(task)
+
+            def _landed(loop, key, task):
+                with lock:
+                    del in_flight[(loop, key)]
+                    if not task.cancelled() and task.exception() is None:
+                        store.put(key, task.result())
+        else:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                nonlocal hits, misses, shared
+                key = _make_key(args, kwargs) if kwargs else args
+                with lock:
+                    found, result = store.get(key)
+                    if found:
+                        hits += 1
+                        return result
+                    flight = in_flight.get(key)
+                    leader = flight is None
+                    if leader:
+                        misses += 1
+                        flight = in_flight[key] = _Flight()
+                    else:
+                        shared += 1
+                if not leader:
+                    flight.done.wait()
+                    if flight.error is not None:
+                        raise flight.error
+                    return flight.result
+                try:
+                    flight.result = func(*args, **kwargs)
+                except BaseException as e:
+                    flight.error = e
+                    raise
+                finally:
+                    with lock:
+                        del in_flight[key]
+                        if flight.error is None:
+                            store.put(key, flight.result)
+                    flight.done.set()
+                return flight.result
+
+        def cache_info():
+            with lock:
+                return SingleFlightInfo(hits, misses, store.evictions, max_size, len(store.results), shared)
+
+        def cache_clear():
+            nonlocal hits, misses, shared
+            with lock:
+                store.clear()
+                hits = misses = shared = 0
+
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
+
+class _ResultStore:
+    """
+    Pickled function results in a SQLite file, shared by every function
+    cached in it and safe to use from several threads and processes.
+    Each row records the code version it was computed by and when it was
+    last used, for invalidation and least recently used eviction.
+    """
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS results (function TEXT, key TEXT, version TEXT, value BLOB,"
+                        " size INTEGER, used REAL, PRIMARY KEY (function, key))")
+        self.db.execute("CREATE INDEX IF NOT EXISTS results_used ON results (function, used)")
+
+    def drop_stale(self, function, version):
+        """
+        Returns: Number of results computed by other versions of function,
+        which are deleted
+        """
+        with self.lock:
+            return self.db.execute("DELETE FROM results WHERE function = ? AND version != ?", (function, version)).rowcount
+
+    def get(self, function, key, version):
+        """
+        Returns: Tuple of (found, result)
+        """
+        with self.lock:
+            row = self.db.execute("SELECT value FROM results WHERE function = ? AND key = ? AND version = ?",
+                                  (function, key, version)).fetchone()
+            if row is None:
+                return False, None
+            self.db.execute("UPDATE results SET used = ? WHERE function = ? AND key = ?", (time.time(), function, key))
+        return True, pickle.loads(row[0])
+
+    def put(self, function, key, version, value, max_bytes):
+        """
+        Store a pickled result, then drop least recently used results of
+        function until they fit in max_bytes.
+        Returns: Number of results evicted
+        """
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                            (function, key, version, value, len(value), time.time()))
+            if max_bytes is None:
+                return 0
+            excess = self._size(function)[1] - max_bytes
+            if excess <= 0:
+                return 0
+            evicted = []
+            rows = self.db.execute("SELECT key, size FROM results WHERE function = ? ORDER BY used", (function,))
+            for old_key, size in rows:
+                evicted.append((function, old_key))
+                excess -= size
+                if excess <= 0:
+                    break
+            rows.close()
+            self.db.executemany("DELETE FROM results WHERE function = ? AND key = ?", evicted)
+        return len(evicted)
+
+    def size(self, function):
+        """
+        Returns: Tuple of (results, total pickled bytes) stored for function
+        """
+        with self.lock:
+            return self._size(function)
+
+    def _size(self, function):
+        count, total = self.db.execute("SELECT COUNT(*), SUM(size) FROM results WHERE function = ?", (function,)).fetchone()
+        return count, total or 0
+
+    def clear(self, function):
+        with self.lock:
+            self.db.execute("DELETE FROM results WHERE function = ?", (function,))
+
+_stores = {} # absolute path -> _ResultStore, one connection per file
+_stores_lock = threading.Lock()
+
+def _open_store(path):
+    path = os.path.abspath(path)
+    with _stores_lock:
+        if path not in _stores:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _stores[path] = _ResultStore(path)
+        return _stores[path]
+
+def _code_version(func, version):
+    """
+    Returns: Hash of func's source (its bytecode and constants if the
+    source isn't available) and the explicit version, if any
+    """
+    try:
+        code = inspect.getsource(func).encode()
+    except (OSError, TypeError):
+        code = func.__code__.co_code + repr(func.__code__.co_consts).encode()
+    return hashlib.blake2b(code + repr(version).encode(), digest_size=16).hexdigest()
+
+def persistent_cache(path=PERSISTENT_CACHE_FILE, max_bytes=PERSISTENT_MAX_BYTES, key=None, hash_name="blake2b",
+                     version=None):
+    """
+    Cache function results in a SQLite file, so they survive restarts.
+
+    Each call is looked up by a hash (hashlib hash_name) of the pickled
+    arguments, or of key(*args, **kwargs) if given, e.g. to identify a
+    file argument by its size and modification time rather than its path.
+    Results are pickled; once a function's results take more than
+    max_bytes (None for no limit) the least recently used are evicted.
+    Results are tied to a version of the function, a hash of its source
+    and of version: changing the code (or bumping version) invalidates
+    them. Exceptions are not cached. The file (by default
+    PERSISTENT_CACHE_FILE, under $XDG_CACHE_HOME or ~/.cache) and its
+    directory are created on first call.
+
+    Usage:
+        @persistent_cache(key=lambda path: (path, os.path.getmtime(path)))
+        def summarize(path):
+            ...
+
+        summarize.cache_info()  # hit rate, mean lookup time, stored bytes, ...
+        summarize.cache_clear()
+    """
+    def decorator(func):
+        function = f"{func.__module__}.{func.__qualname__}"
+        code_version = _code_version(func, version)
+        store = None
+        hits = misses = evictions = 0
+        lookup_ns = 0
+
+        def _digest(args, kwargs):
+            identity = key(*args, **kwargs) if key else (args, tuple(sorted(kwargs.items())))
+            return hashlib.new(hash_name, pickle.dumps(identity, PICKLE_PROTOCOL)).hexdigest()
+
+        def _store():
+            nonlocal store
+            if store is None:
+                store = _open_store(path)
+                dropped = store.drop_stale(function, code_version)
+                if dropped:
+                    logger_custom.info(f"Dropped {dropped} cached results of an older {function}")
+            return store
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            nonlocal hits, misses, evictions, lookup_ns
+            digest = _digest(args, kwargs)
+            start = time.perf_counter_ns()
+            found, result = _store().get(function, digest, code_version)
+            lookup_ns += time.perf_counter_ns() - start
+            if found:
+                hits += 1
+                return result
+            misses += 1
+            result = func(*args, **kwargs)
+            try:
+                value = pickle.dumps(result, PICKLE_PROTOCOL)
+            except (pickle.PicklingError, TypeError, AttributeError) as e:
+                logger_custom.warning(f"Not caching a result of {function}: {e}")
+                return result
+            evictions += store.put(function, digest, code_version, value, max_bytes)
+            return result
+
+        def cache_info():
+            count, total = _store().size(function)
+            calls = hits + misses
+            return PersistentCacheInfo(hits, misses, evictions, max_bytes, count, total,
+                                       hits / calls if calls else 0.0, lookup_ns / calls / 1e6 if calls else 0.0)
+
+        def cache_clear():
+            nonlocal hits, misses, evictions, lookup_ns
+            _store().clear(function)
+            hits = misses = evictions = lookup_ns = 0
+
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
         return wrapper
     return decorator
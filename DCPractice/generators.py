@@ -1,15 +1,74 @@
-def read_lines(filepath, encoding='utf-8'):
+CHUNK_BYTES = 1 << 16 # bytes per raw read in read_lines: small enough to stay in cache while decoded
+
+def read_lines(filepath, encoding='utf-8', errors='replace', start=0, end=None, chunk_bytes=CHUNK_BYTES):
     """
     Yield lines from a file one at a time.
     - Strip whitespace from each line
     - Skip empty lines
-    - Handle encoding errors gracefully
-    
+    - Handle encoding errors gracefully: errors is the decode policy
+      ('replace', 'ignore', 'backslashreplace', or 'strict' to raise)
+
+    The file is read in binary chunks of chunk_bytes; each run of complete
+    lines is decoded and split in one go, so there's no per-line read or
+    decode. encoding must be ASCII-compatible (utf-8, latin-1, cp1252...).
+
+    start and end select a byte range: only lines starting at an offset in
+    [start, end) are yielded, so workers given disjoint ranges that cover
+    the file read every line exactly once between them.
+
     Usage:
         for line in read_lines('large_file.txt'):
             process(line)
+
+        size = os.path.getsize('large_file.txt')
+        half = read_lines('large_file.txt', start=size // 2)
     """
-    pass
+    if "\n".encode(encoding) != b"\n":
+        raise ValueError(f"read_lines needs an ASCII-compatible encoding, got {encoding}")
+
+    def split(block):
+        return filter(None, map(str.strip, block.decode(encoding, errors).split("\n")))
+
+    with open(filepath, "rb", buffering=0) as f:
+        offset = 0 # file offset of data[0]
+        data = b""
+        if start > 0:
+            # the line running through start belongs to the previous range
+            f.seek(start - 1)
+            data = f.read(chunk_bytes)
+            offset = start - 1
+            newline = data.find(b"\n")
+            while newline == -1 and data:
+                offset += len(data)
+                data = f.read(chunk_bytes)
+                newline = data.find(b"\n")
+            if newline == -1:
+                return
+            offset += newline + 1
+            data = data[newline + 1:]
+        while True:
+            if end is not None and offset >= end:
+                return
+            if end is not None and offset + len(data) >= end:
+                # the last line is the one running through byte end - 1
+                newline = data.find(b"\n", end - 1 - offset)
+                if newline != -1:
+                    yield from split(data[:newline + 1])
+                    return
+            chunk = f.read(chunk_bytes)
+            if not chunk:
+                yield from split(data)
+                return
+            newline = chunk.rfind(b"\n")
+            if newline == -1:
+                data += chunk
+                continue
+            if end is not None and offset + len(data) + newline + 1 > end:
+                data += chunk
+                continue
+            yield from split(data + chunk[:newline + 1])
+            offset += len(data) + newline + 1
+            data = chunk[newline + 1:]
 
 def batch(iterable, size):
     """
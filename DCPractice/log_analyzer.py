@@ -1,6 +1,15 @@
-from decorators import timer, logger, cache
+from decorators import timer, logger, cache, persistent_cache
 from generators import read_lines, batch, filter_errors
 from pipeline import create_pipeline
+import os
+
+def _log_file_key(log_path, *args, **kwargs):
+    """
+    Persistent cache key for a call on a log file: the file's path, size
+    and modification time, so results are recomputed once the log changes.
+    """
+    stat = os.stat(log_path)
+    return os.path.abspath(log_path), stat.st_size, stat.st_mtime_ns, args, tuple(sorted(kwargs.items()))
 
 @timer
 @logger
@@ -23,6 +32,7 @@ def parse_log_line(line):
     pass
 
 
+@persistent_cache(key=_log_file_key)
 def count_by_level(log_path):
     """
     Count log entries by level (INFO, WARNING, ERROR).
@@ -31,6 +41,7 @@ def count_by_level(log_path):
     pass
 
 
+@persistent_cache(key=_log_file_key)
 def get_error_summary(log_path, top_n=10):
     """
     Get top N most common error messages.
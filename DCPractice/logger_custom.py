@@ -1,6 +1,20 @@
 import logging
+import queue_logging
+
+LOG_FILE = "app.log"
+
+queue_logging.log_to_file(LOG_FILE)
 
 def setup_logger(name, level="info"):
+    """
+    Configure a custom logger.
+
+    Records are queued and written to the console and LOG_FILE (rotated
+    by size) by a background listener thread (see queue_logging), so
+    logging doesn't block on either. Calls below the logger's level cost
+    a level check only; guard debug calls that build expensive messages
+    in hot loops with logger.isEnabledFor().
+    """
     logger = logging.getLogger(name)
     if not logger.handlers:
         logger.setLevel(logging.INFO)
@@ -17,15 +31,5 @@ def setup_logger(name, level="info"):
                 logger.setLevel(logging.CRITICAL)
             case _:
                 raise ValueError(f"Invalid logging level {level}")
-        console_handler = logging.StreamHandler()
-        file_handler = logging.FileHandler("app.log")
-        formatter = logging.Formatter(
-            '%(asctime)s | %(name)s | %(levelname)s | %(message)s',
-            datefmt = '%H:%M:%S'
-        )
-        console_handler.setFormatter(formatter)
-        file_handler.setFormatter(formatter)
-
-        logger.addHandler(console_handler)
-        logger.addHandler(file_handler)
-    return logger
\ No newline at end of file
+        queue_logging.attach(logger)
+    return logger
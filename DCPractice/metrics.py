@@ -0,0 +1,144 @@
+import json, threading
+
+SUB_BITS = 4 # 16 buckets per power of two: quantiles within ~3% of the true value
+_EXACT = 1 << (SUB_BITS + 1) # durations below this get a bucket each
+BUCKETS = (64 << SUB_BITS) + _EXACT
+QUANTILES = (0.5, 0.95, 0.99)
+
+def _bucket_bounds(index):
+    """
+    Returns: Tuple of (low, high) nanoseconds covered by a bucket
+    """
+    if index < _EXACT:
+        return index, index + 1
+    shift = (index - (1 << SUB_BITS)) >> SUB_BITS
+    mantissa = index - (shift << SUB_BITS)
+    return mantissa << shift, (mantissa + 1) << shift
+
+class Histogram:
+    """
+    Streaming latency histogram in fixed memory.
+
+    Durations (integer nanoseconds) are counted in log-linear buckets,
+    2**SUB_BITS per power of two, so quantiles, min and max are accurate
+    to a few percent whatever the range; the sum is exact. Updates aren't
+    locked: concurrent threads can very rarely lose a count, which keeps
+    recording cheap.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.enabled = True
+        self.total = 0
+        self.buckets = [0] * BUCKETS
+
+    def reset(self):
+        self.total = 0
+        # in place: decorators.timer holds on to the list
+        self.buckets[:] = [0] * BUCKETS
+
+    def record(self, ns):
+        self.total += ns
+        shift = ns.bit_length() - SUB_BITS - 1
+        if shift > 0:
+            self.buckets[(shift << SUB_BITS) + (ns >> shift)] += 1
+        else:
+            self.buckets[ns] += 1
+
+    @property
+    def count(self):
+        return sum(self.buckets)
+
+    def quantile(self, q):
+        """
+        Returns: Approximate q-quantile in nanoseconds (the middle of its
+        bucket), or None if nothing was recorded
+        """
+        rank = q * self.count
+        seen = 0
+        for index, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= rank:
+                low, high = _bucket_bounds(index)
+                return (low + high - 1) / 2
+        return None
+
+    def snapshot(self):
+        """
+        Returns: JSON-serializable dict of count, sum, mean, min, max and
+        the QUANTILES, durations in nanoseconds
+        """
+        count = self.count
+        data = {"count": count, "sum_ns": self.total, "mean_ns": self.total / count if count else None,
+                "min_ns": self.quantile(0.0), "max_ns": self.quantile(1.0)}
+        for q in QUANTILES:
+            data[f"p{round(q * 100)}_ns"] = self.quantile(q)
+        return data
+
+class MetricsRegistry:
+    """
+    Named latency histograms, e.g. one per function decorated with
+    decorators.timer. Recording can be turned off per name (or for names
+    not created yet with default_enabled).
+    """
+    def __init__(self, default_enabled=True):
+        self.default_enabled = default_enabled
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def histogram(self, name):
+        """
+        Returns: The Histogram called name, created if needed
+        """
+        with self.lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram(name)
+                self.histograms[name].enabled = self.default_enabled
+            return self.histograms[name]
+
+    def enable(self, name):
+        self.histogram(name).enabled = True
+
+    def disable(self, name):
+        self.histogram(name).enabled = False
+
+    def snapshot(self):
+        """
+        Returns: Dict mapping each name to its Histogram.snapshot()
+        """
+        with self.lock:
+            histograms = list(self.histograms.values())
+        return {h.name: h.snapshot() for h in histograms}
+
+    def export(self, filepath):
+        """
+        Write snapshot() as JSON.
+        """
+        with open(filepath, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def reset(self):
+        with self.lock:
+            for h in self.histograms.values():
+                h.reset()
+
+    def report(self):
+        """
+        Returns: One line per histogram with count, mean and quantiles
+        """
+        lines = []
+        for name, data in self.snapshot().items():
+            if data["count"]:
+                quantiles = "  ".join(f"p{round(q * 100)} {format_ns(data[f'p{round(q * 100)}_ns'])}" for q in QUANTILES)
+                lines.append(f"{name}: {data['count']} calls, mean {format_ns(data['mean_ns'])}  {quantiles}")
+        return "\n".join(lines)
+
+def format_ns(ns):
+    """
+    Returns: Duration in the largest unit that keeps it at 1 or more, e.g. "2.35 ms"
+    """
+    for unit, scale in (("s", 1e9), ("ms", 1e6), ("us", 1e3)):
+        if ns >= scale:
+            return f"{ns / scale:.2f} {unit}"
+    return f"{ns:.0f} ns"
+
+registry = MetricsRegistry()
@@ -1,6 +1,7 @@
 import pytest
-from decorators import timer, retry, cache
-import random, sys
+from decorators import timer, retry, cache, single_flight, persistent_cache, RetryBudget, logger
+import asyncio, json, logging, os, random, sys, threading, time
+import decorators, metrics
 
 def test_timer_returns_result():
     """Timer decorator should not affect return value."""
@@ -15,6 +16,66 @@ def test_timer_returns_result():
     a, b = 2, 3
     assert(add_no_timer(a, b) == add_with_timer(a, b))
 
+def test_timer_records_calls():
+    """Timer should record each call, failing ones included, in its histogram."""
+
+    registry = metrics.MetricsRegistry()
+    @timer(name="work", registry=registry)
+    def work(fail=False):
+        if fail:
+            raise ValueError("failed")
+        return sum(range(1000))
+
+    for _ in range(4):
+        work()
+    with pytest.raises(ValueError):
+        work(fail=True)
+    data = registry.snapshot()["work"]
+    assert(data["count"] == 5)
+    assert(data["sum_ns"] > 0)
+    assert(data["min_ns"] <= data["p50_ns"] <= data["p99_ns"] <= data["max_ns"])
+
+def test_timer_can_be_disabled_per_function():
+    """A disabled function should not be recorded until enabled again."""
+
+    registry = metrics.MetricsRegistry()
+    @timer(registry=registry)
+    def square(x):
+        return x ** 2
+
+    name = f"{square.__module__}.{square.__qualname__}"
+    registry.disable(name)
+    assert(square(3) == 9)
+    assert(registry.snapshot()[name]["count"] == 0)
+    registry.enable(name)
+    square(3)
+    assert(registry.snapshot()[name]["count"] == 1)
+
+def test_histogram_quantiles_are_close():
+    """Quantiles should be within a few percent; count and sum exact."""
+
+    histogram = metrics.Histogram("latency")
+    values = list(range(1000, 1_001_000, 1000))
+    random.Random(0).shuffle(values)
+    for ns in values:
+        histogram.record(ns)
+    data = histogram.snapshot()
+    assert(data["count"] == len(values))
+    assert(data["sum_ns"] == sum(values))
+    for q, expected in ((50, 500_000), (95, 950_000), (99, 990_000)):
+        assert(abs(data[f"p{q}_ns"] - expected) / expected < 0.04)
+
+def test_registry_export(tmp_path):
+    """Export should write the snapshot as JSON."""
+
+    registry = metrics.MetricsRegistry()
+    registry.histogram("a").record(1500)
+    registry.export(tmp_path / "metrics.json")
+    with open(tmp_path / "metrics.json") as f:
+        assert(json.load(f) == registry.snapshot())
+    registry.reset()
+    assert(registry.snapshot()["a"]["count"] == 0)
+
 def test_retry_succeeds_eventually():
     """Retry should succeed if function works within attempts."""
 
@@ -29,11 +90,499 @@ def test_retry_succeeds_eventually():
 
     assert(risky_function())
 
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record retry waits instead of sleeping, with the jitter at its upper limit."""
+
+    waits = []
+    async def fake_async_sleep(seconds):
+        waits.append(seconds)
+    monkeypatch.setattr("decorators.time.sleep", waits.append)
+    monkeypatch.setattr("decorators.asyncio.sleep", fake_async_sleep)
+    monkeypatch.setattr("decorators.random.uniform", lambda low, high: high)
+    return waits
+
+def _failing(times, error=ValueError):
+    """A function failing `times` times before returning True."""
+
+    calls = 0
+    def func():
+        nonlocal calls
+        calls += 1
+        if calls <= times:
+            raise error("failed")
+        return True
+    return func
+
+def test_retry_backs_off_exponentially(sleeps):
+    """Waits should double up to max_delay; jitter picks within the limit."""
+
+    func = retry(max_attempts=5, delay=0.1, max_delay=0.3)(_failing(4))
+    assert(func())
+    assert(sleeps == pytest.approx([0.1, 0.2, 0.3, 0.3]))
+    assert(func.retry_info() == (1, 5, 1, 0))
+
+def test_retry_only_catches_given_exceptions(sleeps):
+    """Exceptions outside `exceptions` should propagate without a retry."""
+
+    func = retry(max_attempts=3, exceptions=(KeyError,))(_failing(1))
+    with pytest.raises(ValueError):
+        func()
+    assert(sleeps == [])
+    assert(func.retry_info().attempts == 1)
+
+def test_retry_gives_up_after_max_wait(sleeps):
+    """A call should give up when the next wait would pass max_wait."""
+
+    func = retry(max_attempts=5, delay=0.1, max_wait=0.25)(_failing(10))
+    with pytest.raises(ValueError):
+        func()
+    assert(sleeps == pytest.approx([0.1]))
+    assert(func.retry_info() == (1, 2, 0, 1))
+
+def test_retry_budget_is_shared(sleeps):
+    """Functions sharing a budget should stop retrying once it is spent."""
+
+    budget = RetryBudget(rate=0, capacity=1)
+    first = retry(max_attempts=3, delay=0.1, budget=budget)(_failing(1))
+    second = retry(max_attempts=3, delay=0.1, budget=budget)(_failing(1))
+    assert(first())
+    with pytest.raises(ValueError):
+        second()
+    assert(second.retry_info().give_ups == 1)
+
+def test_retry_async_awaits_between_attempts(sleeps):
+    """async def functions should be retried with asyncio.sleep."""
+
+    calls = 0
+    @retry(max_attempts=3, delay=0.1)
+    async def flaky():
+        nonlocal calls
+        calls += 1
+        if calls < 3:
+            raise ValueError("failed")
+        return "ok"
+
+    assert(asyncio.run(flaky()) == "ok")
+    assert(sleeps == pytest.approx([0.1, 0.2]))
+    assert(flaky.retry_info().successes == 1)
+
 def test_cache_returns_cached_value():
     """Cache should return same value without recomputing."""
-    
 
+    calls = 0
+    @cache(max_size=10)
+    def square(x):
+        nonlocal calls
+        calls += 1
+        return x ** 2
+
+    assert(square(5) == 25)
+    assert(square(5) == 25)
+    assert(calls == 1)
 
 def test_cache_info_tracks_hits():
     """Cache info should track hits and misses."""
-    pass
+
+    @cache(max_size=10)
+    def square(x):
+        return x ** 2
+
+    for x in (1, 2, 1, 1, 3):
+        square(x)
+    info = square.cache_info()
+    assert(info.hits == 2)
+    assert(info.misses == 3)
+    assert(info.current_size == 3)
+
+def test_cache_evicts_least_recently_used():
+    """Cache should hold at most max_size results, dropping the least recently used."""
+
+    @cache(max_size=2)
+    def square(x):
+        return x ** 2
+
+    square(1)
+    square(2)
+    square(1) # 2 is now the least recently used
+    square(3)
+    info = square.cache_info()
+    assert(info.evictions == 1)
+    assert(info.current_size == 2)
+    square(1)
+    assert(square.cache_info().hits == 2)
+    square(2)
+    assert(square.cache_info().misses == 4)
+
+def test_cache_keys_include_kwargs():
+    """Keyword arguments should be part of the key, in any order."""
+
+    calls = 0
+    @cache()
+    def power(base, exponent=2):
+        nonlocal calls
+        calls += 1
+        return base ** exponent
+
+    assert(power(2, exponent=3) == 8)
+    assert(power(2, exponent=2) == 4)
+    assert(power(base=2, exponent=3) == power(exponent=3, base=2))
+    assert(calls == 3)
+
+def test_cache_ttl_expires_results(monkeypatch):
+    """Results older than ttl should be recomputed."""
+
+    now = 1000.0
+    monkeypatch.setattr("decorators.time.monotonic", lambda: now)
+    @cache(ttl=10)
+    def square(x):
+        return x ** 2
+
+    square(3)
+    now += 5
+    square(3)
+    now += 10
+    square(3)
+    info = square.cache_info()
+    assert(info.hits == 1)
+    assert(info.misses == 2)
+
+def test_cache_clear_resets_results_and_counters():
+    """cache_clear should empty the cache and reset its counters."""
+
+    @cache(max_size=10)
+    def square(x):
+        return x ** 2
+
+    square(1)
+    square(1)
+    square.cache_clear()
+    assert(square.cache_info() == (0, 0, 0, 10, 0))
+
+def test_cache_is_thread_safe():
+    """Concurrent callers should never push the cache past max_size."""
+
+    @cache(max_size=50)
+    def square(x):
+        return x ** 2
+
+    def work(seed):
+        rng = random.Random(seed)
+        for _ in range(2000):
+            x = rng.randrange(200)
+            assert(square(x) == x ** 2)
+
+    threads = [threading.Thread(target=work, args=(seed,)) for seed in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    info = square.cache_info()
+    assert(info.current_size <= 50)
+    assert(info.hits + info.misses == 8000)
+
+
+def test_single_flight_shares_concurrent_calls():
+    """Threads asking for the same result at once should compute it once."""
+
+    calls = 0
+    started = threading.Event()
+    release = threading.Event()
+    @single_flight()
+    def slow_square(x):
+        nonlocal calls
+        calls += 1
+        started.set()
+        release.wait()
+        return x ** 2
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(slow_square(4))) for _ in range(8)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    while slow_square.cache_info().shared < 7:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert(results == [16] * 8)
+    assert(calls == 1)
+    assert(slow_square(4) == 16)
+    assert(slow_square.cache_info().hits == 1)
+
+def test_single_flight_does_not_cache_errors():
+    """Waiting callers should get the error, and the next call should try again."""
+
+    calls = 0
+    started = threading.Event()
+    release = threading.Event()
+    @single_flight()
+    def flaky(x):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            started.set()
+            release.wait()
+            raise ValueError("first call fails")
+        return x
+
+    errors = []
+    def call():
+        try:
+            flaky(1)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    while flaky.cache_info().shared < 2:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert(len(errors) == 3)
+    assert(flaky(1) == 1)
+    assert(calls == 2)
+
+def test_single_flight_async_shares_one_task():
+    """Coroutines asking for the same result at once should await one computation."""
+
+    calls = 0
+    @single_flight()
+    async def fetch(x):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return x * 10
+
+    async def main():
+        results = await asyncio.gather(*(fetch(1) for _ in range(10)), fetch(2))
+        return results, await fetch(1)
+
+    results, again = asyncio.run(main())
+    assert(results == [10] * 10 + [20])
+    assert(again == 10)
+    assert(calls == 2)
+    assert(fetch.cache_info().shared == 9)
+
+def test_single_flight_async_errors_and_cancellation():
+    """An error reaches every waiter without being cached; a cancelled waiter doesn't cancel the others."""
+
+    calls = 0
+    @single_flight()
+    async def fetch(x):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        if calls == 1:
+            raise ValueError("first call fails")
+        return x
+
+    async def main():
+        results = await asyncio.gather(fetch(1), fetch(1), return_exceptions=True)
+        assert(all(isinstance(r, ValueError) for r in results))
+        waiter, other = asyncio.create_task(fetch(2)), asyncio.create_task(fetch(2))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        return await other
+
+    assert(asyncio.run(main()) == 2)
+    assert(calls == 2)
+
+def test_persistent_cache_survives_restart(tmp_path):
+    """Results should be reused by a fresh decorator over the same file."""
+
+    path = tmp_path / "cache.sqlite"
+    calls = 0
+    def square(x):
+        nonlocal calls
+        calls += 1
+        return x ** 2
+
+    first = persistent_cache(path)(square)
+    assert(first(3) == 9)
+    restarted = persistent_cache(path)(square)
+    assert(restarted(3) == 9)
+    assert(calls == 1)
+    info = restarted.cache_info()
+    assert(info.hits == 1)
+    assert(info.hit_rate == 1.0)
+    assert(info.current_size == 1)
+
+def test_persistent_cache_version_invalidates(tmp_path):
+    """A new version of the function should not see older results."""
+
+    path = tmp_path / "cache.sqlite"
+    calls = 0
+    def square(x):
+        nonlocal calls
+        calls += 1
+        return x ** 2
+
+    persistent_cache(path, version=1)(square)(3)
+    newer = persistent_cache(path, version=2)(square)
+    newer(3)
+    assert(calls == 2)
+    assert(newer.cache_info().current_size == 1)
+
+def test_persistent_cache_evicts_by_size(tmp_path):
+    """Stored results should stay within max_bytes, dropping the least recently used."""
+
+    @persistent_cache(tmp_path / "cache.sqlite", max_bytes=500)
+    def payload(x):
+        return "x" * 200 + str(x)
+
+    for x in range(5):
+        payload(x)
+    info = payload.cache_info()
+    assert(info.current_bytes <= 500)
+    assert(info.evictions == 3)
+    payload(4)
+    assert(payload.cache_info().hits == 1)
+
+def test_persistent_cache_custom_key_and_errors(tmp_path):
+    """A key function should decide what counts as the same call; errors aren't cached."""
+
+    calls = 0
+    @persistent_cache(tmp_path / "cache.sqlite", key=lambda x, note="": x)
+    def double(x, note=""):
+        nonlocal calls
+        calls += 1
+        if x < 0:
+            raise ValueError("negative")
+        return x * 2
+
+    assert(double(2, note="a") == double(2, note="b") == 4)
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            double(-1)
+    assert(calls == 3)
+
+def test_persistent_cache_default_location(tmp_path):
+    """The cache file defaults to a per-user cache directory, which is created if missing."""
+
+    assert(os.path.dirname(decorators.PERSISTENT_CACHE_FILE) == decorators.PERSISTENT_CACHE_DIR)
+    assert(os.path.abspath(decorators.PERSISTENT_CACHE_DIR) != os.getcwd())
+    path = tmp_path / "cache" / "nested" / "results.sqlite"
+    @persistent_cache(path)
+    def square(x):
+        return x ** 2
+
+    assert(square(3) == 9)
+    assert(path.exists())
+
+@pytest.fixture
+def call_log():
+    """A logger of its own whose records are collected in a list."""
+
+    log = logging.getLogger("test_decorators.calls")
+    log.propagate = False
+    log.setLevel(logging.INFO)
+    handler = logging.Handler()
+    handler.records = []
+    handler.emit = handler.records.append
+    log.addHandler(handler)
+    yield log, handler.records
+    log.removeHandler(handler)
+
+class _Loud:
+    reprs = 0
+
+    def __repr__(self):
+        _Loud.reprs += 1
+        return "Loud()"
+
+def test_logger_structured_record(call_log):
+    """One record per call, with the fields as a message and as record.call."""
+
+    log, records = call_log
+    @logger(log=log)
+    def add(a, b, scale=1):
+        return (a + b) * scale
+
+    assert(add(2, 3, scale=2) == 10)
+    assert(len(records) == 1)
+    assert(records[0].getMessage() == "function=test_logger_structured_record.<locals>.add args=(2, 3) kwargs={scale: 2} result=10")
+    assert(records[0].call["args"] == ("2", "3"))
+    assert(records[0].call["result"] == "10")
+
+def test_logger_disabled_level_formats_nothing(call_log):
+    """Below the logger's level no argument or result is ever repr'd."""
+
+    log, records = call_log
+    @logger(log=log, level=logging.DEBUG)
+    def echo(x):
+        return x
+
+    _Loud.reprs = 0
+    echo(_Loud())
+    assert(_Loud.reprs == 0)
+    assert(records == [])
+
+def test_logger_summarizes_large_values(call_log):
+    """Big containers and long strings should be cut short."""
+
+    log, records = call_log
+    @logger(log=log, max_length=40)
+    def first(rows, label):
+        return rows[0]
+
+    first(list(range(100_000)), "x" * 1000)
+    args = records[0].call["args"]
+    assert(args[0] == "[0, 1, 2, 3, 4, 5, ...] (len=100000)")
+    assert(len(args[1]) == 40 and "..." in args[1])
+
+def test_logger_long_max_length(call_log):
+    """max_length above the default should keep that many characters."""
+
+    log, records = call_log
+    @logger(log=log, max_length=200)
+    def echo(text):
+        return len(text)
+
+    echo("y" * 150)
+    assert(records[0].call["args"][0] == repr("y" * 150))
+
+def test_logger_truncated_dict_length(call_log):
+    """A dict cut short should say how long it is, like a list."""
+
+    log, records = call_log
+    @logger(log=log)
+    def count(mapping, few):
+        return len(mapping)
+
+    count({i: i for i in range(5)}, {1: 1})
+    args = records[0].call["args"]
+    assert(args[0].endswith("...} (len=5)"))
+    assert(args[1] == "{1: 1}")
+
+def test_logger_sampling(call_log):
+    """With sample=N one call in N should be logged, starting with the first."""
+
+    log, records = call_log
+    @logger(log=log, sample=10)
+    def square(x):
+        return x * x
+
+    for x in range(25):
+        square(x)
+    assert([r.call["args"] for r in records] == [("0",), ("10",), ("20",)])
+    assert(records[0].call["sample"] == "1/10")
+
+def test_logger_logs_and_reraises(call_log):
+    """An exception should be logged in the call's record, then re-raised."""
+
+    log, records = call_log
+    @logger(log=log)
+    def fail():
+        raise ValueError("nope")
+
+    with pytest.raises(ValueError):
+        fail()
+    assert(records[0].call["error"] == "ValueError('nope')")
+    assert("result" not in records[0].call)
@@ -12,6 +12,29 @@ def test_filter_by_predicate():
     """Filter should only yield matching items."""
     pass
 
-def test_read_lines_skips_empty():
+def test_read_lines_skips_empty(tmp_path):
     """Read lines should skip empty lines."""
-    pass
\ No newline at end of file
+    path = tmp_path / "log.txt"
+    path.write_bytes(b"  first  \n\n \t \r\nsecond\r\n\nthird")
+    assert list(read_lines(path, chunk_bytes=4)) == ["first", "second", "third"]
+
+def test_read_lines_byte_ranges(tmp_path):
+    """Disjoint byte ranges should yield every line exactly once between them."""
+    path = tmp_path / "log.txt"
+    lines = [f"line {i}:" + "x" * (i % 7) for i in range(200)]
+    path.write_text("\n".join(lines) + "\n")
+    size = path.stat().st_size
+    bounds = [0, 1, 37, size // 2, size - 1, size]
+    found = []
+    for start, end in zip(bounds, bounds[1:]):
+        found += read_lines(path, start=start, end=end, chunk_bytes=16)
+    assert found == lines
+
+def test_read_lines_decode_errors(tmp_path):
+    """Undecodable bytes should be replaced by default, or raise when strict."""
+    path = tmp_path / "log.txt"
+    path.write_bytes(b"ok\nbad \xff byte\n")
+    assert list(read_lines(path)) == ["ok", "bad \ufffd byte"]
+    assert list(read_lines(path, errors="ignore")) == ["ok", "bad  byte"]
+    with pytest.raises(UnicodeDecodeError):
+        list(read_lines(path, errors="strict"))
\ No newline at end of file
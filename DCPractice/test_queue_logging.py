@@ -0,0 +1,48 @@
+import pytest
+import queue_logging
+import logging, os
+
+CANONICAL = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "FileProcessing", "queue_logging.py")
+
+def test_matches_canonical_copy():
+    """This module is a copy of FileProcessing/queue_logging.py and must not drift from it."""
+
+    if not os.path.exists(CANONICAL):
+        pytest.skip("FileProcessing is not next to DCPractice")
+    with open(CANONICAL) as canonical, open(queue_logging.__file__) as copy:
+        assert(copy.read() == canonical.read())
+
+def test_file_handler_batches_and_rotates(tmp_path):
+    """Records should be written in batches and the file rotated by size."""
+
+    path = tmp_path / "test.log"
+    handler = queue_logging.BatchingRotatingFileHandler(str(path), max_bytes=2000, backup_count=2, batch_records=10)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    record = lambda i: logging.LogRecord("test", logging.INFO, __file__, 0, f"record {i:03d} " + "x" * 40, None, None)
+    for i in range(9):
+        handler.emit(record(i))
+    assert(not path.exists())
+    handler.emit(record(9))
+    assert(len(path.read_text().splitlines()) == 10)
+    for i in range(10, 200):
+        handler.emit(record(i))
+    handler.close()
+    assert(os.path.getsize(path) <= 2000)
+    assert(os.path.exists(f"{path}.1") and os.path.exists(f"{path}.2") and not os.path.exists(f"{path}.3"))
+    assert(path.read_text().splitlines()[-1].startswith("record 199 "))
+
+def test_queue_handler_leaves_record_unchanged(caplog):
+    """Handlers after the queue's (root's, caplog's) should see the record as logged, not the queued copy."""
+
+    log = logging.getLogger("test_queue_logging.prepare")
+    queue_logging.attach(log)
+    try:
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            log.error("failed on %s", "row 3", exc_info=True)
+    finally:
+        log.removeHandler(queue_logging._queue_handler)
+    record = caplog.records[-1]
+    assert((record.msg, record.args, record.exc_info[0]) == ("failed on %s", ("row 3",), ValueError))
+    assert(record.getMessage() == "failed on row 3")
@@ -0,0 +1,223 @@
+import logger, validator
+import numpy as np
+
+logger = logger.setup_logger(__name__, "info")
+
+FIELDS = validator.REQUIRED_FIELDS
+REASONS = ("missing", "invalid")
+MISSING, INVALID = 0, 1
+
+# one row per bad field, codes index into FIELDS and REASONS
+ERROR_DTYPE = np.dtype([("row", np.int64), ("field", np.uint8), ("reason", np.uint8)])
+
+MAX_FAST_DIGITS = 18 # any 18-digit number fits in int64
+MAX_PRICE_DIGITS = 15 # any 15-digit mantissa is exact in a float64
+
+class BatchValidation:
+    """
+    Result of validate_columns.
+
+    mask: True for rows that pass every rule
+    errors: ERROR_DTYPE table sorted by row, then field
+    dates, quantities, prices: parsed columns (NaT / 0 / nan where invalid)
+    """
+    def __init__(self, mask, errors, dates, quantities, prices):
+        self.mask = mask
+        self.errors = errors
+        self.dates = dates
+        self.quantities = quantities
+        self.prices = prices
+
+    def __len__(self):
+        return len(self.mask)
+
+    def iter_errors(self):
+        """
+        Yields: (row index, field name, reason) for each error
+        """
+        for row, field, reason in self.errors.tolist():
+            yield row, FIELDS[field], REASONS[reason]
+
+def records_to_columns(records):
+    """
+    Turn a list of record dictionaries into a columnar batch.
+    Returns: Dict mapping field name to a NumPy string array
+    """
+    return {field: np.array([r.get(field, "") for r in records], dtype=str) for field in FIELDS}
+
+def _as_text(values):
+    """
+    Coerce a column to a contiguous NumPy str or bytes array.
+    """
+    arr = np.asarray(values)
+    if arr.dtype.kind not in "US":
+        arr = arr.astype(str)
+    return np.ascontiguousarray(arr)
+
+def _char_codes(arr, width):
+    """
+    View a str/bytes array as a (width, n) uint8 matrix of character codes,
+    zero past the end of each string and 255 for anything non-ascii.
+    Column-major so each character position is one contiguous vector.
+    Returns: Tuple of (codes, mask of rows longer than width)
+    """
+    code_type = np.uint32 if arr.dtype.kind == "U" else np.uint8
+    chars = arr.dtype.itemsize // np.dtype(code_type).itemsize
+    codes = arr.view(code_type).reshape(len(arr), chars)
+    overflow = codes[:, width:].any(axis=1) if chars > width else np.zeros(len(arr), dtype=bool)
+    matrix = np.zeros((width, len(arr)), dtype=np.uint8)
+    used = codes[:, :width].T
+    if code_type == np.uint32:
+        np.minimum(used, 255, out=matrix[:min(chars, width)], casting="unsafe")
+    else:
+        matrix[:min(chars, width)] = used
+    return matrix, overflow
+
+def _to_str(value):
+    return value.decode("utf-8", "replace") if isinstance(value, bytes) else str(value)
+
+def _digits(codes):
+    return (codes >= 48) & (codes <= 57)
+
+def _no_gaps(filled, pad):
+    """
+    True for rows whose characters are contiguous from position 0.
+    """
+    return ~np.logical_or.reduce(filled[1:] & pad[:-1], axis=0)
+
+def _parse_dates(arr, present):
+    """
+    Bulk parse YYYY-MM-DD. Rows that are not exactly ten characters of that
+    shape go through validator._parse_date, so decisions match the per-record path.
+    Returns: Tuple of (ok mask, datetime64[D] array)
+    """
+    n = len(arr)
+    codes, overflow = _char_codes(arr, 10)
+    digit = _digits(codes)
+    canonical = (present & ~overflow & np.logical_and.reduce(digit[[0, 1, 2, 3, 5, 6, 8, 9]], axis=0)
+                 & (codes[4] == 45) & (codes[7] == 45))
+    codes = codes.astype(np.int16) - 48
+    year = codes[0] * 1000 + codes[1] * 100 + codes[2] * 10 + codes[3]
+    month = codes[5] * 10 + codes[6]
+    day = codes[8] * 10 + codes[9]
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    month_days = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])[np.clip(month, 0, 12)]
+    month_days = month_days + ((month == 2) & leap)
+    ok = canonical & (year >= 1) & (month >= 1) & (month <= 12) & (day >= 1) & (day <= month_days)
+
+    dates = np.full(n, np.datetime64("NaT"), dtype="datetime64[D]")
+    y, m, d = year[ok], month[ok], day[ok]
+    dates[ok] = (y - 1970).astype("datetime64[Y]").astype("datetime64[M]") + (m - 1) + (d - 1).astype("timedelta64[D]")
+
+    for i in np.flatnonzero(present & ~canonical):
+        try:
+            dates[i] = validator._parse_date(_to_str(arr[i]))
+            ok[i] = True
+        except ValueError:
+            pass
+    return ok, dates
+
+def _parse_quantities(arr, present):
+    """
+    Bulk parse positive integers. Anything but plain ASCII digits goes
+    through validator._parse_quantity.
+    Returns: Tuple of (ok mask, int64 array, or object array if a value overflows)
+    """
+    n = len(arr)
+    codes, overflow = _char_codes(arr, MAX_FAST_DIGITS + 1)
+    digit = _digits(codes)
+    pad = codes == 0
+    # digits then padding only, at most MAX_FAST_DIGITS of them
+    canonical = (present & ~overflow & np.logical_and.reduce(digit | pad, axis=0)
+                 & pad[MAX_FAST_DIGITS] & _no_gaps(digit, pad))
+    values = np.zeros(n, dtype=np.int64)
+    for j in range(MAX_FAST_DIGITS):
+        if not digit[j].any():
+            break
+        values = np.where(digit[j], values * 10 + (codes[j] - 48).astype(np.int64), values)
+    ok = canonical & (values > 0)
+    values[~ok] = 0
+
+    for i in np.flatnonzero(present & ~canonical):
+        try:
+            value = validator._parse_quantity(_to_str(arr[i]))
+        except ValueError:
+            continue
+        ok[i] = True
+        if not -2**63 <= value < 2**63 and values.dtype != object:
+            values = values.astype(object)
+        values[i] = value
+    return ok, values
+
+def _parse_prices(arr, present):
+    """
+    Bulk parse positive prices written as plain decimals (12, 12.5, .5)
+    with up to MAX_PRICE_DIGITS digits. Those are exactly mantissa / 10**k
+    in floating point, the same value float() gives. Anything else goes
+    through validator._parse_price.
+    Returns: Tuple of (ok mask, float64 array)
+    """
+    n = len(arr)
+    codes, overflow = _char_codes(arr, MAX_PRICE_DIGITS + 1)
+    digit = _digits(codes)
+    dot = codes == 46
+    pad = codes == 0
+    ndigits = digit.sum(axis=0)
+    canonical = (present & ~overflow & np.logical_and.reduce(digit | dot | pad, axis=0)
+                 & (dot.sum(axis=0) <= 1) & (ndigits >= 1) & (ndigits <= MAX_PRICE_DIGITS)
+                 & _no_gaps(digit | dot, pad))
+
+    mantissa = np.zeros(n, dtype=np.int64)
+    for j in range(MAX_PRICE_DIGITS + 1):
+        if not digit[j].any():
+            continue
+        mantissa = np.where(digit[j], mantissa * 10 + (codes[j] - 48).astype(np.int64), mantissa)
+    # digits after the dot: length - dot position - 1
+    has_dot = np.logical_or.reduce(dot, axis=0)
+    length = (~pad).sum(axis=0)
+    scale = 10.0 ** np.where(has_dot, length - dot.argmax(axis=0) - 1, 0)
+    ok = canonical & (mantissa > 0)
+    values = np.where(ok, mantissa / scale, np.nan)
+
+    for i in np.flatnonzero(present & ~canonical):
+        try:
+            values[i] = validator._parse_price(_to_str(arr[i]))
+            ok[i] = True
+        except ValueError:
+            pass
+    return ok, values
+
+def validate_columns(columns):
+    """
+    Validate a columnar batch of sales records in bulk.
+
+    columns maps each of date, store_id, product, quantity and price to a
+    NumPy str/bytes array (or any sequence of strings), all the same length.
+    Accept/reject decisions are the same as validator.validate_sales_record.
+
+    Returns: BatchValidation
+    """
+    arrays = [_as_text(columns[field]) for field in FIELDS]
+    n = len(arrays[0])
+    logger.debug(f"Validating batch of {n} rows")
+
+    present = [arr != ("" if arr.dtype.kind == "U" else b"") for arr in arrays]
+    date_ok, dates = _parse_dates(arrays[0], present[0])
+    quantity_ok, quantities = _parse_quantities(arrays[3], present[3])
+    price_ok, prices = _parse_prices(arrays[4], present[4])
+    field_ok = [date_ok, present[1], present[2], quantity_ok, price_ok]
+    mask = np.logical_and.reduce(field_ok)
+
+    # error table: missing where absent, invalid where present but failed
+    parts = []
+    for code, (has, ok) in enumerate(zip(present, field_ok)):
+        for reason, rows in ((MISSING, np.flatnonzero(~has)), (INVALID, np.flatnonzero(has & ~ok))):
+            if len(rows):
+                part = np.empty(len(rows), dtype=ERROR_DTYPE)
+                part["row"], part["field"], part["reason"] = rows, code, reason
+                parts.append(part)
+    errors = np.concatenate(parts) if parts else np.empty(0, dtype=ERROR_DTYPE)
+    errors = errors[np.lexsort((errors["field"], errors["row"]))]
+
+    logger.debug(f"Batch validated: {int(mask.sum())} valid, {n - int(mask.sum())} rejected")
+    return BatchValidation(mask, errors, dates, quantities, prices)
@@ -0,0 +1,293 @@
+import argparse, bz2, datetime, gzip, json, logging, lzma, multiprocessing, os, platform, resource, shutil, sys, tempfile, time
+import numpy as np
+import validator, batch_validator, records, file_reader, processor, synthetic, logger, queue_logging
+
+SUITE_SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+BASELINE_VERSION = 1
+REGRESSION_THRESHOLD = 0.2 # slowdown / memory growth over the baseline that counts as a regression
+
+def synthetic_columns(rows, error_rate=0.05, seed=0):
+    """
+    Returns: Dict mapping field name to a NumPy str array of sales rows,
+    see synthetic.generate_columns
+    """
+    return synthetic.generate_columns(rows, stores=200, products=500, error_rate=error_rate, seed=seed)
+
+def bench_batch_validation(rows):
+    """
+    Compare per-record validation against validate_columns on the same rows
+    and check that both accept and reject the same rows.
+    """
+    columns = synthetic_columns(rows)
+    records = [dict(zip(batch_validator.FIELDS, values)) for values in zip(*(columns[f].tolist() for f in batch_validator.FIELDS))]
+
+    start = time.perf_counter()
+    run = validator.ValidationRun()
+    accepted = [run.validate(record) for record in records]
+    scalar = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = batch_validator.validate_columns(columns)
+    vectorized = time.perf_counter() - start
+
+    same = bool(np.array_equal(result.mask, np.array(accepted)))
+    print(f"rows: {rows}, rejected: {run.rejected}, same decisions: {same}")
+    print(f"  per-record: {rows / scalar:>14,.0f} rows/sec")
+    print(f"  columnar:   {rows / vectorized:>14,.0f} rows/sec ({scalar / vectorized:.1f}x)")
+
+def _build_rows(kind, rows, queue):
+    """
+    Build rows of validated sales data in one representation and report
+    how much the peak RSS grew while doing it.
+    """
+    stores = [f"STORE{i:03d}" for i in range(200)]
+    products = [f"Product {i}" for i in range(500)]
+    dates = [datetime.date(2024, 1, 1) + datetime.timedelta(days=i) for i in range(366)]
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if kind == "batch":
+        held = records.SalesBatch()
+    else:
+        held = []
+    for i in range(rows):
+        date, store, product, quantity, price = dates[i % 366], stores[i % 200], products[i % 500], i % 50 + 1, (i % 9999 + 1) / 100
+        if kind == "dict":
+            held.append({"date": date, "store_id": store, "product": product, "quantity": quantity, "price": price, "total": quantity * price})
+        else:
+            held.append(records.SalesRecord(date, store, product, quantity, price))
+    queue.put((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) * 1024)
+
+def bench_record_memory(rows):
+    """
+    Peak RSS growth for holding validated rows as dicts (the old
+    representation), as SalesRecords and as a SalesBatch. Each is built in
+    its own process so the measurements don't affect each other.
+    """
+    print(f"rows: {rows}")
+    results = {}
+    for kind in ("dict", "record", "batch"):
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=_build_rows, args=(kind, rows, queue))
+        process.start()
+        results[kind] = queue.get()
+        process.join()
+        print(f"  {kind:<7} {results[kind] / 2**20:>9,.1f} MB peak RSS  {results[kind] / rows:>6.1f} bytes/row"
+              f"  ({results['dict'] / max(results[kind], 1):.1f}x smaller than dict)")
+
+def _read_all(filepath):
+    start = time.perf_counter()
+    rows = sum(1 for _ in file_reader.iter_csv_records(filepath))
+    return rows, time.perf_counter() - start
+
+def bench_compression(rows):
+    """
+    Read throughput of iter_csv_records on the same CSV uncompressed and
+    as gzip, bz2 and xz, plus the old route of decompressing the gzip to
+    disk first and reading the copy.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = os.path.join(tmp, "sales.csv")
+        synthetic.write_sales_file(plain, rows, stores=200, products=500)
+        size = os.path.getsize(plain)
+        paths = {"plain": plain}
+        for kind, module in (("gzip", gzip), ("bz2", bz2), ("xz", lzma)):
+            paths[kind] = f"{plain}.{kind}"
+            with open(plain, "rb") as src, module.open(paths[kind], "wb") as dst:
+                shutil.copyfileobj(src, dst, file_reader.CHUNK_SIZE)
+
+        print(f"rows: {rows}, uncompressed: {size / 2**20:.1f} MB")
+        for kind, path in paths.items():
+            read, seconds = _read_all(path)
+            print(f"  {kind:<14} {os.path.getsize(path) / 2**20:>7.1f} MB on disk  {read / seconds:>11,.0f} rows/sec"
+                  f"  {size / seconds / 2**20:>7.1f} MB/s")
+
+        start = time.perf_counter()
+        copy = os.path.join(tmp, "copy.csv")
+        with gzip.open(paths["gzip"], "rb") as src, open(copy, "wb") as dst:
+            shutil.copyfileobj(src, dst, file_reader.CHUNK_SIZE)
+        read, _ = _read_all(copy)
+        seconds = time.perf_counter() - start
+        print(f"  {'gunzip + read':<14} {'':>7}             {read / seconds:>11,.0f} rows/sec  {size / seconds / 2**20:>7.1f} MB/s")
+
+def _run_pipeline(input_path, output_dir, queue):
+    result = processor.process_sales_file(input_path, output_dir)
+    queue.put(result.to_dict())
+
+def _suite_input(data_dir, rows, seed):
+    """
+    Returns: Path of the synthetic input for rows, generated unless
+    data_dir already has it
+    """
+    path = os.path.join(data_dir, f"sales-{rows}-{seed}.csv")
+    if not os.path.exists(path):
+        start = time.perf_counter()
+        synthetic.write_sales_file(f"{path}.tmp", rows, seed=seed)
+        os.replace(f"{path}.tmp", path)
+        print(f"generated {path} in {time.perf_counter() - start:.1f}s")
+    return path
+
+def bench_stages(sizes, data_dir=None, seed=0):
+    """
+    Rows/sec and peak RSS of each pipeline stage (reading with
+    file_reader, validation, the transformer aggregations and the
+    report_writer outputs) on synthetic inputs of the given sizes
+    (keys of SUITE_SIZES). Each size runs process_sales_file in its own
+    process, so peak memory isn't carried over from a previous size.
+    Inputs are kept in data_dir if given, so later runs reuse them.
+
+    Returns: Dict mapping size to its result (ProcessingResult.to_dict())
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            rows = SUITE_SIZES[size]
+            input_path = _suite_input(data_dir or tmp, rows, seed)
+            output_dir = os.path.join(tmp, f"out-{size}")
+            os.makedirs(output_dir)
+            queue = multiprocessing.Queue()
+            process = multiprocessing.Process(target=_run_pipeline, args=(input_path, output_dir, queue))
+            process.start()
+            results[size] = queue.get()
+            process.join()
+            shutil.rmtree(output_dir)
+
+            result = results[size]
+            print(f"{size}: {result['rows']} rows in {result['seconds']:.2f}s, {result['rows_per_sec']:,.0f} rows/sec,"
+                  f" peak {result['peak_rss'] / 2**20:.1f} MB")
+            for name, stats in result["stages"].items():
+                print(f"  {name:<10} {stats['rows_per_sec']:>14,.0f} rows/sec  {stats['wall']:>8.2f}s"
+                      f"  peak {stats['peak_rss'] / 2**20:>8.1f} MB")
+    return results
+
+def save_baseline(filepath, results):
+    """
+    Write suite results as the baseline later runs are compared against,
+    with the machine they were taken on.
+    """
+    # input and output paths are temporary, leave them out
+    results = {size: {key: value for key, value in result.items() if key not in ("input_path", "output_dir")}
+               for size, result in results.items()}
+    with open(filepath, "w") as f:
+        json.dump({"version": BASELINE_VERSION, "machine": _machine(), "results": results}, f, indent=2)
+    print(f"baseline saved to {filepath}")
+
+def _machine():
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()}
+
+def compare_to_baseline(results, filepath, threshold=REGRESSION_THRESHOLD):
+    """
+    Compare suite results with the baseline in filepath, size by size and
+    stage by stage. A stage regressed if its rows/sec dropped, or its peak
+    RSS grew, by more than threshold (a fraction of the baseline).
+
+    Returns: List of regression descriptions, empty if there are none
+    """
+    with open(filepath) as f:
+        baseline = json.load(f)
+    if baseline.get("version") != BASELINE_VERSION:
+        raise ValueError(f"Unsupported baseline version: {baseline.get('version')}")
+    if baseline["machine"] != _machine():
+        print(f"warning: baseline was taken on another machine ({baseline['machine']}), expect noise")
+    regressions = []
+    for size, result in results.items():
+        if size not in baseline["results"]:
+            continue
+        expected = baseline["results"][size]
+        measured = {"total": result, **result["stages"]}
+        for name, before in {"total": expected, **expected["stages"]}.items():
+            after = measured[name]
+            if after["rows_per_sec"] < before["rows_per_sec"] * (1 - threshold):
+                regressions.append(f"{size} {name}: {after['rows_per_sec']:,.0f} rows/sec,"
+                                   f" baseline {before['rows_per_sec']:,.0f}")
+            if after["peak_rss"] > before["peak_rss"] * (1 + threshold):
+                regressions.append(f"{size} {name}: peak {after['peak_rss'] / 2**20:.1f} MB,"
+                                   f" baseline {before['peak_rss'] / 2**20:.1f} MB")
+    return regressions
+
+def _ns_per_call(call, calls):
+    start = time.perf_counter_ns()
+    for _ in range(calls):
+        call()
+    return (time.perf_counter_ns() - start) / calls
+
+def bench_logging(rows):
+    """
+    Cost of logging as seen by the caller: a disabled debug call with an
+    f-string message, the same call guarded by isEnabledFor, an enabled
+    call through the queue, and an enabled call through a plain file
+    handler (the old synchronous setup). Then the logging overhead per row
+    of the whole pipeline at INFO, against logging switched off (best
+    of three runs each).
+    """
+    record = {"date": "2024-01-01", "store_id": "STORE001", "product": "Product 1", "quantity": "3", "price": "9.99"}
+    calls = min(rows, 100_000)
+    with tempfile.TemporaryDirectory() as tmp:
+        queued = logger.setup_logger("benchmark.queued", "info")
+        queued.propagate = False
+        sync = logging.getLogger("benchmark.sync")
+        sync.setLevel(logging.INFO)
+        sync.propagate = False
+        handler = logging.FileHandler(os.path.join(tmp, "sync.log"))
+        handler.setFormatter(logging.Formatter(logger.LOG_FORMAT, datefmt=logger.DATE_FORMAT))
+        sync.addHandler(handler)
+        logger.log_to_file(os.path.join(tmp, "queued.log"))
+        queue_logging.console.setLevel(logging.WARNING) # keep the queued records off the terminal
+
+        def guarded():
+            if queued.isEnabledFor(logging.DEBUG):
+                queued.debug(f"Validated {record}")
+
+        print(f"calls: {calls}")
+        print(f"  debug, disabled, f-string   {_ns_per_call(lambda: queued.debug(f'Validated {record}'), calls):>8,.0f} ns/call")
+        print(f"  debug, disabled, guarded    {_ns_per_call(guarded, calls):>8,.0f} ns/call")
+        print(f"  info, queued                {_ns_per_call(lambda: queued.info('Validated %s', record), calls):>8,.0f} ns/call")
+        print(f"  info, synchronous file      {_ns_per_call(lambda: sync.info('Validated %s', record), calls):>8,.0f} ns/call")
+        logger.stop()
+
+        input_path = os.path.join(tmp, "sales.csv")
+        synthetic.write_sales_file(input_path, rows)
+        seconds = {"off": float("inf"), "info": float("inf")}
+        for i, mode in enumerate(("off", "info") * 3):
+            output_dir = os.path.join(tmp, f"out-{i}")
+            os.makedirs(output_dir)
+            logging.disable(logging.CRITICAL if mode == "off" else logging.NOTSET)
+            start = time.perf_counter()
+            processor.process_sales_file(input_path, output_dir)
+            seconds[mode] = min(seconds[mode], time.perf_counter() - start)
+            shutil.rmtree(output_dir)
+        logging.disable(logging.NOTSET)
+        logger.stop()
+        overhead = (seconds["info"] - seconds["off"]) / rows * 1e9
+        print(f"pipeline, {rows} rows: logging off {seconds['off']:.2f}s, at INFO {seconds['info']:.2f}s,"
+              f" {overhead:,.0f} ns/row overhead ({overhead * rows / 1e9 / seconds['off']:+.1%})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FileProcessing benchmarks")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("bench", nargs="?", choices=["validation", "memory", "compression", "suite", "logging"], default="validation")
+    parser.add_argument("--sizes", nargs="+", choices=list(SUITE_SIZES), default=list(SUITE_SIZES),
+                        help="suite input sizes")
+    parser.add_argument("--data-dir", help="keep suite inputs here to reuse them")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="suite baseline JSON")
+    parser.add_argument("--save-baseline", action="store_true", help="store suite results as the baseline")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+    if args.bench == "validation":
+        bench_batch_validation(args.rows)
+    elif args.bench == "compression":
+        bench_compression(args.rows)
+    elif args.bench == "logging":
+        bench_logging(args.rows)
+    elif args.bench == "suite":
+        results = bench_stages(args.sizes, args.data_dir)
+        if args.save_baseline:
+            save_baseline(args.baseline, results)
+        elif os.path.exists(args.baseline):
+            regressions = compare_to_baseline(results, args.baseline, args.threshold)
+            for regression in regressions:
+                print(f"REGRESSION {regression}")
+            if regressions:
+                sys.exit(1)
+            print(f"no regressions over {args.threshold:.0%} against {args.baseline}")
+    else:
+        bench_record_memory(args.rows)
@@ -0,0 +1,173 @@
+import logger, records, validator, error_collector
+import hashlib, json, mmap, os, shutil
+from array import array
+
+logger = logger.setup_logger(__name__, "info")
+
+CACHE_VERSION = 2
+ERROR_LOG_FILE = "errors.txt"
+SAMPLE_BLOCKS = 16 # blocks hashed from across the file for the quick content check
+SAMPLE_BLOCK_SIZE = 64 * 1024
+ALIGNMENT = 8
+
+# SalesBatch attribute -> array typecode, in file order
+COLUMNS = (("dates", "i"), ("store_codes", "I"), ("product_codes", "I"), ("quantities", "q"), ("prices", "d"))
+
+def _sample_hash(filepath, size):
+    """
+    Hash the first, last and SAMPLE_BLOCKS evenly spaced blocks of a file.
+    Cheap enough to check on every lookup, even for multi-GB inputs.
+    """
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(filepath, "rb") as f:
+        step = max(size // (SAMPLE_BLOCKS + 1), 1)
+        for offset in sorted({0, *range(step, size, step), max(size - SAMPLE_BLOCK_SIZE, 0)}):
+            f.seek(offset)
+            digest.update(f.read(SAMPLE_BLOCK_SIZE))
+    return digest.hexdigest()
+
+def _file_key(filepath):
+    """
+    Returns: Dict of path, size and mtime identifying the input version
+    """
+    stat = os.stat(filepath)
+    return {"path": os.path.abspath(filepath), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def _entry_dir(cache_dir, filepath):
+    name = hashlib.blake2b(os.path.abspath(filepath).encode(), digest_size=8).hexdigest()
+    return os.path.join(cache_dir, name)
+
+def save_run(cache_dir, input_path, run, error_log=None):
+    """
+    Store a validated run (its SalesBatch, error counts and samples) for
+    input_path, with a copy of the error log the run's errors were
+    written to. The entry is keyed by the input's path, size, mtime and
+    sampled content hash (see _sample_hash).
+    Returns: True if the entry was written
+    """
+    batch = run.valid_records
+    if not isinstance(batch.quantities, array):
+        logger.warning(f"Not caching {input_path}: quantities too large for a binary column")
+        return False
+    if len(run.errors) and error_log is None:
+        logger.warning(f"Not caching {input_path}: no error log to cache with its errors")
+        return False
+    key = _file_key(input_path)
+    key["sample_hash"] = _sample_hash(input_path, key["size"])
+
+    entry = _entry_dir(cache_dir, input_path)
+    tmp = f"{entry}.tmp{os.getpid()}"
+    logger.debug(f"Writing cache entry for {input_path} to {entry}")
+    try:
+        os.makedirs(tmp, exist_ok=True)
+        columns = {}
+        offset = 0
+        with open(os.path.join(tmp, "columns.bin"), "wb") as f:
+            for name, typecode in COLUMNS:
+                column = getattr(batch, name)
+                data = memoryview(column).cast("B") if len(column) else b""
+                columns[name] = {"typecode": typecode, "offset": offset, "length": len(column)}
+                f.write(data)
+                offset += len(data)
+                pad = -offset % ALIGNMENT
+                f.write(b"\0" * pad)
+                offset += pad
+        meta = {
+            "version": CACHE_VERSION,
+            "key": key,
+            "rows": len(batch),
+            "columns": columns,
+            "stores": batch.stores.values,
+            "products": batch.products.values,
+            "lines": run.lines,
+            "rejected": run.rejected,
+            "errors": {"counts": run.errors.summary(), "samples": [error_collector.error_to_dict(e) for e in run.errors.samples]},
+        }
+        if error_log is not None:
+            shutil.copyfile(error_log, os.path.join(tmp, ERROR_LOG_FILE))
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp, entry)
+    except OSError as e:
+        logger.error(f"Could not write cache entry for {input_path}: {e}")
+        shutil.rmtree(tmp, ignore_errors=True)
+        return False
+    logger.info(f"Cached {len(batch)} validated rows for {input_path}")
+    return True
+
+def load_run(cache_dir, input_path):
+    """
+    Load the cached run for input_path if the input has not changed.
+
+    Size, mtime and a sampled content hash are checked. Columns are
+    memory-mapped, not read, so loading costs about the same for any file
+    size; close_run() unmaps them once the run is no longer needed.
+
+    The full error log of the run is at cached_error_log().
+
+    Returns: validator.ValidationRun, or None on a cache miss
+    """
+    entry = _entry_dir(cache_dir, input_path)
+    try:
+        with open(os.path.join(entry, "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        logger.debug(f"No cache entry for {input_path}")
+        return None
+
+    key = _file_key(input_path)
+    cached = meta.get("key", {})
+    if meta.get("version") != CACHE_VERSION or any(cached.get(k) != v for k, v in key.items()):
+        logger.info(f"Cache entry for {input_path} is stale")
+        return None
+    if cached["sample_hash"] != _sample_hash(input_path, key["size"]):
+        logger.info(f"Cache entry for {input_path} is stale (content changed)")
+        return None
+
+    batch = records.SalesBatch()
+    if meta["rows"]:
+        with open(os.path.join(entry, "columns.bin"), "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with memoryview(mm) as view:
+            for name, typecode in COLUMNS:
+                column = meta["columns"][name]
+                size = column["length"] * array(typecode).itemsize
+                setattr(batch, name, view[column["offset"]:column["offset"] + size].cast(typecode))
+    for value in meta["stores"]:
+        batch.stores.encode(value)
+    for value in meta["products"]:
+        batch.products.encode(value)
+
+    run = validator.ValidationRun()
+    run.valid_records = batch
+    run.lines = meta["lines"]
+    run.rejected = meta["rejected"]
+    run.errors.add_counts(meta["errors"]["counts"])
+    run.errors.samples = [error_collector.error_from_dict(e) for e in meta["errors"]["samples"]]
+    logger.info(f"Loaded {meta['rows']} validated rows for {input_path} from cache")
+    return run
+
+def close_run(run):
+    """
+    Release the memory-mapped columns of a run from load_run() and close
+    the map. The run's valid_records can't be read afterwards; its counts
+    and error samples still can.
+    """
+    batch = run.valid_records
+    maps = set()
+    for name, _ in COLUMNS:
+        column = getattr(batch, name)
+        if isinstance(column, memoryview):
+            maps.add(column.obj)
+            column.release()
+    for mm in maps:
+        mm.close()
+
+def cached_error_log(cache_dir, input_path):
+    """
+    Returns: Path of the error log stored with input_path's cache entry,
+    or None if it has none (the run had no errors)
+    """
+    path = os.path.join(_entry_dir(cache_dir, input_path), ERROR_LOG_FILE)
+    return path if os.path.exists(path) else None
@@ -0,0 +1,27 @@
+import pytest
+import os
+
+OUTPUTS = ("clean_records.csv", "error_log.txt", "aggregates.json", "summary_report.txt")
+
+@pytest.fixture
+def read_outputs():
+    """Function returning the outputs of a run, without the summary's timestamp line."""
+
+    def read(output_dir):
+        outputs = {}
+        for name in OUTPUTS:
+            with open(os.path.join(output_dir, name)) as f:
+                outputs[name] = [line for line in f if not line.startswith("Generated:")]
+        return outputs
+    return read
+
+@pytest.fixture
+def run_file(read_outputs):
+    """Function processing a file into a new output directory, returning (result, outputs)."""
+
+    import processor
+    def run(input_path, output_dir, **options):
+        os.makedirs(output_dir)
+        result = processor.process_sales_file(str(input_path), str(output_dir), **options)
+        return result, read_outputs(output_dir)
+    return run
@@ -0,0 +1,132 @@
+import logger, exceptions
+import os, pickle, tempfile
+
+logger = logger.setup_logger(__name__, "info")
+
+DEFAULT_MAX_SAMPLES = 100
+
+ERROR_TYPES = {cls.__name__: cls for cls in (exceptions.FileProcessingError, exceptions.InvalidDataError, exceptions.MissingFieldError)}
+
+def error_to_dict(e):
+    """
+    Returns: JSON-serializable dict that error_from_dict turns back into the error
+    """
+    _, args, state = e.__reduce__()
+    return {"type": type(e).__name__, "args": list(args), "state": state}
+
+def error_from_dict(data):
+    e = ERROR_TYPES[data["type"]](*data["args"])
+    e.__dict__.update(data["state"])
+    return e
+
+class ErrorCollector:
+    """
+    Bounded record of validation errors.
+
+    Keeps a count per (field, error type), the total, and the first
+    max_samples errors (with their line numbers) as samples. Every error
+    is also passed to sink.write() if a sink is given (e.g. a
+    report_writer.ErrorLogWriter), so the full list reaches disk without
+    being held in memory: memory stays O(distinct error kinds).
+
+    len() is the total number of errors and iterating yields the samples,
+    so a collector can be used where a list of errors was before.
+    """
+    def __init__(self, max_samples=DEFAULT_MAX_SAMPLES, sink=None):
+        self.max_samples = max_samples
+        self.sink = sink
+        self.counts = {} # (field, error type name) -> errors
+        self.samples = []
+        self.total = 0
+
+    def __len__(self):
+        return self.total
+
+    def __iter__(self):
+        return iter(self.samples)
+
+    def add(self, error):
+        key = (error.field, type(error).__name__)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.total += 1
+        if len(self.samples) < self.max_samples:
+            self.samples.append(error)
+        if self.sink is not None:
+            self.sink.write(error)
+
+    def extend(self, errors):
+        for error in errors:
+            self.add(error)
+
+    def merge(self, other, line_offset=0):
+        """
+        Add the counts and samples of a collector over the records that
+        come right after this one's. The other's sample line numbers are
+        shifted by line_offset. Its sink is not replayed, see replay_spill.
+        Returns: The collector itself
+        """
+        for e in other.samples:
+            if e.line_number is not None:
+                e.line_number += line_offset
+        room = self.max_samples - len(self.samples)
+        self.samples.extend(other.samples[:max(room, 0)])
+        self.add_counts(other.counts)
+        return self
+
+    def add_counts(self, counts):
+        """
+        Add counts from another collector (or its saved summary()) without samples.
+        """
+        if isinstance(counts, list):
+            counts = {(field, kind): n for field, kind, n in counts}
+        for key, n in counts.items():
+            self.counts[key] = self.counts.get(key, 0) + n
+            self.total += n
+
+    def summary(self):
+        """
+        Returns: JSON-serializable list of [field, error type, count],
+        most frequent first
+        """
+        return [[field, kind, n] for (field, kind), n in sorted(self.counts.items(), key=lambda item: -item[1])]
+
+    def log_summary(self, log=logger):
+        """
+        One log line per error kind instead of one per error.
+        """
+        for field, kind, n in self.summary():
+            log.warning(f"{n} x {kind}" + (f" ({field})" if field else ""))
+
+class ErrorSpill:
+    """
+    Sink that pickles errors to a temporary file, so a worker process can
+    hand back all of its errors without keeping them in memory.
+    """
+    def __init__(self, directory=None):
+        fd, self.path = tempfile.mkstemp(prefix="errors-", suffix=".pickle", dir=directory)
+        self.file = os.fdopen(fd, "wb")
+
+    def write(self, error):
+        pickle.dump(error, self.file, pickle.HIGHEST_PROTOCOL)
+
+    def close(self):
+        self.file.close()
+
+def replay_spill(path, sink, line_offset=0):
+    """
+    Pass the errors in an ErrorSpill file to sink in order, shifting
+    their line numbers by line_offset, then delete the file.
+    """
+    try:
+        with open(path, "rb") as f:
+            while True:
+                try:
+                    error = pickle.load(f)
+                except EOFError:
+                    break
+                if error.line_number is not None:
+                    error.line_number += line_offset
+                if sink is not None:
+                    sink.write(error)
+    finally:
+        os.remove(path)
@@ -1,18 +1,53 @@
 class FileProcessingError(Exception):
     """Base exception for file processing errors."""
+    line_number = None # set by the validator for errors tied to a row
+    field = None # the record field the error is about, if any
+
     def __init__(self, message = "An error occured processing the file"):
-        self.message = message
+        self._message = message
         super().__init__(message)
 
+    @property
+    def message(self):
+        return self._message
+
+    def __str__(self):
+        if self.line_number is None:
+            return self.message
+        return f"Line {self.line_number}: {self.message}"
+
+    def __reduce__(self):
+        # rebuild from the constructor arguments so errors can cross process boundaries
+        return (type(self), (self.message,), self.__dict__)
+
 class InvalidDataError(FileProcessingError):
     """Raised when data validation fails."""
-    def __init__(self, value, expected_type):
+    def __init__(self, value, expected_type, field=None):
+        # the message is only formatted when asked for, most errors are counted, not printed
+        Exception.__init__(self, value, expected_type)
         self.value = value
         self.expected_type = expected_type
-        super().__init__(f"Value '{value}' is an invalid {expected_type}")
+        self.field = field
+
+    @property
+    def message(self):
+        return f"Value '{self.value}' is an invalid {self.expected_type}"
+
+    def __reduce__(self):
+        return (type(self), (self.value, self.expected_type), self.__dict__)
 
 class MissingFieldError(FileProcessingError):
     """Raised when a required field is missing."""
     def __init__(self, field):
+        Exception.__init__(self, field)
         self.field = field
-        super().__init__(f"Missing field: {field}")
\ No newline at end of file
+
+    @property
+    def message(self):
+        return f"Missing field: {self.field}"
+
+    def __reduce__(self):
+        return (type(self), (self.field,), self.__dict__)
+
+class MultilineRecordError(FileProcessingError):
+    """Raised when a byte range can't be read on its own: a record spans lines."""
@@ -1,57 +1,443 @@
+import bz2, contextlib, csv, gzip, lzma, mmap, os
 import logger
-import exceptions
+import exceptions, interning
 
 logger = logger.setup_logger(__name__, "info")
 
+CHUNK_SIZE = 1024 * 1024 # bytes read from disk at a time
+INTERN_COLUMNS = ("date", "store_id", "product") # few distinct values per file
+OFFSET_FIELD = "_offset" # added to records when positions are tracked
+RAW_FIELD = "_raw"
+
+# leading bytes of each supported compressed format
+COMPRESSION_MAGIC = ((b"\x1f\x8b", "gzip"), (b"BZh", "bz2"), (b"\xfd7zXZ\x00", "xz"))
+COMPRESSED_SUFFIXES = (".gz", ".bz2", ".xz")
+_DECOMPRESSORS = {
+    "gzip": lambda raw: gzip.GzipFile(fileobj=raw, mode="rb"),
+    "bz2": bz2.BZ2File,
+    "xz": lzma.LZMAFile,
+}
+
+def _iter_raw_lines(f, chunk_size, limit=None):
+    """
+    Yield raw byte lines (newline included) from a binary file object,
+    reading at most limit bytes if given.
+    Only one chunk plus the current partial line is held in memory.
+    """
+    tail = b""
+    while True:
+        if limit is not None:
+            chunk = f.read(min(chunk_size, limit))
+            limit -= len(chunk)
+        else:
+            chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        buf = tail + chunk
+        start = 0
+        while True:
+            end = buf.find(b"\n", start)
+            if end < 0:
+                break
+            yield buf[start:end + 1]
+            start = end + 1
+        tail = buf[start:]
+    if tail:
+        yield tail
+
+def _compression_of(head):
+    for magic, kind in COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return kind
+    return None
+
+def detect_compression(filepath):
+    """
+    Identify a compressed file by its magic bytes, whatever its name.
+    Returns: "gzip", "bz2", "xz", or None for an uncompressed file
+    Raises: FileProcessingError if the file can't be read
+    """
+    try:
+        with open(filepath, "rb") as f:
+            return _compression_of(f.read(6))
+    except FileNotFoundError as e:
+        logger.error(f"File not found error: {e}")
+        raise exceptions.FileProcessingError(f"File not found: {filepath}") from e
+    except OSError as e:
+        logger.error(f"OS error: {e}")
+        raise exceptions.FileProcessingError(f"Could not read {filepath}: {e}") from e
+
+@contextlib.contextmanager
+def open_input(filepath, chunk_size=CHUNK_SIZE):
+    """
+    Open a file for binary reading, decompressing gzip, bz2 or xz on the
+    fly. The compressed bytes are read from disk chunk_size at a time.
+    """
+    with open(filepath, "rb", buffering=chunk_size) as raw:
+        kind = _compression_of(raw.peek(6)[:6])
+        if kind is None:
+            yield raw
+            return
+        logger.debug(f"Decompressing {filepath} ({kind})")
+        with _DECOMPRESSORS[kind](raw) as f:
+            yield f
+
+class _LineDecoder:
+    """
+    Decode raw lines, switching to the fallback encoding for the rest of
+    the file at the first line that fails to decode.
+
+    Given the byte offset of the first line, it also keeps the text and
+    offset of the lines read since the last take(), so a caller can find
+    where each csv row (which may span lines) came from.
+    """
+    def __init__(self, raw_lines, encoding, fallback_encoding, offset=None):
+        self.raw_lines = raw_lines
+        self.encoding = encoding
+        self.fallback_encoding = fallback_encoding
+        self.switched = False
+        self.non_ascii = False # non-ascii text decoded before switching
+        self.offset = offset # None when not tracking positions
+        self.pending = []
+        self.pending_bytes = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        raw = next(self.raw_lines)
+        try:
+            line = raw.decode(self.encoding)
+        except UnicodeDecodeError as e:
+            if self.encoding == self.fallback_encoding:
+                raise
+            logger.warning(f"UnicodeDecodeError: {e}, falling back to {self.fallback_encoding}")
+            self.encoding = self.fallback_encoding
+            self.switched = True
+            line = raw.decode(self.encoding)
+        else:
+            if not self.switched and len(line) != len(raw):
+                self.non_ascii = True
+        if self.offset is not None:
+            self.pending.append(line)
+            self.pending_bytes += len(raw)
+        return line
+
+    def take(self):
+        """
+        Returns: Tuple of (byte offset, text) of the lines read since the last call
+        """
+        start, text = self.offset, "".join(self.pending)
+        self.offset += self.pending_bytes
+        self.pending = []
+        self.pending_bytes = 0
+        return start, text
+
+def _iter_mapped_lines(mm, start, end):
+    """
+    Yield raw byte lines from mm[start:end] without copying whole chunks.
+    """
+    while start < end:
+        nl = mm.find(b"\n", start, end)
+        stop = end if nl < 0 else nl + 1
+        yield mm[start:stop]
+        start = stop
+
+def _iter_rows(reader, header, interner=None, tracker=None):
+    """
+    Turn csv rows into dictionaries keyed by header, skipping blank lines
+    and padding short rows with "". With an interner, values of the
+    INTERN_COLUMNS share one string object per distinct value. With a
+    tracker (the position-tracking _LineDecoder under reader), each record
+    also gets its byte offset and raw text as OFFSET_FIELD and RAW_FIELD.
+    """
+    width = len(header)
+    positions = [i for i, name in enumerate(header) if name in INTERN_COLUMNS] if interner is not None else []
+    for row in reader:
+        if tracker is not None:
+            offset, raw = tracker.take()
+        if not row:
+            continue
+        if len(row) < width:
+            row += [""] * (width - len(row))
+        for i in positions:
+            row[i] = interner.intern(row[i])
+        record = dict(zip(header, row))
+        if tracker is not None:
+            record[OFFSET_FIELD] = offset
+            record[RAW_FIELD] = raw
+        yield record
+
+def _single_line_rows(reader):
+    """
+    Pass csv rows through, checking that each one is a single line.
+    Raises: MultilineRecordError at a row spanning lines (a newline in a
+    quoted field), or a quoted field still open at the end of the input
+    """
+    row = None
+    for n, row in enumerate(reader, 1):
+        if reader.line_num != n:
+            raise exceptions.MultilineRecordError(f"Record ending on line {reader.line_num} spans several lines")
+        yield row
+    if row and row[-1].endswith("\n"):
+        raise exceptions.MultilineRecordError("Quoted field still open at the end of the range")
+
+def _parse_header(header):
+    header = [name.strip() for name in header]
+    header[0] = header[0].lstrip("\ufeff") # utf-8 byte order mark
+    return header
+
+def iter_csv_records(filepath, chunk_size=CHUNK_SIZE, encoding="utf-8", fallback_encoding="latin-1", interner=None,
+                     track_positions=False):
+    """
+    Stream a CSV file one record at a time.
+
+    - Column names are taken from the header row
+    - Quoted fields (commas, quotes and newlines inside quotes) are handled
+    - Bytes are decoded as utf-8, switching to latin-1 on the first bad line
+    - Blank lines are skipped, short rows are padded with ""
+    - Empty files yield nothing
+    - Repeated date/store_id/product values are shared through interner
+      (an interning.Interner) when one is given
+    - gzip, bz2 and xz files are decompressed as they are read
+    - With track_positions, each record also holds its byte offset
+      (OFFSET_FIELD, in the decompressed stream) and raw text (RAW_FIELD)
+
+    Yields: One dictionary per data row
+    Raises: FileProcessingError with descriptive message
+    """
+    logger.debug(f"Attempting to stream csv file {filepath}")
+    try:
+        with open_input(filepath, chunk_size) as f:
+            decoder = _LineDecoder(_iter_raw_lines(f, chunk_size), encoding, fallback_encoding,
+                                   0 if track_positions else None)
+            reader = csv.reader(decoder)
+            header = next(reader, None)
+            if header is None:
+                logger.info(f"File is empty: {filepath}")
+                return
+            tracker = None
+            if track_positions:
+                decoder.take() # the header line
+                tracker = decoder
+            rows = 0
+            for record in _iter_rows(reader, _parse_header(header), interner, tracker):
+                rows += 1
+                yield record
+    except FileNotFoundError as e:
+        logger.error(f"File not found error: {e}")
+        raise exceptions.FileProcessingError(f"File not found: {filepath}") from e
+    except UnicodeDecodeError as e:
+        logger.error(f"UnicodeDecodeError: {e}")
+        raise exceptions.FileProcessingError(f"Could not decode {filepath}: {e}") from e
+    except csv.Error as e:
+        logger.error(f"CSV error: {e}")
+        raise exceptions.FileProcessingError(f"Malformed CSV in {filepath}: {e}") from e
+    except (EOFError, lzma.LZMAError) as e:
+        logger.error(f"Decompression error: {e}")
+        raise exceptions.FileProcessingError(f"Corrupt or truncated compressed file {filepath}: {e}") from e
+    except OSError as e:
+        # also bad gzip/bz2 data
+        logger.error(f"OS error: {e}")
+        raise exceptions.FileProcessingError(f"Could not read {filepath}: {e}") from e
+    logger.info(f"File successfully read: {filepath} ({rows} rows)")
+
 def read_csv_file(filepath):
     """
     Read a CSV file and return a list of dictionaries.
-    
+
     Should handle:
     - FileNotFoundError
     - UnicodeDecodeError (try utf-8, then latin-1)
     - Empty files
-    
+
     Returns: List of dictionaries (one per row)
     Raises: FileProcessingError with descriptive message
     """
-    logger.debug(f"Attempting to read csv file {filepath}")
-    d_list = [] # list to return
+    return list(iter_csv_records(filepath, interner=interning.Interner()))
+
+def split_byte_ranges(filepath, parts, encoding="utf-8", fallback_encoding="latin-1"):
+    """
+    Memory-map a CSV file and cut the data rows into at most `parts`
+    byte ranges, each starting and ending on a line boundary.
+
+    Boundaries are not quote-aware: for a file with newlines inside quoted
+    fields a range can start or end inside a record, which read_csv_range
+    detects. The file must not be compressed.
 
+    Returns: Tuple of (header column names, list of (start, end) offsets,
+    encoding to read the data rows with)
+    """
+    if os.path.getsize(filepath) == 0:
+        return [], [], encoding
+    with open(filepath, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        size = len(mm)
+        nl = mm.find(b"\n")
+        data_start = size if nl < 0 else nl + 1
+        decoder = _LineDecoder(iter([mm[:data_start]]), encoding, fallback_encoding)
+        header = _parse_header(next(csv.reader(decoder), [""]))
+        step = max((size - data_start) // max(parts, 1), 1)
+        ranges = []
+        start = data_start
+        while start < size:
+            nl = mm.find(b"\n", min(start + step, size) - 1)
+            end = size if nl < 0 else nl + 1
+            ranges.append((start, end))
+            start = end
+    return header, ranges, decoder.encoding
+
+def read_csv_range(filepath, start, end, fieldnames, encoding="utf-8", fallback_encoding="latin-1", interner=None):
+    """
+    Read the records in one byte range from split_byte_ranges,
+    interning values like iter_csv_records.
+
+    Returns: Tuple of (list of dictionaries, whether the fallback encoding
+    was switched to, whether non-ascii text was decoded before that)
+    Raises: MultilineRecordError if a record spans lines, since the range
+    may then cut through one (read such files with iter_csv_records);
+    FileProcessingError with descriptive message
+    """
+    logger.debug(f"Reading bytes {start}-{end} of {filepath}")
     try:
-        with open(filepath, "r") as f:
-            # split the contents by line
-            contents = f.read()
-            logger.debug(f"contents: {contents}")
-            contents = contents.split("\n")
-            logger.debug(f"File read and split: {contents}")
-            # go through the file, line by line
-            for i, line in enumerate(contents):
-                logger.debug(f"Line {i}: {line}")
-                if i == 0:
-                    continue # ignore column names
-                line = line.split(",")
-                entry = {
-                    "date": line[0],
-                    "store_id": line[1],
-                    "product": line[2],
-                    "quantity": line[3],
-                    "price": line[4]
-                }
-
-                d_list.append(entry)
-                logger.debug(f"Entry appended: {entry}")
+        with open(filepath, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            decoder = _LineDecoder(_iter_mapped_lines(mm, start, end), encoding, fallback_encoding)
+            records = list(_iter_rows(_single_line_rows(csv.reader(decoder)), fieldnames, interner))
+    except UnicodeDecodeError as e:
+        logger.error(f"UnicodeDecodeError: {e}")
+        raise exceptions.FileProcessingError(f"Could not decode {filepath}: {e}") from e
+    except csv.Error as e:
+        logger.error(f"CSV error: {e}")
+        raise exceptions.FileProcessingError(f"Malformed CSV in {filepath}: {e}") from e
+    except OSError as e:
+        logger.error(f"OS error: {e}")
+        raise exceptions.FileProcessingError(f"Could not read {filepath}: {e}") from e
+    return records, decoder.switched, decoder.non_ascii
+
+def read_header(filepath, encoding="utf-8", fallback_encoding="latin-1"):
+    """
+    Read only the header line of a CSV file.
+    Returns: Tuple of (column names, raw header bytes, encoding to read
+    the data rows with); ([], b"", encoding) for an empty file
+    Raises: FileProcessingError with descriptive message
+    """
+    try:
+        with open(filepath, "rb") as f:
+            raw = f.readline()
+    except OSError as e:
+        logger.error(f"OS error: {e}")
+        raise exceptions.FileProcessingError(f"Could not read {filepath}: {e}") from e
+    if not raw:
+        return [], raw, encoding
+    decoder = _LineDecoder(iter([raw]), encoding, fallback_encoding)
+    return _parse_header(next(csv.reader(decoder), [""])), raw, decoder.encoding
+
+def complete_lines_end(filepath, start, chunk_size=CHUNK_SIZE):
+    """
+    Find where the last complete (newline-terminated) line ends, so a
+    line that is still being appended to is left for the next read.
+    Returns: Offset just past the last newline at or after start, or
+    start if there is none
+    """
+    with open(filepath, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        while end > start:
+            pos = max(end - chunk_size, start)
+            f.seek(pos)
+            nl = f.read(end - pos).rfind(b"\n")
+            if nl >= 0:
+                return pos + nl + 1
+            end = pos
+    return start
+
+def iter_csv_range(filepath, start, end, fieldnames, encoding="utf-8", fallback_encoding="latin-1", interner=None,
+                   state=None, chunk_size=CHUNK_SIZE, track_positions=False):
+    """
+    Stream the records in bytes start-end of a CSV file, like
+    iter_csv_records but with the column names given rather than read.
+    Unlike read_csv_range, the range is read in chunks, not mapped.
+    Offsets are into the raw file, so it must not be compressed.
+
+    If a state dict is given, its "encoding" is set to the encoding in use
+    once the range has been read (the fallback, if it was switched to).
+    track_positions works as in iter_csv_records.
+
+    Yields: One dictionary per data row
+    Raises: FileProcessingError with descriptive message
+    """
+    logger.debug(f"Streaming bytes {start}-{end} of {filepath}")
+    try:
+        with open(filepath, "rb") as f:
+            f.seek(start)
+            decoder = _LineDecoder(_iter_raw_lines(f, chunk_size, end - start), encoding, fallback_encoding,
+                                   start if track_positions else None)
+            yield from _iter_rows(csv.reader(decoder), fieldnames, interner, decoder if track_positions else None)
     except FileNotFoundError as e:
         logger.error(f"File not found error: {e}")
+        raise exceptions.FileProcessingError(f"File not found: {filepath}") from e
     except UnicodeDecodeError as e:
         logger.error(f"UnicodeDecodeError: {e}")
-    except exceptions.FileProcessingError as e:
-        logger.error(f"FileProcessingError: {e}")
-    except Exception as e:
-        logger.error(f"Other exception: {e}")
-    else:
-        logger.info(f"File successfully read:  {filepath}")
-    return d_list
+        raise exceptions.FileProcessingError(f"Could not decode {filepath}: {e}") from e
+    except csv.Error as e:
+        logger.error(f"CSV error: {e}")
+        raise exceptions.FileProcessingError(f"Malformed CSV in {filepath}: {e}") from e
+    except OSError as e:
+        logger.error(f"OS error: {e}")
+        raise exceptions.FileProcessingError(f"Could not read {filepath}: {e}") from e
+    if state is not None:
+        state["encoding"] = decoder.encoding
+
+def parse_record(text, fieldnames, offset=None):
+    """
+    Parse one record's raw text (e.g. a quarantined row) like the readers
+    do, keeping offset and text as OFFSET_FIELD and RAW_FIELD.
+    Returns: Dictionary, or None if the text holds no row
+    Raises: FileProcessingError if the text is not valid CSV
+    """
+    try:
+        row = next((row for row in csv.reader(text.splitlines(keepends=True)) if row), None)
+    except csv.Error as e:
+        raise exceptions.FileProcessingError(f"Malformed CSV record at offset {offset}: {e}") from e
+    if row is None:
+        return None
+    row += [""] * (len(fieldnames) - len(row))
+    record = dict(zip(fieldnames, row))
+    record[OFFSET_FIELD] = offset
+    record[RAW_FIELD] = text
+    return record
+
+def iter_records_at(filepath, offsets, fieldnames, encoding="utf-8", fallback_encoding="latin-1"):
+    """
+    Read the single record starting at each byte offset (as recorded by
+    track_positions), seeking straight to it. Each record is decoded on
+    its own, falling back to fallback_encoding if it is not valid in
+    encoding. The file must not be compressed.
+
+    offsets may be any iterable; it is consumed one offset at a time.
+
+    Yields: One dictionary per offset, with OFFSET_FIELD and RAW_FIELD,
+    or None where no row starts at that offset any more (it is past the
+    end, or not just after a newline, e.g. the rows before it moved)
+    Raises: FileProcessingError with descriptive message
+    """
+    try:
+        with open(filepath, "rb") as f:
+            for offset in offsets:
+                # a data row starts right after a newline, the header's at least
+                f.seek(max(offset - 1, 0))
+                if offset <= 0 or f.read(1) != b"\n":
+                    yield None
+                    continue
+                decoder = _LineDecoder(_iter_raw_lines(f, 4096), encoding, fallback_encoding, offset)
+                yield next(_iter_rows(csv.reader(decoder), fieldnames, tracker=decoder), None)
+    except FileNotFoundError as e:
+        logger.error(f"File not found error: {e}")
+        raise exceptions.FileProcessingError(f"File not found: {filepath}") from e
+    except csv.Error as e:
+        logger.error(f"CSV error: {e}")
+        raise exceptions.FileProcessingError(f"Malformed CSV in {filepath}: {e}") from e
+    except OSError as e:
+        logger.error(f"OS error: {e}")
+        raise exceptions.FileProcessingError(f"Could not read {filepath}: {e}") from e
 
 # test cases
 # read_csv_file("WilsonL/FileProcessing/data/nice_sales.csv") #.csv with perfect sales data
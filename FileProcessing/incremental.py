@@ -0,0 +1,201 @@
+import logger, file_reader, validator, transformer, report_writer, metrics
+import contextlib, hashlib, itertools, json, os
+
+logger = logger.setup_logger(__name__, "info")
+
+CHECKPOINT_VERSION = 2
+CHECKPOINT_FILE = "checkpoint.json"
+CLEAN_FILE = "clean_records.csv"
+ERROR_FILE = "error_log.txt"
+SUMMARY_FILE = "summary_report.txt"
+AGGREGATES_FILE = "aggregates.json"
+QUARANTINE_FILE = "quarantine.jsonl"
+TAIL_BYTES = 4096 # bytes before the checkpoint offset re-hashed to detect a rewritten file
+
+def _hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def _tail_hash(filepath, offset):
+    """
+    Hash the TAIL_BYTES already processed just before offset.
+    """
+    with open(filepath, "rb") as f:
+        f.seek(max(offset - TAIL_BYTES, 0))
+        return _hash(f.read(min(offset, TAIL_BYTES)))
+
+def _byte_at(filepath, offset):
+    with open(filepath, "rb") as f:
+        f.seek(offset)
+        return f.read(1)
+
+def _withheld_hash(filepath, start, end):
+    with open(filepath, "rb") as f:
+        f.seek(start)
+        return _hash(f.read(end - start))
+
+def load_checkpoint(output_dir):
+    """
+    Returns: The checkpoint dict saved in output_dir, or None if there is
+    no usable one
+    """
+    try:
+        with open(os.path.join(output_dir, CHECKPOINT_FILE)) as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if checkpoint.get("version") != CHECKPOINT_VERSION:
+        return None
+    return checkpoint
+
+def save_checkpoint(output_dir, checkpoint):
+    """
+    Write the checkpoint atomically, so an interrupted run leaves the
+    previous one in place.
+    """
+    path = os.path.join(output_dir, CHECKPOINT_FILE)
+    tmp = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(tmp, "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.error(e)
+        raise
+
+def output_sizes(output_dir):
+    """
+    Returns: Dict of the sizes of the outputs that are appended to
+    """
+    names = [name for name in (CLEAN_FILE, ERROR_FILE, QUARANTINE_FILE) if os.path.exists(os.path.join(output_dir, name))]
+    return {name: os.path.getsize(os.path.join(output_dir, name)) for name in names}
+
+def _rebuild_reason(checkpoint, input_path, output_dir, stat, raw_header):
+    """
+    Check that the input is the file the checkpoint was taken from, with
+    bytes only appended since, and that the outputs are still there.
+    Returns: Why a full rebuild is needed, or None to continue from the checkpoint
+    """
+    if checkpoint is None:
+        return "no checkpoint"
+    if checkpoint["input"] != os.path.abspath(input_path):
+        return "checkpoint is for another input"
+    if (checkpoint["device"], checkpoint["inode"]) != (stat.st_dev, stat.st_ino):
+        return "input was replaced (rotated)"
+    if stat.st_size < checkpoint["offset"]:
+        return "input was truncated"
+    if checkpoint["header"] != _hash(raw_header):
+        return "header changed"
+    if checkpoint["tail_hash"] != _tail_hash(input_path, checkpoint["offset"]):
+        return "processed bytes were rewritten"
+    if checkpoint.get("unterminated") and stat.st_size > checkpoint["offset"] and _byte_at(input_path, checkpoint["offset"]) != b"\n":
+        return "last row was extended after it was processed without a newline"
+    for name, size in checkpoint["outputs"].items():
+        path = os.path.join(output_dir, name)
+        if not os.path.exists(path) or os.path.getsize(path) < size:
+            return f"{name} is missing or shorter than at the checkpoint"
+    return None
+
+def process_incremental(input_path, output_dir, stages=None, quarantine_rejected=False, finalize=False):
+    """
+    Process only the bytes appended to input_path since the last run.
+
+    A checkpoint in output_dir records how far the input has been read
+    (up to a line end, so a row still being written is picked up next
+    time), a fingerprint of the header, the running aggregates and
+    counts. Each run validates the new rows, appends them to the clean CSV
+    and error log, and rewrites the summary and aggregates.
+
+    The whole file is reprocessed instead if there is no checkpoint, or the
+    input was truncated, replaced or rewritten (see _rebuild_reason).
+
+    A last row with no newline is held back (and the withheld bytes
+    logged) as it may still be being written, unless finalize is set or
+    it is unchanged since the previous run, in which case it is taken as
+    the file's final row.
+
+    stages (from metrics.new_stages) collects per-stage timings if given.
+    With quarantine_rejected, rejected rows are appended to the quarantine
+    file (see quarantine.reprocess_quarantine).
+
+    Returns: validator.ValidationRun over the new rows; its lines,
+    rejected and error counts include the rows from earlier runs
+    Raises: FileProcessingError if the input can't be read
+    """
+    if stages is None:
+        stages = metrics.new_stages()
+    read, validate, transform, write = (stages[name] for name in metrics.STAGES)
+    checkpoint = load_checkpoint(output_dir)
+    fieldnames, raw_header, encoding = file_reader.read_header(input_path)
+    stat = os.stat(input_path)
+    reason = _rebuild_reason(checkpoint, input_path, output_dir, stat, raw_header)
+    if reason:
+        logger.info(f"Full rebuild of {input_path}: {reason}")
+        offset = len(raw_header)
+        checkpoint = {"lines": 0, "rejected": 0, "error_counts": [], "encoding": encoding}
+        aggregations = transformer.new_aggregations()
+    else:
+        offset = checkpoint["offset"]
+        # drop anything a failed run appended after the checkpoint was written
+        for name, size in checkpoint["outputs"].items():
+            os.truncate(os.path.join(output_dir, name), size)
+        aggregations = {group["name"]: transformer.Aggregation.from_dict(group) for group in checkpoint["aggregations"]}
+    append = not reason
+
+    end = file_reader.complete_lines_end(input_path, offset)
+    withheld = None
+    if end < stat.st_size:
+        tail = {"size": stat.st_size, "hash": _withheld_hash(input_path, end, stat.st_size)}
+        if finalize or (not reason and checkpoint.get("withheld") == tail):
+            logger.info(f"Processing the last {stat.st_size - end} bytes of {input_path} as a final row without a newline")
+            end = stat.st_size
+        else:
+            withheld = tail
+            logger.warning(f"Holding back {stat.st_size - end} bytes after the last newline of {input_path} "
+                           "(a row still being written?): processed on the next run if unchanged, or now with finalize")
+    logger.info(f"Reading bytes {offset}-{end} of {input_path}")
+    quarantine_file = os.path.join(output_dir, QUARANTINE_FILE)
+    rejects_writer = report_writer.QuarantineWriter(quarantine_file, append) if quarantine_rejected else contextlib.nullcontext()
+    with report_writer.ErrorLogWriter(os.path.join(output_dir, ERROR_FILE), append=append) as error_log, rejects_writer as rejects:
+        run = validator.ValidationRun(error_sink=error_log, reject_sink=rejects)
+        run.lines, run.rejected = checkpoint["lines"], checkpoint["rejected"]
+        run.errors.add_counts(checkpoint["error_counts"])
+        state = {"encoding": checkpoint["encoding"]}
+        raw_records = file_reader.iter_csv_range(input_path, offset, end, fieldnames, checkpoint["encoding"],
+                                                 interner=run.cache.values, state=state,
+                                                 track_positions=quarantine_rejected)
+        raw_records = metrics.timed(raw_records, read)
+        valid = metrics.timed(run.iter_valid(raw_records), validate, upstream=read)
+        transformed = metrics.timed(transformer.iter_aggregate(valid, aggregations), transform, upstream=validate)
+        with metrics.measure(write, upstream=transform):
+            write.rows_out = report_writer.write_clean_csv(os.path.join(output_dir, CLEAN_FILE), transformed,
+                                                           append=append)
+    new_records = run.lines - checkpoint["lines"]
+    run.errors.log_summary(logger)
+    with metrics.measure(write):
+        # the summary lists the first errors of the whole file, which are in the log
+        with open(os.path.join(output_dir, ERROR_FILE)) as f:
+            details = [line.rstrip("\n") for line in itertools.islice(f, report_writer.MAX_ERROR_DETAILS)]
+        report_writer.write_summary_report(os.path.join(output_dir, SUMMARY_FILE), run.accepted, details,
+                                           aggregations, error_count=len(run.errors),
+                                           error_counts=run.errors.summary(), rejected_records=run.rejected)
+        transformer.save_aggregations(os.path.join(output_dir, AGGREGATES_FILE), aggregations)
+
+    save_checkpoint(output_dir, {
+        "version": CHECKPOINT_VERSION,
+        "input": os.path.abspath(input_path),
+        "device": stat.st_dev,
+        "inode": stat.st_ino,
+        "offset": end,
+        "withheld": withheld,
+        "unterminated": end > 0 and _byte_at(input_path, end - 1) != b"\n",
+        "header": _hash(raw_header),
+        "tail_hash": _tail_hash(input_path, end),
+        "encoding": state["encoding"],
+        "lines": run.lines,
+        "rejected": run.rejected,
+        "error_counts": run.errors.summary(),
+        "outputs": output_sizes(output_dir),
+        "aggregations": [a.to_dict() for a in aggregations.values()],
+    })
+    logger.info(f"Incremental run of {input_path}: {new_records} new records, {run.lines} in total")
+    return run
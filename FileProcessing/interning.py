@@ -0,0 +1,89 @@
+DEFAULT_MAX_SIZE = 4096 # distinct values kept per cache
+
+class BoundedCache:
+    """
+    Dictionary cache with a size limit and hit/miss counters.
+    When full, new keys are not stored (counted as skipped), so a column
+    with more distinct values than max_size costs a lookup but never churns.
+    """
+    def __init__(self, max_size=DEFAULT_MAX_SIZE):
+        self.max_size = max_size
+        self.data = {}
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, key, default=None):
+        value = self.data.get(key, default)
+        if value is default:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if len(self.data) >= self.max_size and key not in self.data:
+            self.skipped += 1
+            return
+        self.data[key] = value
+
+    def add_counts(self, other):
+        """
+        Add another cache's counters to this one, e.g. from a worker process.
+        """
+        self.hits += other.hits
+        self.misses += other.misses
+        self.skipped += other.skipped
+
+    def stats(self):
+        """
+        Returns: Dict with size, hits, misses, skipped and hit rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+class Interner(BoundedCache):
+    """
+    Hands back one shared string object for each distinct column value.
+    """
+    def intern(self, value):
+        cached = self.data.get(value)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+        self.put(value, value)
+        return value
+
+class ParseCache:
+    """
+    Caches for one validation run: interned raw strings, and the parsed
+    value (or rejection) for each distinct date, quantity and price.
+    """
+    def __init__(self, max_size=DEFAULT_MAX_SIZE):
+        self.values = Interner(max_size)
+        self.dates = BoundedCache(max_size)
+        self.quantities = BoundedCache(max_size)
+        self.prices = BoundedCache(max_size)
+
+    def caches(self):
+        return {"values": self.values, "dates": self.dates, "quantities": self.quantities, "prices": self.prices}
+
+    def add_counts(self, other):
+        for name, cache in self.caches().items():
+            cache.add_counts(other.caches()[name])
+
+    def stats(self):
+        """
+        Returns: Dict mapping cache name to its stats
+        """
+        return {name: cache.stats() for name, cache in self.caches().items()}
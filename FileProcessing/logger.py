@@ -1,7 +1,17 @@
 import logging
+import queue_logging
+from queue_logging import LOG_FORMAT, DATE_FORMAT, log_to_file, stop
 
 def setup_logger(name, level: str):
-    """Configure a custom logger."""
+    """
+    Configure a custom logger.
+
+    Records are queued and written by a background listener thread (see
+    queue_logging), so logging doesn't block on the console or on a log
+    file added with log_to_file. Calls below the logger's level cost a
+    level check only; guard debug calls that build expensive messages in
+    per-row code with logger.isEnabledFor().
+    """
     logger = logging.getLogger(name)
     if not logger.handlers:
         logger.setLevel(logging.INFO)
@@ -18,11 +28,5 @@ def setup_logger(name, level: str):
                 logger.setLevel(logging.CRITICAL)
             case _:
                 raise ValueError(f"Invalid logging level {level}")
-        handler = logging.StreamHandler()
-        formatter = logging.Formatter(
-            '%(asctime)s | %(name)s | %(levelname)s | %(message)s',
-            datefmt = '%H:%M:%S'
-        )
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-    return logger
\ No newline at end of file
+        queue_logging.attach(logger)
+    return logger
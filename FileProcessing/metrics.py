@@ -0,0 +1,115 @@
+import contextlib, itertools, os, resource, time
+
+STAGES = ("read", "validate", "transform", "write")
+CHUNK_ROWS = 1024 # rows pulled between clock readings, keeps timing overhead per row negligible
+
+def _cpu_time():
+    """
+    User + system CPU seconds of this process and its finished children
+    (so work done in a process pool is counted once the pool shuts down).
+    """
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+def peak_rss():
+    """
+    Returns: Peak resident set size of this process so far, in bytes
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class StageStats:
+    """
+    Wall time, CPU time, row counts and peak memory for one pipeline stage.
+
+    Stages stream into each other, so a stage's clock also runs while it
+    waits on the stage feeding it. The upstream's time is taken off in
+    finish(), leaving each stage with only its own time. peak_rss is the
+    process's peak RSS as of the end of the stage.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.rows_in = 0
+        self.rows_out = 0
+        self.peak_rss = 0
+        self.upstream = None # stage whose time is included in this one's
+
+    @property
+    def rows_per_sec(self):
+        return self.rows_in / self.wall if self.wall > 0 else 0.0
+
+    def to_dict(self):
+        return {"wall": self.wall, "cpu": self.cpu, "rows_in": self.rows_in, "rows_out": self.rows_out,
+                "rows_per_sec": self.rows_per_sec, "peak_rss": self.peak_rss}
+
+    @classmethod
+    def from_dict(cls, name, data):
+        stats = cls(name)
+        for key in ("wall", "cpu", "rows_in", "rows_out", "peak_rss"):
+            setattr(stats, key, data[key])
+        return stats
+
+    def __repr__(self):
+        return (f"{self.name}: {self.wall:.3f}s wall, {self.cpu:.3f}s cpu, {self.rows_in} -> {self.rows_out} rows, "
+                f"{self.rows_per_sec:,.0f} rows/sec, peak {self.peak_rss / 2**20:.1f} MB")
+
+def new_stages():
+    """
+    Returns: Dict mapping each of STAGES to an empty StageStats
+    """
+    return {name: StageStats(name) for name in STAGES}
+
+def timed(iterable, stats, upstream=None, chunk_rows=CHUNK_ROWS):
+    """
+    Pass items through, adding the time spent producing them to stats
+    and counting them as its rows_out. Items are pulled chunk_rows at a
+    time so the clocks are read once per chunk, not once per row.
+    upstream is the StageStats of the iterable, if it is timed too.
+    """
+    stats.upstream = upstream
+    iterator = iter(iterable)
+    while True:
+        wall, cpu = time.perf_counter(), _cpu_time()
+        chunk = list(itertools.islice(iterator, chunk_rows))
+        stats.wall += time.perf_counter() - wall
+        stats.cpu += _cpu_time() - cpu
+        stats.peak_rss = max(stats.peak_rss, peak_rss())
+        if not chunk:
+            return
+        stats.rows_out += len(chunk)
+        yield from chunk
+
+@contextlib.contextmanager
+def measure(stats, upstream=None):
+    """
+    Add the time spent in the with block to stats. Pass upstream if the
+    block consumes a timed() iterable.
+    """
+    if upstream is not None:
+        stats.upstream = upstream
+    wall, cpu = time.perf_counter(), _cpu_time()
+    try:
+        yield stats
+    finally:
+        stats.wall += time.perf_counter() - wall
+        stats.cpu += _cpu_time() - cpu
+        stats.peak_rss = max(stats.peak_rss, peak_rss())
+
+def finish(stages):
+    """
+    Once the pipeline is done: take each upstream stage's time off the
+    stage it fed, and fill in rows_in from the previous stage's rows_out
+    (a reading stage's rows_in is what it produced).
+    """
+    ordered = list(stages.values())
+    for stats in reversed(ordered):
+        if stats.upstream is not None:
+            stats.wall = max(stats.wall - stats.upstream.wall, 0.0)
+            stats.cpu = max(stats.cpu - stats.upstream.cpu, 0.0)
+            stats.upstream = None
+    previous = None
+    for stats in ordered:
+        stats.rows_in = previous.rows_out if previous else stats.rows_out
+        previous = stats
+    return stages
@@ -1,34 +1,420 @@
-import logger, report_writer, validator, file_reader
+import logger, report_writer, validator, file_reader, transformer, columnar_cache, incremental, exceptions, metrics, error_collector, quarantine
+import argparse, glob, json, os, shutil, time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from logger import log_to_file
 
 logger = logger.setup_logger(__name__, "debug")
 
-def process_sales_file(input_path, output_dir):
+RANGES_PER_WORKER = 4 # more, smaller ranges keep the pool busy when shards are uneven
+MIN_RANGE_BYTES = 1024 * 1024
+MAX_INFLIGHT_BYTES = 512 * 1024 * 1024 # input bytes being processed at once in batch mode
+METRICS_FILE = "metrics.json"
+METRICS_VERSION = 1
+
+class ProcessingResult:
+    """
+    Statistics for one processed file: row counts, total time, peak
+    memory and per-stage metrics (metrics.StageStats for read, validate,
+    transform and write). Saved as JSON to track runs over time.
+    """
+    def __init__(self, input_path, output_dir, rows=0, valid=0, rejected=0, errors=0, seconds=0.0, stages=None,
+                 peak_rss=0):
+        self.input_path = input_path
+        self.output_dir = output_dir
+        self.rows = rows # records read
+        self.valid = valid
+        self.rejected = rejected # records with at least one error
+        self.errors = errors
+        self.seconds = seconds
+        self.stages = stages if stages is not None else metrics.new_stages()
+        self.peak_rss = peak_rss # bytes
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def to_dict(self):
+        return {"version": METRICS_VERSION, "input_path": self.input_path, "output_dir": self.output_dir,
+                "rows": self.rows, "valid": self.valid, "rejected": self.rejected, "errors": self.errors,
+                "seconds": self.seconds, "rows_per_sec": self.rows_per_sec, "peak_rss": self.peak_rss,
+                "stages": {name: stats.to_dict() for name, stats in self.stages.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("version") != METRICS_VERSION:
+            raise ValueError(f"Unsupported metrics version: {data.get('version')}")
+        stages = {name: metrics.StageStats.from_dict(name, stats) for name, stats in data["stages"].items()}
+        return cls(data["input_path"], data["output_dir"], data["rows"], data["valid"], data["rejected"],
+                   data["errors"], data["seconds"], stages, data["peak_rss"])
+
+    def save(self, filepath):
+        """
+        Write the result as JSON.
+        """
+        try:
+            with open(filepath, "w") as f:
+                json.dump(self.to_dict(), f, indent=2)
+        except OSError as e:
+            logger.error(e)
+            raise
+
+    def __repr__(self):
+        return f"ProcessingResult({self.input_path!r}, rows={self.rows}, valid={self.valid}, errors={self.errors})"
+
+def _validate_range(input_path, start, end, fieldnames, encoding):
+    """
+    Parse and validate one byte range in a worker process. The range's
+    errors are spilled to a temporary file instead of being sent back.
+    Returns: Tuple of (ValidationRun, error spill path, switched encoding,
+    non-ascii before switch), or None if a record in the range spans lines
+    """
+    spill = error_collector.ErrorSpill()
+    run = validator.ValidationRun(error_sink=spill)
+    try:
+        records, switched, non_ascii = file_reader.read_csv_range(input_path, start, end, fieldnames, encoding,
+                                                                  interner=run.cache.values)
+        run.validate_all(records)
+    except exceptions.MultilineRecordError as e:
+        logger.debug(f"Bytes {start}-{end} of {input_path}: {e}")
+        spill.close()
+        os.remove(spill.path)
+        return None
+    finally:
+        spill.close()
+    run.errors.sink = None
+    return run, spill.path, switched, non_ascii
+
+def _read_and_validate_parallel(input_path, workers, error_sink=None):
+    """
+    Read and validate a file in a process pool, one newline-aligned byte
+    range per task, and merge the shards in file order. Every error goes
+    to error_sink in file order, as in the serial path.
+
+    Records with newlines inside quoted fields can't be split on line
+    boundaries; if any range holds one, nothing is written to error_sink
+    and None is returned for the caller to read the file serially.
+
+    Returns: ValidationRun, same as the serial path, or None
+    """
+    # don't cut small files into tiny shards
+    parts = max(min(workers * RANGES_PER_WORKER, os.path.getsize(input_path) // MIN_RANGE_BYTES), 1)
+    fieldnames, ranges, encoding = file_reader.split_byte_ranges(input_path, parts)
+    logger.debug(f"Validating {input_path} in {len(ranges)} ranges on {workers} workers")
+
+    n = len(ranges)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        shards = list(pool.map(_validate_range, [input_path] * n, [r[0] for r in ranges],
+                               [r[1] for r in ranges], [fieldnames] * n, [encoding] * n))
+    if None in shards:
+        for shard in shards:
+            if shard is not None:
+                os.remove(shard[1])
+        logger.warning(f"{input_path} has records spanning lines, reading it serially")
+        return None
+
+    run = validator.ValidationRun(error_sink=error_sink)
+    fell_back = False
+    for (start, end), (shard, spill, switched, non_ascii) in zip(ranges, shards):
+        if fell_back and non_ascii:
+            # the serial reader would already be on the fallback encoding here
+            os.remove(spill)
+            shard, spill, switched, non_ascii = _validate_range(input_path, start, end, fieldnames, "latin-1")
+        fell_back = fell_back or switched
+        error_collector.replay_spill(spill, error_sink, run.lines)
+        run.merge(shard)
+    return run
+
+def process_sales_file(input_path, output_dir, workers=1, cache_dir=None, incremental_mode=False,
+                       quarantine_rejected=False, reprocess=None, finalize=False):
     """
     Main processing pipeline.
-    
+
     1. Read the input file
     2. Validate all records
     3. Transform valid records
     4. Generate reports
     5. Handle any errors gracefully
-    
+
+    With workers > 1 the input is memory-mapped, split into byte ranges
+    on line boundaries and each range is read and validated in a process
+    pool. Outputs are the same as with workers=1: a file with newlines
+    inside quoted fields, which can't be split on line boundaries, is
+    read serially instead.
+
+    With a cache_dir, the validated rows and errors are stored there in a
+    binary columnar cache (see columnar_cache) and re-runs on an unchanged
+    input skip reading and validation.
+
+    With incremental_mode, only rows appended since the last run on the
+    same output_dir are read, using the checkpoint kept there (see
+    incremental.process_incremental); workers and cache_dir are not used.
+    A last row with no newline is only processed once it is unchanged
+    between two runs, or straight away with finalize.
+
+    gzip, bz2 and xz inputs are decompressed while reading. They are
+    always read serially and in full, whatever workers or incremental_mode.
+
+    With quarantine_rejected, every rejected row's raw text, line number
+    and byte offset is kept in output_dir/quarantine.jsonl. The file is
+    then read serially and without the cache, which don't keep raw rows.
+    reprocess="quarantine" (or "input", to re-read the rows from the input
+    at their offsets) later re-validates only those rows and merges the
+    ones that pass into the outputs, see quarantine.reprocess_quarantine.
+
     Returns: ProcessingResult with statistics
     """
     logger.debug(f"Processing sales file {input_path}")
-    record_error_tuple = validator.validate_all_records(file_reader.read_csv_file(input_path))
-    clean_records, errors = record_error_tuple[0], record_error_tuple[1]
-    report_writer.write_clean_csv(f"{output_dir}/clean_records.csv", clean_records)
-    report_writer.write_error_log(f"{output_dir}/error_log.txt", errors)
-    report_writer.write_summary_report(f"{output_dir}/summary_report.txt", clean_records, errors, "")
+    start = time.perf_counter()
+    stages = metrics.new_stages()
+    if reprocess:
+        if reprocess not in ("quarantine", "input"):
+            raise ValueError(f"Invalid reprocess source {reprocess}")
+        with metrics.measure(stages["validate"]):
+            run = quarantine.reprocess_quarantine(input_path, output_dir, from_input=reprocess == "input")
+        stages["read"].rows_out, stages["validate"].rows_out = run.lines, run.accepted
+        logger.info(f"Quarantined rows reprocessed: {input_path}")
+        return _finish_result(input_path, output_dir, run, stages, start)
+    if (incremental_mode or workers > 1) and file_reader.detect_compression(input_path):
+        # byte offsets into a compressed stream mean nothing, read it start to end
+        logger.info(f"{input_path} is compressed, processing it serially and in full")
+        incremental_mode, workers = False, 1
+    if quarantine_rejected and (workers > 1 or cache_dir):
+        logger.info(f"Quarantining rejected rows of {input_path}, reading it serially without the cache")
+        workers, cache_dir = 1, None
+    if not quarantine_rejected:
+        quarantine.remove_stale(output_dir)
+    if incremental_mode:
+        run = incremental.process_incremental(input_path, output_dir, stages, quarantine_rejected, finalize)
+        logger.info(f"Sales file processed: {input_path}")
+        return _finish_result(input_path, output_dir, run, stages, start)
+    aggregations = transformer.new_aggregations()
+    read, validate, transform, write = (stages[name] for name in metrics.STAGES)
+    run = None
+    if cache_dir:
+        with metrics.measure(read):
+            run = columnar_cache.load_run(cache_dir, input_path)
+    from_cache = run is not None
+    streamed = False
+    error_log_path = f"{output_dir}/error_log.txt"
+    # errors are written as they are found, the run only keeps counts and samples
+    error_log = None if from_cache else report_writer.ErrorLogWriter(error_log_path)
+    rejects = report_writer.QuarantineWriter(f"{output_dir}/{quarantine.QUARANTINE_FILE}") if quarantine_rejected else None
+    try:
+        if workers > 1 and not from_cache:
+            # the workers read and validate together, it's all counted as validation
+            with metrics.measure(validate):
+                run = _read_and_validate_parallel(input_path, workers, error_log)
+            from_pool = run is not None
+        else:
+            from_pool = False
+        if from_cache or from_pool:
+            valid = run.valid_records
+        elif cache_dir:
+            run = validator.ValidationRun(error_sink=error_log)
+            raw_records = metrics.timed(file_reader.iter_csv_records(input_path, interner=run.cache.values), read)
+            with metrics.measure(validate, upstream=read):
+                run.validate_all(raw_records)
+            valid = run.valid_records
+        else:
+            # stream: read -> validate -> aggregate -> clean csv, one record at a time
+            run = validator.ValidationRun(error_sink=error_log, reject_sink=rejects)
+            raw_records = metrics.timed(file_reader.iter_csv_records(input_path, interner=run.cache.values,
+                                                                     track_positions=quarantine_rejected), read)
+            valid = metrics.timed(run.iter_valid(raw_records), validate, upstream=read)
+            streamed = True
+        transformed = metrics.timed(transformer.iter_aggregate(valid, aggregations), transform,
+                                    upstream=validate if streamed else None)
+        with metrics.measure(write, upstream=transform):
+            write.rows_out = report_writer.write_clean_csv(f"{output_dir}/clean_records.csv", transformed)
+    finally:
+        if error_log is not None:
+            error_log.close()
+        if rejects is not None:
+            rejects.close()
+        if from_cache:
+            columnar_cache.close_run(run)
+    if not streamed:
+        read.rows_out, validate.rows_out = run.lines, run.accepted
+    logger.info(f"Value cache: {run.cache.stats()}")
+    run.errors.log_summary(logger)
+    with metrics.measure(write):
+        if from_cache:
+            cached_log = columnar_cache.cached_error_log(cache_dir, input_path)
+            if cached_log:
+                shutil.copyfile(cached_log, error_log_path)
+            else:
+                open(error_log_path, "w").close()
+        elif cache_dir:
+            columnar_cache.save_run(cache_dir, input_path, run, error_log_path)
+        report_writer.write_summary_report(f"{output_dir}/summary_report.txt", run.accepted, run.errors, aggregations,
+                                           error_counts=run.errors.summary(), rejected_records=run.rejected)
+        # partial aggregates, to be merged with other files/days via transformer.combine_saved_aggregations
+        transformer.save_aggregations(f"{output_dir}/aggregates.json", aggregations)
     logger.info(f"Sales file processed: {input_path}")
+    return _finish_result(input_path, output_dir, run, stages, start)
 
-if __name__ == "__main__":
-    # Process from command line
-    input_path = input("Enter input path: ")
-    output_dir = input("Enter output directory: ")
-    input_path = "WilsonL/FileProcessing/data/nice_sales.csv"
-    output_dir = "WilsonL/FileProcessing/data"
+def _finish_result(input_path, output_dir, run, stages, start):
+    """
+    Build the ProcessingResult for a finished run, log its stages and
+    save it as metrics.json next to the other outputs.
+    """
+    result = ProcessingResult(input_path, output_dir, run.lines, run.accepted, run.rejected, len(run.errors),
+                              time.perf_counter() - start, metrics.finish(stages), metrics.peak_rss())
+    for stats in result.stages.values():
+        logger.debug(f"Stage {stats}")
+    result.save(os.path.join(output_dir, METRICS_FILE))
+    return result
+
+def find_input_files(patterns):
+    """
+    Expand directories (every *.csv inside, compressed or not) and glob
+    patterns into a sorted list of files, without duplicates.
+    """
+    files = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for suffix in ("", *file_reader.COMPRESSED_SUFFIXES):
+                files.update(glob.glob(os.path.join(pattern, f"*.csv{suffix}")))
+        elif glob.has_magic(pattern):
+            files.update(path for path in glob.glob(pattern) if os.path.isfile(path))
+        elif os.path.isfile(pattern):
+            files.add(pattern)
+        else:
+            logger.error(f"No such file or directory: {pattern}")
+    return sorted(files)
+
+def _file_output_dirs(input_paths, output_dir):
+    """
+    One output directory per input, named after the file, with a numeric
+    suffix when two inputs in different directories share a name.
+    """
+    dirs = {}
+    seen = set()
+    for path in input_paths:
+        name = os.path.basename(path)
+        if name.endswith(file_reader.COMPRESSED_SUFFIXES):
+            name = os.path.splitext(name)[0]
+        stem = name = os.path.splitext(name)[0]
+        n = 1
+        while name in seen:
+            n += 1
+            name = f"{stem}_{n}"
+        seen.add(name)
+        dirs[path] = os.path.join(output_dir, name)
+    return dirs
+
+def _process_file(input_path, output_dir, options):
+    os.makedirs(output_dir, exist_ok=True)
+    return process_sales_file(input_path, output_dir, **options)
+
+def process_batch(input_paths, output_dir, workers=os.cpu_count(), max_inflight_bytes=MAX_INFLIGHT_BYTES, **options):
+    """
+    Process many files concurrently, one file per task in a process pool.
+
+    Each file gets its own outputs in output_dir/<file name>/. A file is
+    only started while the input bytes of the files in flight stay under
+    max_inflight_bytes (one file is always allowed, however large), which
+    caps the pool's memory use. Files that fail, for any reason, are
+    logged and skipped; if a worker process dies (e.g. killed for running
+    out of memory) the files still queued are recorded as failed too.
+
+    options are passed on to process_sales_file for every file.
+
+    When done, the per-file aggregates are merged into a combined
+    summary_report.txt and aggregates.json in output_dir, and every
+    file's ProcessingResult is saved to output_dir/metrics.json.
+
+    Returns: List of ProcessingResult for the files that were processed
+    """
+    out_dirs = _file_output_dirs(input_paths, output_dir)
+    pending = sorted(input_paths, key=os.path.getsize, reverse=True) # big files first so they don't finish last
+    sizes = {path: os.path.getsize(path) for path in pending}
+    logger.info(f"Processing {len(pending)} files on {workers} workers")
+    start = time.perf_counter()
+    results, failed = [], []
+    running = {}
+    inflight = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            while pending and len(running) < workers and (not running or inflight + sizes[pending[0]] <= max_inflight_bytes):
+                path = pending.pop(0)
+                running[pool.submit(_process_file, path, out_dirs[path], options)] = path
+                inflight += sizes[path]
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in done:
+                path = running.pop(future)
+                inflight -= sizes[path]
+                try:
+                    results.append(future.result())
+                except BrokenProcessPool as e:
+                    logger.error(f"Failed to process {path}: worker process died ({e})")
+                    failed.append(path)
+                    broken = True
+                except Exception:
+                    # any failure is one file's, the batch goes on
+                    logger.exception(f"Failed to process {path}")
+                    failed.append(path)
+            if broken:
+                # every other task of a broken pool fails too, and nothing more can be submitted
+                lost = list(running.values()) + pending
+                logger.error(f"Process pool broke, not processing {len(lost)} more files")
+                failed.extend(lost)
+                running, pending = {}, []
+    elapsed = time.perf_counter() - start
+
+    results.sort(key=lambda r: r.input_path)
+    aggregations = transformer.combine_saved_aggregations(os.path.join(r.output_dir, "aggregates.json") for r in results)
+    if not aggregations:
+        aggregations = transformer.new_aggregations()
+    details = [f"{os.path.basename(r.output_dir)}: {r.errors} errors (see {os.path.basename(r.output_dir)}/error_log.txt)"
+               for r in results if r.errors]
+    report_writer.write_summary_report(os.path.join(output_dir, "summary_report.txt"), sum(r.valid for r in results),
+                                       details, aggregations, error_count=sum(r.errors for r in results),
+                                       rejected_records=sum(r.rejected for r in results), details_complete=True)
+    transformer.save_aggregations(os.path.join(output_dir, "aggregates.json"), aggregations)
+
+    rows = sum(r.rows for r in results)
     try:
-        process_sales_file(input_path, output_dir)
-    except Exception as e:
-        logger.error(f"Error: {e}")
\ No newline at end of file
+        with open(os.path.join(output_dir, METRICS_FILE), "w") as f:
+            json.dump({"version": METRICS_VERSION, "files": len(results), "failed": failed, "rows": rows,
+                       "seconds": elapsed, "results": [r.to_dict() for r in results]}, f, indent=2)
+    except OSError as e:
+        logger.error(e)
+        raise
+    logger.info(f"Processed {len(results)} files ({len(failed)} failed), {rows} rows in {elapsed:.2f}s: "
+                f"{len(results) / elapsed:.1f} files/sec, {rows / elapsed:,.0f} rows/sec")
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate sales CSV files and write clean data, error logs and summaries")
+    parser.add_argument("inputs", nargs="+", help="CSV files, directories or glob patterns")
+    parser.add_argument("-o", "--output-dir", required=True)
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--max-inflight-mb", type=int, default=MAX_INFLIGHT_BYTES // 2**20,
+                        help="input megabytes processed at once")
+    parser.add_argument("--cache-dir", help="reuse validated rows of unchanged inputs")
+    parser.add_argument("--incremental", action="store_true", help="only read rows appended since the last run")
+    parser.add_argument("--finalize", action="store_true",
+                        help="with --incremental, also process a last row with no newline now")
+    parser.add_argument("--quarantine", action="store_true", help="keep rejected rows for reprocessing")
+    parser.add_argument("--reprocess", choices=["quarantine", "input"],
+                        help="re-validate only the quarantined rows, from the quarantine or from the input")
+    parser.add_argument("--log-file", help="also log to this file, rotated by size")
+    args = parser.parse_args(argv)
+
+    if args.log_file:
+        log_to_file(args.log_file)
+
+    input_paths = find_input_files(args.inputs)
+    if not input_paths:
+        parser.error("no input files found")
+    os.makedirs(args.output_dir, exist_ok=True)
+    results = process_batch(input_paths, args.output_dir, args.workers, args.max_inflight_mb * 2**20,
+                            cache_dir=args.cache_dir, incremental_mode=args.incremental,
+                            finalize=args.finalize, quarantine_rejected=args.quarantine, reprocess=args.reprocess)
+    return 0 if len(results) == len(input_paths) else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,116 @@
+import logger, exceptions, file_reader, validator, transformer, report_writer, incremental
+import csv, json, os
+
+logger = logger.setup_logger(__name__, "info")
+
+QUARANTINE_FILE = incremental.QUARANTINE_FILE
+
+def remove_stale(output_dir):
+    """
+    Delete a quarantine file left by an earlier run, which would no longer
+    match the other outputs.
+    """
+    path = os.path.join(output_dir, QUARANTINE_FILE)
+    if os.path.exists(path):
+        logger.debug(f"Removing stale quarantine file {path}")
+        os.remove(path)
+
+def _field_count(text):
+    row = next((row for row in csv.reader(text.splitlines(keepends=True)) if row), None)
+    return 0 if row is None else len(row)
+
+def _iter_quarantined(entries, input_path, fieldnames, from_input):
+    """
+    Yields: (line number, raw record) for each quarantine entry, the
+    record parsed from the stored text or re-read from the input
+
+    A re-read row is only used if it is a plausible replacement: a row
+    starts at the offset (see file_reader.iter_records_at) and it has as
+    many fields as the quarantined text. Otherwise, and for every row
+    after a re-read row whose length changed (rows after it have moved,
+    so their offsets are stale), the quarantined text is used, so an
+    entry's raw text is never replaced by a fragment of another row.
+    """
+    trusted = from_input
+    if from_input:
+        entries = list(entries)
+        # pulled one row per entry while trusted, so rows after a moved one aren't read
+        reread = file_reader.iter_records_at(input_path, (entry["offset"] for entry in entries), fieldnames)
+    for entry in entries:
+        stored = entry["raw"] or ""
+        record = next(reread) if trusted else None
+        if trusted:
+            if record is None or _field_count(record[file_reader.RAW_FIELD]) != _field_count(stored):
+                logger.warning(f"Row at line {entry['line']} is no longer at offset {entry['offset']} of {input_path}, "
+                               "using the quarantined text for it and the rows after it; "
+                               "process the whole file again to pick up their fixes")
+                trusted, record = False, None
+            elif len(record[file_reader.RAW_FIELD]) != len(stored):
+                logger.warning(f"Row at line {entry['line']} of {input_path} changed length, using the quarantined "
+                               "text for the rows after it; process the whole file again to pick up their fixes")
+                trusted = False
+        if record is None:
+            record = file_reader.parse_record(stored, fieldnames, entry["offset"])
+        if record is None:
+            logger.warning(f"Quarantined row at line {entry['line']} has no text, dropping it")
+            continue
+        yield entry["line"], record
+
+def reprocess_quarantine(input_path, output_dir, from_input=False):
+    """
+    Re-validate only the rows in output_dir's quarantine file, e.g. after
+    upstream data was fixed, and merge the ones that now pass into the
+    existing outputs:
+
+    - passing rows are appended to the clean CSV (after the rows already
+      there) and added to the saved aggregates
+    - rows that still fail stay in a rewritten quarantine file, and the
+      error log and summary are rewritten from them (every error row is
+      in the quarantine, so this covers the whole file)
+    - an incremental checkpoint, if there is one, is updated to match
+
+    The quarantined raw text is re-validated, or with from_input the row
+    found at the quarantined byte offset of input_path (for an input
+    corrected in place without moving rows, uncompressed only; rows that
+    can't be found where they were keep their quarantined text).
+    Work is proportional to the number of quarantined rows.
+
+    Returns: validator.ValidationRun over the quarantined rows
+    Raises: FileProcessingError if there is no quarantine to reprocess
+    """
+    path = os.path.join(output_dir, QUARANTINE_FILE)
+    if not os.path.exists(path):
+        raise exceptions.FileProcessingError(f"No quarantine file in {output_dir}, process {input_path} with quarantine first")
+    aggregates_path = os.path.join(output_dir, incremental.AGGREGATES_FILE)
+    aggregations = transformer.load_aggregations(aggregates_path)
+    error_path = os.path.join(output_dir, incremental.ERROR_FILE)
+    tmp_quarantine, tmp_errors = f"{path}.tmp{os.getpid()}", f"{error_path}.tmp{os.getpid()}"
+
+    with open(path) as f:
+        header = f.readline()
+        fieldnames = json.loads(header)["fieldnames"] if header else []
+        entries = (json.loads(line) for line in f)
+        with report_writer.ErrorLogWriter(tmp_errors) as error_log, report_writer.QuarantineWriter(tmp_quarantine) as rejects:
+            run = validator.ValidationRun(error_sink=error_log, reject_sink=rejects)
+            for line_number, record in _iter_quarantined(entries, input_path, fieldnames, from_input):
+                run.validate(record, line_number)
+    fixed = len(run.valid_records)
+    logger.info(f"Reprocessed {run.lines} quarantined rows: {fixed} now valid, {run.rejected} still rejected")
+
+    report_writer.write_clean_csv(os.path.join(output_dir, incremental.CLEAN_FILE),
+                                  transformer.iter_aggregate(run.valid_records, aggregations), append=True)
+    os.replace(tmp_errors, error_path)
+    os.replace(tmp_quarantine, path)
+    valid = aggregations["totals"].get(None, "records")
+    report_writer.write_summary_report(os.path.join(output_dir, incremental.SUMMARY_FILE), valid, run.errors,
+                                       aggregations, error_counts=run.errors.summary(), rejected_records=run.rejected)
+    transformer.save_aggregations(aggregates_path, aggregations)
+
+    checkpoint = incremental.load_checkpoint(output_dir)
+    if checkpoint is not None:
+        checkpoint["rejected"] -= fixed
+        checkpoint["error_counts"] = run.errors.summary()
+        checkpoint["aggregations"] = [a.to_dict() for a in aggregations.values()]
+        checkpoint["outputs"] = incremental.output_sizes(output_dir)
+        incremental.save_checkpoint(output_dir, checkpoint)
+    return run
@@ -0,0 +1,153 @@
+# Canonical copy: DCPractice/queue_logging.py is an exact copy of this file (the two
+# projects are run from their own directories and don't import each other).
+# Change this one, then copy it over; DCPractice/test_queue_logging.py checks they match.
+import atexit, copy, logging, logging.handlers, os, queue, threading
+
+LOG_FORMAT = '%(asctime)s | %(name)s | %(levelname)s | %(message)s'
+DATE_FORMAT = '%H:%M:%S'
+MAX_BYTES = 10 * 2**20 # log file size that triggers a rotation
+BACKUP_COUNT = 3
+BATCH_RECORDS = 256 # formatted records buffered before a file write
+
+class BatchingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Size-rotated log file that writes records in batches.
+
+    Formatted records are buffered and written with a single write() once
+    batch_records are waiting, a record at flush_level or above arrives,
+    or on flush()/close(). The queue listener flushes whenever its queue
+    runs empty, so records reach the file as soon as logging goes quiet.
+    Rotation (max_bytes, backup_count) is checked once per batch.
+    """
+    def __init__(self, filename, max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT, batch_records=BATCH_RECORDS,
+                 flush_level=logging.WARNING, encoding="utf-8"):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding=encoding, delay=True)
+        self.batch_records = batch_records
+        self.flush_level = flush_level
+        self.buffer = []
+
+    def emit(self, record):
+        try:
+            self.buffer.append(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+            return
+        if len(self.buffer) >= self.batch_records or record.levelno >= self.flush_level:
+            self.flush()
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.buffer:
+                data = "".join(self.buffer)
+                self.buffer.clear()
+                if self.stream is None:
+                    self.stream = self._open()
+                size = self.stream.tell()
+                if self.maxBytes > 0 and size > 0 and size + len(data) >= self.maxBytes:
+                    self.doRollover()
+                    if self.stream is None:
+                        self.stream = self._open()
+                self.stream.write(data)
+            if self.stream is not None:
+                self.stream.flush()
+        finally:
+            self.release()
+
+    def close(self):
+        self.flush()
+        super().close()
+
+class _Listener(logging.handlers.QueueListener):
+    """
+    QueueListener that flushes its handlers whenever the queue runs empty.
+    """
+    def dequeue(self, block):
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            _flush(self.handlers)
+            return self.queue.get(block)
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # merge the message and traceback into msg on a copy, as the stdlib does: the
+        # record also goes on to other handlers (propagation to root, pytest's caplog)
+        message = self.format(record)
+        record = copy.copy(record)
+        record.message = record.msg = message
+        record.args = record.exc_info = record.exc_text = record.stack_info = None
+        return record
+
+    def emit(self, record):
+        if os.getpid() != _pid:
+            # forked worker: the listener thread wasn't copied, write directly
+            for handler in _handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+                    handler.flush()
+        else:
+            super().emit(record)
+
+def _flush(handlers):
+    for handler in handlers:
+        try:
+            handler.flush()
+        except (OSError, ValueError):
+            # stream already closed (e.g. a captured stderr), as logging.shutdown does
+            pass
+
+def _formatter():
+    return logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT)
+
+_pid = os.getpid()
+_queue = queue.SimpleQueue()
+_queue_handler = _QueueHandler(_queue)
+console = logging.StreamHandler()
+console.setFormatter(_formatter())
+_handlers = [console]
+_listener = None
+_lock = threading.Lock()
+
+def _start_listener():
+    global _listener
+    with _lock:
+        if _listener is None:
+            _listener = _Listener(_queue, *_handlers, respect_handler_level=True)
+            _listener.start()
+            atexit.register(stop)
+
+def stop():
+    """
+    Stop the listener thread once every queued record is written.
+    Runs at exit; logging again afterwards restarts the listener.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None and os.getpid() == _pid:
+            _listener.stop()
+            _listener = None
+            atexit.unregister(stop)
+        _flush(_handlers)
+
+def log_to_file(filepath, max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT):
+    """
+    Also write every queued logger's records to filepath, rotated by size.
+    Returns: The BatchingRotatingFileHandler
+    """
+    handler = BatchingRotatingFileHandler(filepath, max_bytes, backup_count)
+    handler.setFormatter(_formatter())
+    with _lock:
+        _handlers.append(handler)
+        if _listener is not None:
+            _listener.handlers = tuple(_handlers)
+    return handler
+
+def attach(logger):
+    """
+    Send a logger's records through the queue: they are written to the
+    console (and any log_to_file files) by a background listener thread,
+    so logging doesn't block on either.
+    """
+    logger.addHandler(_queue_handler)
+    _start_listener()
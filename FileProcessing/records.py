@@ -0,0 +1,129 @@
+import datetime
+from array import array
+
+FIELDS = ("date", "store_id", "product", "quantity", "price", "total")
+
+class SalesRecord:
+    """
+    One validated sales row with converted types.
+    Slots instead of a dict keep each row to a fixed, small size.
+    """
+    __slots__ = FIELDS
+
+    def __init__(self, date, store_id, product, quantity, price):
+        self.date = date
+        self.store_id = store_id
+        self.product = product
+        self.quantity = quantity
+        self.price = price
+        self.total = quantity * price
+
+    def __getitem__(self, field):
+        # lets code written against the old dict records keep working
+        if field not in FIELDS:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def __eq__(self, other):
+        if not isinstance(other, SalesRecord):
+            return NotImplemented
+        return self.as_row() == other.as_row()
+
+    def __repr__(self):
+        return f"SalesRecord({self.date!r}, {self.store_id!r}, {self.product!r}, {self.quantity!r}, {self.price!r})"
+
+    def as_row(self):
+        """
+        Returns: Tuple of the values in FIELDS order
+        """
+        return (self.date, self.store_id, self.product, self.quantity, self.price, self.total)
+
+class _Dictionary:
+    """
+    Dictionary encoding for a string column: value <-> small integer code.
+    """
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+class SalesBatch:
+    """
+    Columnar, array-backed storage for validated sales rows.
+
+    date: day ordinals (array 'i')
+    store_id, product: dictionary codes (array 'I') into value tables
+    quantity: array 'q' (a plain list if a value does not fit in 64 bits)
+    price: array 'd'
+
+    About 28 bytes per row. Rows are appended as SalesRecords and come
+    back out as SalesRecords when indexed or iterated. Arrays pickle as
+    raw bytes, so batches are cheap to send between processes.
+    """
+    def __init__(self):
+        self.dates = array("i")
+        self.store_codes = array("I")
+        self.product_codes = array("I")
+        self.quantities = array("q")
+        self.prices = array("d")
+        self.stores = _Dictionary()
+        self.products = _Dictionary()
+
+    def __len__(self):
+        return len(self.dates)
+
+    def append(self, record):
+        self.dates.append(record.date.toordinal())
+        self.store_codes.append(self.stores.encode(record.store_id))
+        self.product_codes.append(self.products.encode(record.product))
+        try:
+            self.quantities.append(record.quantity)
+        except OverflowError:
+            self.quantities = list(self.quantities)
+            self.quantities.append(record.quantity)
+        self.prices.append(record.price)
+
+    def extend(self, records):
+        """
+        Append records, or all rows of another SalesBatch.
+        """
+        if not isinstance(records, SalesBatch):
+            for record in records:
+                self.append(record)
+            return
+        other = records
+        store_map = [self.stores.encode(value) for value in other.stores.values]
+        product_map = [self.products.encode(value) for value in other.products.values]
+        self.dates.extend(other.dates)
+        self.store_codes.extend(array("I", (store_map[c] for c in other.store_codes)))
+        self.product_codes.extend(array("I", (product_map[c] for c in other.product_codes)))
+        if isinstance(self.quantities, array) and isinstance(other.quantities, array):
+            self.quantities.extend(other.quantities)
+        else:
+            self.quantities = list(self.quantities) + list(other.quantities)
+        self.prices.extend(other.prices)
+
+    def __getitem__(self, i):
+        return SalesRecord(datetime.date.fromordinal(self.dates[i]), self.stores.values[self.store_codes[i]],
+                           self.products.values[self.product_codes[i]], self.quantities[i], self.prices[i])
+
+    def __iter__(self):
+        stores, products = self.stores.values, self.products.values
+        date_cache = {}
+        for ordinal, store, product, quantity, price in zip(self.dates, self.store_codes, self.product_codes,
+                                                             self.quantities, self.prices):
+            date = date_cache.get(ordinal)
+            if date is None:
+                date = date_cache[ordinal] = datetime.date.fromordinal(ordinal)
+            yield SalesRecord(date, stores[store], products[product], quantity, price)
+
+    def __eq__(self, other):
+        if not isinstance(other, SalesBatch):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
@@ -1,12 +1,43 @@
-import logger, transformer, validator
+import logger, transformer, validator, file_reader, error_collector, records as sales_records
+import csv, itertools, json, os
 import datetime as dt
 
 logger = logger.setup_logger(__name__, "debug")
 
-def write_summary_report(filepath, valid_records, errors, aggregations):
+TOP_PRODUCTS = 5
+CLEAN_FIELDS = sales_records.FIELDS
+BATCH_ROWS = 10000 # rows serialized per writerows call
+BUFFER_SIZE = 1024 * 1024 # bytes buffered before each write to disk
+MAX_ERROR_DETAILS = 100 # errors listed in the summary, the error log has all of them
+QUARANTINE_VERSION = 1
+
+def _batches(iterable, size):
+    """
+    Yield lists of up to size items from any iterable.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def write_summary_report(filepath, valid_records, errors, aggregations, error_count=None, error_counts=None,
+                         rejected_records=None, details_complete=False):
     """
     Write a formatted summary report.
-    
+
+    valid_records may be the records themselves or just their count.
+    aggregations is the result of transformer.aggregate(valid_records);
+    it is computed here if not given (records needed then).
+    Only the first MAX_ERROR_DETAILS errors are listed; error_count gives
+    the total when errors holds only those. error_counts, as returned by
+    ErrorCollector.summary(), adds a count per field and error type.
+    rejected_records is the number of records with at least one error (a
+    record can have several); without it each error counts as a record.
+    With details_complete, errors already says where all errors are (e.g.
+    one line per file of a batch), so no "... and N more" line is added.
+
     Report should include:
     - Processing timestamp
     - Total records processed
@@ -16,83 +47,174 @@ def write_summary_report(filepath, valid_records, errors, aggregations):
     - Top 5 products
     """
     logger.debug("Generating summary report")
-    valid_records, error_records, = len(valid_records), len(errors),
-    total_records = error_records + valid_records
+    if not aggregations:
+        aggregations = transformer.aggregate(valid_records)
+    valid_count = valid_records if isinstance(valid_records, int) else len(valid_records)
+    error_total = len(errors) if error_count is None else error_count
+    error_records = error_total if rejected_records is None else rejected_records
+    total_records = error_records + valid_count
 
-    report = f"""=== Sales Processing Report ===
-    Generated: {dt.datetime.now()}
+    logger.debug(f"Writing report to file {filepath}")
+    try:
+        with open(filepath, "w", buffering=BUFFER_SIZE) as f:
+            f.write("=== Sales Processing Report ===\n"
+                    f"Generated: {dt.datetime.now():%Y-%m-%d %H:%M:%S}\n"
+                    "\n"
+                    "Processing Statistics:\n"
+                    f"- Total records: {total_records}\n"
+                    f"- Valid records: {valid_count}\n"
+                    f"- Error records: {error_records}\n"
+                    f"- Errors: {error_total}\n"
+                    "\n"
+                    "Errors:\n")
+            f.writelines(f"- {e}\n" for e in itertools.islice(errors, MAX_ERROR_DETAILS))
+            if error_total > MAX_ERROR_DETAILS and not details_complete:
+                f.write(f"- ... and {error_total - MAX_ERROR_DETAILS} more (see error log)\n")
+            if error_counts:
+                f.write("\nErrors by Type:\n")
+                f.writelines(f"- {field or '-'} / {kind}: {n}\n" for field, kind, n in error_counts)
 
-    Processing Statistics:
-      - Total records: {total_records}
-      - Valid records: {valid_records}
-      - Error records: {error_records}
+            # sales by store
+            f.write("\nSales by Store:\n")
+            by_store = aggregations["by_store"].as_dict("sales")
+            f.writelines(f"- {store}: ${sales:.2f}\n" for store, sales in sorted(by_store.items()))
 
-    Errors:
-    """
-    logger.debug("Generating error report")
-    for e in errors:
-        report += f"  - {e}"
-
-    # sales by store
-    logger.debug("Generating sales by store")
-    report += "\nSales by Store:"
-    by_store = transformer.aggregate_by_store(valid_records)
-    for store in by_store:
-        report += f"  - {store}: ${by_store[store]}"
-    
-    # Top products
-    report += "\nTop Products:"
-    by_product = transformer.aggregate_by_product(valid_records)
-    for product in by_product:
-        report += f"  - {product}: {by_product[product]} units"
-    logger.debug("Report generated")
-
-    logger.debug(f"Writing report to CSV file {filepath}")
-    try:
-        with open(filepath, "w+") as f:
-            f.write(report)
+            # top products
+            f.write("\nTop Products:\n")
+            top = aggregations["by_product"].top(TOP_PRODUCTS, "units")
+            f.writelines(f"{rank}. {product}: {units} units\n" for rank, (product, units) in enumerate(top, 1))
             logger.info("Report written")
-    except FileNotFoundError as e:
-        logger.error(e)
-    except Exception as e:
+    except OSError as e:
         logger.error(e)
+        raise
     logger.debug("Attempt to write report completed.")
 
-def write_clean_csv(filepath, records):
+def write_clean_csv(filepath, records, append=False):
     """
-    Write validated records to a clean CSV file.
+    Write validated records (records.SalesRecord) to a clean CSV file.
+
+    records can be any iterable (e.g. a generator), it is consumed in
+    batches of BATCH_ROWS so memory stays flat however many rows there are.
+    With append, rows are added to an existing file and no header is written.
+    Returns: Number of rows written
     """
     logger.debug(f"Writing records to CSV file {filepath}")
+    written = 0
     try:
-        with open(filepath, "w+") as f:
-            csv_cols = ""
-            
-            for r in records:
-                #convert dict record to csv string
-                
-                f.write(r)
-            logger.info("Records written")
-    except FileNotFoundError as e:
-        logger.error(e)
-    except Exception as e:
+        with open(filepath, "a" if append else "w", newline="", buffering=BUFFER_SIZE) as f:
+            writer = csv.writer(f)
+            if not append:
+                writer.writerow(CLEAN_FIELDS)
+            for chunk in _batches(records, BATCH_ROWS):
+                writer.writerows(r.as_row() for r in chunk)
+                written += len(chunk)
+            logger.info(f"Records written: {written}")
+    except OSError as e:
         logger.error(e)
+        raise
     logger.debug("Attempt to write records completed.")
+    return written
+
+class ErrorLogWriter:
+    """
+    Error sink (see error_collector.ErrorCollector) that writes each error
+    to the error log as soon as it is found, one per line.
+    """
+    def __init__(self, filepath, append=False):
+        logger.debug(f"Opening error log {filepath}")
+        self.filepath = filepath
+        self.written = 0
+        try:
+            self.file = open(filepath, "a" if append else "w", buffering=BUFFER_SIZE)
+        except OSError as e:
+            logger.error(e)
+            raise
 
+    def write(self, error):
+        self.file.write(f"{error}\n")
+        self.written += 1
 
-def write_error_log(filepath, errors):
+    def close(self):
+        try:
+            self.file.close()
+        except OSError as e:
+            logger.error(e)
+            raise
+        logger.info(f"Errors written: {self.written}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class QuarantineWriter:
+    """
+    Reject sink (see validator.ValidationRun) that keeps every rejected
+    row in a JSON lines quarantine file, so the rows can be re-validated
+    later without reading the whole input again.
+
+    The first line holds the version and column names, each following
+    line one row: its line number, byte offset and raw text (from a
+    reader with track_positions) and its errors.
+    """
+    def __init__(self, filepath, append=False):
+        logger.debug(f"Opening quarantine file {filepath}")
+        self.filepath = filepath
+        self.written = 0
+        try:
+            self.has_header = append and os.path.exists(filepath) and os.path.getsize(filepath) > 0
+            self.file = open(filepath, "a" if append else "w", buffering=BUFFER_SIZE)
+        except OSError as e:
+            logger.error(e)
+            raise
+
+    def write(self, line_number, record, errors):
+        if not self.has_header:
+            # column names come from the first rejected record, in header order
+            fieldnames = [k for k in record if k not in (file_reader.OFFSET_FIELD, file_reader.RAW_FIELD)]
+            self.file.write(json.dumps({"version": QUARANTINE_VERSION, "fieldnames": fieldnames}) + "\n")
+            self.has_header = True
+        self.file.write(json.dumps({
+            "line": line_number,
+            "offset": record.get(file_reader.OFFSET_FIELD),
+            "raw": record.get(file_reader.RAW_FIELD),
+            "errors": [error_collector.error_to_dict(e) for e in errors],
+        }) + "\n")
+        self.written += 1
+
+    def close(self):
+        try:
+            self.file.close()
+        except OSError as e:
+            logger.error(e)
+            raise
+        logger.info(f"Rows quarantined: {self.written}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def write_error_log(filepath, errors, append=False):
     """
-    Write processing errors to a log file.
+    Write processing errors to a log file, one per line.
+
+    errors can be any iterable; it is consumed in batches of BATCH_ROWS.
+    With append, errors are added to the end of an existing log.
+    Returns: Number of errors written
     """
-    logger.debug(f"Writing errors to CSV file {filepath}")
+    logger.debug(f"Writing errors to file {filepath}")
+    written = 0
     try:
-        with open(filepath, "w+") as f:
-            for e in errors:
-                f.write(e)
-            logger.info("Errors written")
-    except FileNotFoundError as e:
-        logger.error(e)
-    except Exception as e:
+        with open(filepath, "a" if append else "w", buffering=BUFFER_SIZE) as f:
+            for chunk in _batches(errors, BATCH_ROWS):
+                f.writelines(f"{e}\n" for e in chunk)
+                written += len(chunk)
+            logger.info(f"Errors written: {written}")
+    except OSError as e:
         logger.error(e)
+        raise
     logger.debug("Attempt to write errors completed.")
-
-    
\ No newline at end of file
+    return written
@@ -0,0 +1,120 @@
+import argparse, bz2, csv, gzip, lzma
+import numpy as np
+
+FIELDS = ("date", "store_id", "product", "quantity", "price")
+CHUNK_ROWS = 65536 # rows generated per step; output depends only on the parameters, not on memory
+
+# error kind -> (field, bad values to pick from)
+ERROR_KINDS = {
+    "missing_date": ("date", [""]),
+    "bad_date": ("date", ["invalid-date", "2024/01/15", "15-01-2024"]),
+    "impossible_date": ("date", ["2024-02-30", "2024-13-01", "2023-02-29"]),
+    "missing_store": ("store_id", [""]),
+    "missing_product": ("product", [""]),
+    "missing_quantity": ("quantity", [""]),
+    "bad_quantity": ("quantity", ["abc", "1.5", "ten"]),
+    "nonpositive_quantity": ("quantity", ["0", "-2", "-10"]),
+    "missing_price": ("price", [""]),
+    "bad_price": ("price", ["free", "$9.99", "n/a"]),
+    "nonpositive_price": ("price", ["0", "-1", "-5.99"]),
+}
+
+_OPENERS = {None: open, "gzip": gzip.open, "bz2": bz2.open, "xz": lzma.open}
+
+def _error_weights(error_mix):
+    """
+    Returns: Tuple of (error kinds, probabilities) from a {kind: weight} mix
+    Raises: ValueError for unknown kinds or weights that don't add up to anything
+    """
+    mix = error_mix or {kind: 1 for kind in ERROR_KINDS}
+    unknown = set(mix) - set(ERROR_KINDS)
+    if unknown:
+        raise ValueError(f"Unknown error kinds: {', '.join(sorted(unknown))}")
+    kinds = sorted(mix)
+    weights = np.array([mix[kind] for kind in kinds], dtype=float)
+    if weights.sum() <= 0:
+        raise ValueError("Error mix weights must add up to more than 0")
+    return kinds, weights / weights.sum()
+
+def generate_columns(rows, stores=50, products=200, error_rate=0.05, error_mix=None, seed=0,
+                     start_date="2024-01-01", days=366):
+    """
+    Build synthetic sales rows as columns.
+
+    Store and product ids are drawn uniformly from `stores` and `products`
+    distinct values, dates from `days` days after start_date. A share of
+    error_rate rows get exactly one bad field, the kind of error drawn
+    from error_mix ({kind in ERROR_KINDS: weight}, all equal by default).
+    The same arguments always give the same rows.
+
+    Returns: Dict mapping field name to a NumPy str array
+    """
+    if not 0 <= error_rate <= 1:
+        raise ValueError(f"Invalid error rate {error_rate}")
+    kinds, probabilities = _error_weights(error_mix)
+    rng = np.random.default_rng(seed)
+    store_ids = np.array([f"STORE{i:03d}" for i in range(1, stores + 1)])
+    product_names = np.array([f"Product {i}" for i in range(1, products + 1)])
+    columns = {
+        "date": (np.datetime64(start_date) + rng.integers(0, days, rows)).astype(str),
+        "store_id": store_ids[rng.integers(0, stores, rows)],
+        "product": product_names[rng.integers(0, products, rows)],
+        "quantity": rng.integers(1, 50, rows).astype(str),
+        "price": np.char.mod("%.2f", np.round(rng.uniform(0.5, 500, rows), 2)),
+    }
+    bad = np.flatnonzero(rng.random(rows) < error_rate)
+    chosen = rng.choice(len(kinds), len(bad), p=probabilities)
+    for i, kind in enumerate(kinds):
+        field, values = ERROR_KINDS[kind]
+        rows_for_kind = bad[chosen == i]
+        column = columns[field].astype(object)
+        column[rows_for_kind] = rng.choice(values, len(rows_for_kind))
+        columns[field] = column.astype(str)
+    return columns
+
+def iter_rows(rows, seed=0, **options):
+    """
+    Generate rows CHUNK_ROWS at a time, so any number of rows fits in memory.
+    options are those of generate_columns.
+
+    Yields: Lists of field values in FIELDS order
+    """
+    seeds = np.random.SeedSequence(seed).spawn((rows + CHUNK_ROWS - 1) // CHUNK_ROWS)
+    for i, chunk_seed in enumerate(seeds):
+        n = min(CHUNK_ROWS, rows - i * CHUNK_ROWS)
+        columns = generate_columns(n, seed=chunk_seed, **options)
+        yield from zip(*(columns[field].tolist() for field in FIELDS))
+
+def write_sales_file(filepath, rows, compression=None, **options):
+    """
+    Write a synthetic sales CSV, optionally compressed ("gzip", "bz2" or "xz").
+    options are those of generate_columns.
+    Returns: Number of data rows written
+    """
+    with _OPENERS[compression](filepath, "wt", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        writer.writerows(iter_rows(rows, **options))
+    return rows
+
+def _parse_mix(items):
+    mix = {}
+    for item in items:
+        kind, _, weight = item.partition("=")
+        mix[kind] = float(weight or 1)
+    return mix
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic sales CSV")
+    parser.add_argument("output")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--stores", type=int, default=50)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--mix", nargs="*", default=[], metavar="KIND=WEIGHT",
+                        help=f"error kinds to use: {', '.join(ERROR_KINDS)}")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compression", choices=["gzip", "bz2", "xz"])
+    args = parser.parse_args()
+    write_sales_file(args.output, args.rows, args.compression, stores=args.stores, products=args.products,
+                     error_rate=args.error_rate, error_mix=_parse_mix(args.mix), seed=args.seed)
@@ -0,0 +1,52 @@
+import pytest
+import batch_validator, exceptions, validator
+import numpy as np
+
+GOOD = {"date": "2024-01-15", "store_id": "STORE001", "product": "Widget A", "quantity": "10", "price": "29.99"}
+
+# values that the vectorized parsers either handle themselves or must hand back to validator
+EDGE_VALUES = {
+    "date": ["2024-01-15", " 2024-01-15", "2024-01-15 ", "+2024-01-15", "2023-02-29", "2024-02-29",
+             "1900-02-29", "2000-02-29", "0000-01-01", "2024-13-01", "2024-00-10", "2024-04-31", "2024-1-5",
+             "20240115", "2024/01/15", "2024-01-15T00:00", "２０２４-０１-１５", "", "   "],
+    "store_id": ["", " ", "STORE001"],
+    "product": ["", "Widget A", "Wïdget"],
+    "quantity": ["1", "0", "-1", "+7", " 7", "7 ", "007", "00", "1e3", "1.0", "1_000", "nan", "inf",
+                 "999999999999999999", "1000000000000000000", "9223372036854775807", "9223372036854775808",
+                 "12345678901234567890123", "٣", "１２", "", " "],
+    "price": ["29.99", "0", "0.0", "-1.5", "+1.5", " 1.5", "1.5 ", "001.50", ".5", "5.", ".", "1e3", "1E-2",
+              "nan", "NaN", "inf", "-inf", "1_000.5", "123456789012345", "1234567890123456",
+              "1.234567890123456789", "0.1000000000000001", "٣.٥", "１.５", "", " "],
+}
+
+def _edge_records():
+    """GOOD with one field replaced by each edge value, then every field empty."""
+
+    found = [dict(GOOD, **{field: value}) for field, values in EDGE_VALUES.items() for value in values]
+    return found + [dict.fromkeys(GOOD, "")]
+
+def _expected_errors(errors):
+    return sorted((e.field, "missing" if isinstance(e, exceptions.MissingFieldError) else "invalid") for e in errors)
+
+@pytest.mark.parametrize("as_bytes", [False, True])
+def test_validate_columns_matches_check_record(as_bytes):
+    """The vectorized validator should make the per-record validator's decisions and parse the same values."""
+
+    found = _edge_records()
+    columns = batch_validator.records_to_columns(found)
+    if as_bytes:
+        columns = {field: np.array([v.encode() for v in column.tolist()]) for field, column in columns.items()}
+    batch = batch_validator.validate_columns(columns)
+    errors = {}
+    for row, field, reason in batch.iter_errors():
+        errors.setdefault(row, []).append((field, reason))
+
+    for i, record in enumerate(found):
+        expected, expected_errors = validator._check_record(record, i + 2)
+        assert(bool(batch.mask[i]) == (expected is not None)), record
+        assert(sorted(errors.get(i, [])) == _expected_errors(expected_errors)), record
+        if expected is not None:
+            assert(batch.dates[i] == np.datetime64(expected.date)), record
+            assert(batch.quantities[i] == expected.quantity), record
+            # exact, not approximate: the fast path must give float()'s value
+            assert(float(batch.prices[i]).hex() == expected.price.hex()), record
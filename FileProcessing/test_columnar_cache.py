@@ -0,0 +1,51 @@
+import pytest
+import columnar_cache, file_reader, synthetic
+
+@pytest.fixture
+def input_path(tmp_path):
+    path = tmp_path / "sales.csv"
+    synthetic.write_sales_file(str(path), 3000, error_rate=0.1, seed=11)
+    return path
+
+def test_cache_hit_matches_cold_run(tmp_path, input_path, run_file, monkeypatch):
+    """A re-run on an unchanged input should be served from the cache with the same outputs."""
+
+    cache_dir = tmp_path / "cache"
+    plain, plain_outputs = run_file(input_path, tmp_path / "plain")
+    cold, cold_outputs = run_file(input_path, tmp_path / "cold", cache_dir=str(cache_dir))
+    assert(cold_outputs == plain_outputs)
+    loaded = columnar_cache.load_run(str(cache_dir), str(input_path))
+    assert(loaded.accepted == cold.valid)
+    columnar_cache.close_run(loaded)
+
+    # a hit doesn't read the input at all
+    monkeypatch.setattr(file_reader, "iter_csv_records", lambda *args, **kwargs: pytest.fail("input was read"))
+    warm, warm_outputs = run_file(input_path, tmp_path / "warm", cache_dir=str(cache_dir))
+    assert((warm.rows, warm.valid, warm.rejected, warm.errors) == (cold.rows, cold.valid, cold.rejected, cold.errors))
+    assert(warm_outputs == cold_outputs)
+
+def test_cache_miss_after_change(tmp_path, input_path, run_file):
+    """Changing the input should invalidate its cache entry."""
+
+    cache_dir = tmp_path / "cache"
+    run_file(input_path, tmp_path / "cold", cache_dir=str(cache_dir))
+    with open(input_path, "a") as f:
+        f.write("2024-01-15,STORE001,Widget A,10,29.99\n")
+    assert(columnar_cache.load_run(str(cache_dir), str(input_path)) is None)
+    changed, changed_outputs = run_file(input_path, tmp_path / "changed", cache_dir=str(cache_dir))
+    plain, plain_outputs = run_file(input_path, tmp_path / "plain")
+    assert(changed.rows == 3001)
+    assert(changed_outputs == plain_outputs)
+
+def test_close_run_unmaps_columns(tmp_path, input_path, run_file):
+    """close_run should close the memory map behind a loaded run's columns."""
+
+    cache_dir = tmp_path / "cache"
+    run_file(input_path, tmp_path / "cold", cache_dir=str(cache_dir))
+    run = columnar_cache.load_run(str(cache_dir), str(input_path))
+    mm = run.valid_records.prices.obj
+    assert(len(run.valid_records.prices) == run.accepted and not mm.closed)
+    columnar_cache.close_run(run)
+    assert(mm.closed)
+    with pytest.raises(ValueError):
+        run.valid_records.prices[0]
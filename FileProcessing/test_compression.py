@@ -0,0 +1,46 @@
+import pytest
+import exceptions, file_reader, processor, synthetic
+import bz2, gzip, lzma
+
+COMPRESSORS = {"gzip": gzip.compress, "bz2": bz2.compress, "xz": lzma.compress}
+
+@pytest.fixture
+def plain_input(tmp_path):
+    path = tmp_path / "sales.csv"
+    synthetic.write_sales_file(str(path), 3000, error_rate=0.1, seed=5)
+    return path
+
+@pytest.mark.parametrize("kind", sorted(COMPRESSORS))
+def test_compressed_input_matches_plain(tmp_path, plain_input, run_file, kind):
+    """gzip, bz2 and xz inputs should give the same outputs as the plain file."""
+
+    compressed = tmp_path / f"sales.csv.{kind}"
+    compressed.write_bytes(COMPRESSORS[kind](plain_input.read_bytes()))
+    assert(file_reader.detect_compression(str(compressed)) == kind)
+    plain, plain_outputs = run_file(plain_input, tmp_path / "plain")
+    result, outputs = run_file(compressed, tmp_path / kind)
+    assert((result.rows, result.valid, result.errors) == (plain.rows, plain.valid, plain.errors))
+    assert(outputs == plain_outputs)
+
+@pytest.mark.parametrize("options", [{"workers": 2}, {"incremental_mode": True}])
+def test_compressed_input_read_in_full(tmp_path, plain_input, run_file, options):
+    """Parallel and incremental runs can't seek in a compressed file: it is read serially, same outputs."""
+
+    compressed = tmp_path / "sales.csv"
+    # detected by its magic bytes, not its name
+    compressed.write_bytes(gzip.compress(plain_input.read_bytes()))
+    plain, plain_outputs = run_file(plain_input, tmp_path / "plain")
+    result, outputs = run_file(compressed, tmp_path / "compressed", **options)
+    assert(result.rows == plain.rows)
+    assert(outputs == plain_outputs)
+
+def test_truncated_compressed_input(tmp_path, plain_input):
+    """A cut-off compressed file should raise FileProcessingError, not yield a partial file silently."""
+
+    data = gzip.compress(plain_input.read_bytes())
+    truncated = tmp_path / "sales.csv.gz"
+    truncated.write_bytes(data[:len(data) // 2])
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    with pytest.raises(exceptions.FileProcessingError):
+        processor.process_sales_file(str(truncated), str(output_dir))
@@ -0,0 +1,62 @@
+import error_collector, exceptions, validator
+
+def _records(n, offset=0):
+    """Sales records with a missing store on every 3rd line and a bad quantity on every 4th."""
+
+    found = []
+    for i in range(offset + 1, offset + n + 1):
+        found.append({"date": "2024-01-15", "store_id": "" if i % 3 == 0 else "STORE001", "product": "Widget A",
+                      "quantity": "x" if i % 4 == 0 else "1", "price": "2.5"})
+    return found
+
+def _lines(errors):
+    return [(e.line_number, e.field, type(e).__name__) for e in errors]
+
+class _ListSink(list):
+    def write(self, error):
+        self.append(error)
+
+def test_collector_merge():
+    """Merged samples are shifted to file lines and cut at max_samples, counts and totals add up."""
+
+    first, second = error_collector.ErrorCollector(3), error_collector.ErrorCollector(3)
+    first.extend([exceptions.MissingFieldError("store_id"), exceptions.InvalidDataError("x", "positive integer", "quantity")])
+    second.extend([exceptions.MissingFieldError("store_id"), exceptions.MissingFieldError("price")])
+    for line, e in zip((4, 9, 1, 2), [*first, *second]):
+        e.line_number = line
+    first.merge(second, line_offset=10)
+    assert(_lines(first) == [(4, "store_id", "MissingFieldError"), (9, "quantity", "InvalidDataError"),
+                             (11, "store_id", "MissingFieldError")])
+    assert(len(first) == 4)
+    assert(first.counts == {("store_id", "MissingFieldError"): 2, ("quantity", "InvalidDataError"): 1,
+                            ("price", "MissingFieldError"): 1})
+
+def test_run_merge_matches_single_run():
+    """Merging runs over consecutive shards gives the samples, counts and totals of one run over the file."""
+
+    whole = validator.ValidationRun(max_error_samples=20).validate_all(_records(100))
+    merged = validator.ValidationRun(max_error_samples=20).validate_all(_records(10))
+    for start, n in ((10, 25), (35, 65)):
+        merged.merge(validator.ValidationRun(max_error_samples=20).validate_all(_records(n, start)))
+    assert((merged.lines, merged.rejected, merged.accepted) == (whole.lines, whole.rejected, whole.accepted))
+    assert(len(merged.valid_records) == len(whole.valid_records))
+    assert(len(merged.errors.samples) == 20)
+    assert(_lines(merged.errors) == _lines(whole.errors))
+    assert(merged.errors.summary() == whole.errors.summary() and len(merged.errors) == len(whole.errors))
+
+def test_replay_spills_matches_single_run(tmp_path):
+    """Spilled errors replayed with each shard's line offset give every error of one run, in file order."""
+
+    whole = _ListSink()
+    validator.ValidationRun(error_sink=whole).validate_all(_records(60))
+    replayed = _ListSink()
+    line_offset = 0
+    for start, n in ((0, 25), (25, 35)):
+        spill = error_collector.ErrorSpill(str(tmp_path))
+        run = validator.ValidationRun(max_error_samples=0, error_sink=spill).validate_all(_records(n, start))
+        spill.close()
+        assert(run.errors.samples == [] and len(run.errors) > 0)
+        error_collector.replay_spill(spill.path, replayed, line_offset)
+        line_offset += run.lines
+    assert(_lines(replayed) == _lines(whole))
+    assert(list(tmp_path.iterdir()) == [])
@@ -0,0 +1,70 @@
+import pytest
+import file_reader
+
+HEADER = b"date,store_id,product,quantity,price\n"
+
+def _records(tmp_path, data, **options):
+    path = tmp_path / "sales.csv"
+    path.write_bytes(data)
+    return list(file_reader.iter_csv_records(str(path), **options))
+
+@pytest.mark.parametrize("chunk_size", [7, file_reader.CHUNK_SIZE])
+def test_quoted_fields(tmp_path, chunk_size):
+    """Commas, doubled quotes and newlines inside quoted fields stay in the field, across chunk boundaries."""
+
+    found = _records(tmp_path, HEADER + b'2024-01-15,STORE001,"Widget, large",1,2.5\n'
+                                        b'2024-01-15,STORE002,"Widget ""B""\nsecond line",3,4.5\n'
+                                        b"2024-01-16,STORE003,Widget C,5,6.5\n", chunk_size=chunk_size)
+    assert([r["product"] for r in found] == ["Widget, large", 'Widget "B"\nsecond line', "Widget C"])
+    assert([r["store_id"] for r in found] == ["STORE001", "STORE002", "STORE003"])
+
+def test_crlf_line_endings(tmp_path):
+    """CRLF files give the same records as LF ones, with no stray \\r in the last field."""
+
+    lf = HEADER + b'2024-01-15,STORE001,"two\nlines",1,2.5\n2024-01-15,STORE002,Widget B,3,4.5\n'
+    crlf = _records(tmp_path, lf.replace(b"\n", b"\r\n"))
+    assert([r["price"] for r in crlf] == ["2.5", "4.5"])
+    assert(crlf[0]["product"] == "two\r\nlines")
+    assert(crlf[1] == _records(tmp_path, lf)[1])
+
+def test_bom_header(tmp_path):
+    """A utf-8 byte order mark is not part of the first column name."""
+
+    found = _records(tmp_path, b"\xef\xbb\xbf" + HEADER + b"2024-01-15,STORE001,Widget A,1,2.5\n")
+    assert(list(found[0])[0] == "date" and found[0]["date"] == "2024-01-15")
+
+def test_short_and_long_rows(tmp_path):
+    """Short rows are padded with "", fields past the header are dropped, blank lines are skipped."""
+
+    found = _records(tmp_path, HEADER + b"2024-01-15,STORE001\n\n2024-01-15,STORE002,Widget B,3,4.5,extra,more\n")
+    assert(found == [
+        {"date": "2024-01-15", "store_id": "STORE001", "product": "", "quantity": "", "price": ""},
+        {"date": "2024-01-15", "store_id": "STORE002", "product": "Widget B", "quantity": "3", "price": "4.5"},
+    ])
+
+def test_encoding_fallback(tmp_path):
+    """Lines decode as utf-8 until the first line that isn't, then as latin-1 to the end of the file."""
+
+    data = (HEADER + "2024-01-15,STORE001,Café,1,2.5\n".encode()
+            + "2024-01-15,STORE002,Crème,1,2.5\n".encode("latin-1")
+            + "2024-01-15,STORE003,Café,1,2.5\n".encode())
+    found = _records(tmp_path, data, chunk_size=16)
+    assert([r["product"] for r in found] == ["Café", "Crème", "Café".encode().decode("latin-1")])
+
+def test_line_decoder_state():
+    """_LineDecoder records whether it switched, and whether non-ascii text was decoded before it did."""
+
+    lines = [b"plain\n", "café\n".encode(), b"caf\xe9\n", b"plain\n"]
+    decoder = file_reader._LineDecoder(iter(lines), "utf-8", "latin-1", offset=100)
+    assert(next(decoder) == "plain\n" and not decoder.non_ascii)
+    assert(next(decoder) == "café\n" and decoder.non_ascii and not decoder.switched)
+    assert(decoder.take() == (100, "plain\ncafé\n"))
+    assert(list(decoder) == ["café\n", "plain\n"] and decoder.switched)
+    assert(decoder.take() == (100 + len(lines[0]) + len(lines[1]), "café\nplain\n"))
+
+def test_line_decoder_without_fallback():
+    """With nothing to fall back to, an undecodable line raises."""
+
+    decoder = file_reader._LineDecoder(iter([b"caf\xe9\n"]), "utf-8", "utf-8")
+    with pytest.raises(UnicodeDecodeError):
+        next(decoder)
@@ -0,0 +1,125 @@
+import pytest
+import processor, synthetic
+import os
+
+def _incremental(input_path, output_dir):
+    return processor.process_sales_file(str(input_path), str(output_dir), incremental_mode=True)
+
+@pytest.fixture
+def sales_lines(tmp_path):
+    """The lines (header first) of a synthetic sales file with errors."""
+
+    path = tmp_path / "generated.csv"
+    synthetic.write_sales_file(str(path), 3000, error_rate=0.1, seed=7)
+    return path.read_bytes().splitlines(keepends=True)
+
+@pytest.fixture
+def unterminated_sample(tmp_path):
+    """data/sample_sales.csv, with no newline after its last row."""
+
+    path = tmp_path / "sales.csv"
+    with open(os.path.join(os.path.dirname(__file__), "data", "sample_sales.csv"), "rb") as f:
+        path.write_bytes(f.read().rstrip(b"\r\n"))
+    return path
+
+@pytest.fixture
+def output_dir(tmp_path):
+    path = tmp_path / "incremental"
+    path.mkdir()
+    return path
+
+def test_incremental_appends_match_full_run(tmp_path, sales_lines, output_dir, read_outputs, run_file):
+    """Rows appended between runs, a partial last row included, should give a full run's outputs."""
+
+    input_path = tmp_path / "sales.csv"
+    input_path.write_bytes(b"".join(sales_lines[:1001]))
+    assert(_incremental(input_path, output_dir).rows == 1000)
+
+    # the last row is still being written: it is left for the next run
+    partial = sales_lines[2001]
+    with open(input_path, "ab") as f:
+        f.write(b"".join(sales_lines[1001:2001]) + partial[:10])
+    assert(_incremental(input_path, output_dir).rows == 2000)
+
+    with open(input_path, "ab") as f:
+        f.write(partial[10:] + b"".join(sales_lines[2002:]))
+    result = _incremental(input_path, output_dir)
+    assert(result.rows == 3000)
+    assert(result.stages["read"].rows_out == 1000)
+    assert(read_outputs(output_dir) == run_file(input_path, tmp_path / "full")[1])
+
+def test_incremental_rebuilds_truncated_input(tmp_path, sales_lines, output_dir, read_outputs, run_file):
+    """A file cut shorter than the checkpoint should be processed again from the start."""
+
+    input_path = tmp_path / "sales.csv"
+    input_path.write_bytes(b"".join(sales_lines))
+    _incremental(input_path, output_dir)
+    input_path.write_bytes(b"".join(sales_lines[:501]))
+    result = _incremental(input_path, output_dir)
+    assert(result.rows == 500)
+    assert(read_outputs(output_dir) == run_file(input_path, tmp_path / "full")[1])
+
+def test_incremental_rebuilds_rotated_input(tmp_path, sales_lines, output_dir, read_outputs, run_file):
+    """A file replaced by a new one (log rotation) should be processed again from the start."""
+
+    input_path = tmp_path / "sales.csv"
+    input_path.write_bytes(b"".join(sales_lines[:1001]))
+    _incremental(input_path, output_dir)
+    rotated = tmp_path / "sales.csv.new"
+    # longer than before, so it is not taken for a truncation
+    rotated.write_bytes(sales_lines[0] + b"".join(sales_lines[1500:]))
+    os.replace(rotated, input_path)
+    result = _incremental(input_path, output_dir)
+    assert(result.rows == len(sales_lines) - 1500)
+    assert(read_outputs(output_dir) == run_file(input_path, tmp_path / "full")[1])
+
+def test_incremental_no_new_rows(tmp_path, sales_lines, output_dir, read_outputs):
+    """A second run with nothing appended should read nothing and change nothing."""
+
+    input_path = tmp_path / "sales.csv"
+    input_path.write_bytes(b"".join(sales_lines))
+    _incremental(input_path, output_dir)
+    before = read_outputs(output_dir)
+    result = _incremental(input_path, output_dir)
+    assert(result.rows == 3000 and result.stages["read"].rows_out == 0)
+    assert(read_outputs(output_dir) == before)
+
+def test_incremental_unterminated_last_row(tmp_path, unterminated_sample, output_dir, read_outputs, run_file):
+    """A last row with no newline is held back once, then processed when unchanged, like a full run."""
+
+    input_path = unterminated_sample
+    full, full_outputs = run_file(input_path, tmp_path / "full")
+    assert(_incremental(input_path, output_dir).rows == full.rows - 1)
+    result = _incremental(input_path, output_dir)
+    assert((result.rows, result.valid, result.stages["read"].rows_out) == (full.rows, full.valid, 1))
+    assert(read_outputs(output_dir) == full_outputs)
+
+    # rows appended after a newline are read on from there
+    with open(input_path, "ab") as f:
+        f.write(b"\n2024-01-15,STORE001,Widget A,10,29.99\n")
+    result = _incremental(input_path, output_dir)
+    assert((result.rows, result.stages["read"].rows_out) == (full.rows + 1, 1))
+    assert(read_outputs(output_dir) == run_file(input_path, tmp_path / "full_appended")[1])
+
+def test_incremental_finalize(tmp_path, unterminated_sample, output_dir, read_outputs, run_file):
+    """With finalize, a last row with no newline is processed on the first run."""
+
+    input_path = unterminated_sample
+    full, full_outputs = run_file(input_path, tmp_path / "full")
+    result = processor.process_sales_file(str(input_path), str(output_dir), incremental_mode=True, finalize=True)
+    assert((result.rows, result.valid) == (full.rows, full.valid))
+    assert(read_outputs(output_dir) == full_outputs)
+
+def test_incremental_rebuilds_extended_last_row(tmp_path, output_dir, read_outputs, run_file):
+    """A last row processed without a newline, then written on, should be processed again from the start."""
+
+    input_path = tmp_path / "sales.csv"
+    input_path.write_bytes(b"date,store_id,product,quantity,price\n"
+                           b"2024-01-15,STORE001,Widget A,10,29.99\n"
+                           b"2024-01-15,STORE002,Widget B,1")
+    assert(processor.process_sales_file(str(input_path), str(output_dir), incremental_mode=True, finalize=True).rows == 2)
+    with open(input_path, "ab") as f:
+        f.write(b"5,9.99\n")
+    result = _incremental(input_path, output_dir)
+    assert((result.rows, result.stages["read"].rows_out) == (2, 2))
+    assert(read_outputs(output_dir) == run_file(input_path, tmp_path / "full")[1])
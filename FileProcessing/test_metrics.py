@@ -0,0 +1,48 @@
+import metrics
+import time
+
+def _produce(n, delay):
+    for i in range(n):
+        time.sleep(delay)
+        yield i
+
+def _relay(items, delay):
+    for item in items:
+        time.sleep(delay)
+        yield item
+
+def test_finish_subtracts_upstream_time():
+    """Each stage's clock includes the stages feeding it: finish() leaves only its own time."""
+
+    stages = metrics.new_stages()
+    read, validate, transform, write = (stages[name] for name in metrics.STAGES)
+    # raw clocks of a streamed chain, each including everything upstream of it
+    for stats, wall, cpu, rows in ((read, 1.0, 0.5, 100), (validate, 3.0, 2.0, 90), (transform, 6.0, 4.5, 90),
+                                   (write, 10.0, 8.0, 90)):
+        stats.wall, stats.cpu, stats.rows_out = wall, cpu, rows
+    validate.upstream, transform.upstream, write.upstream = read, validate, transform
+    metrics.finish(stages)
+    assert([s.wall for s in stages.values()] == [1.0, 2.0, 3.0, 4.0])
+    assert([s.cpu for s in stages.values()] == [0.5, 1.5, 2.5, 3.5])
+    assert([s.rows_in for s in stages.values()] == [100, 100, 90, 90])
+    assert(all(s.upstream is None for s in stages.values()))
+
+def test_nested_stages_not_double_counted():
+    """Timing a real streamed chain: stage times come out as each stage's own delay and add up to the total."""
+
+    stages = metrics.new_stages()
+    read, validate, transform, write = (stages[name] for name in metrics.STAGES)
+    start = time.perf_counter()
+    rows = metrics.timed(_produce(20, 0.004), read, chunk_rows=4)
+    valid = metrics.timed(_relay(rows, 0.002), validate, upstream=read, chunk_rows=4)
+    transformed = metrics.timed(_relay(valid, 0.001), transform, upstream=validate, chunk_rows=4)
+    with metrics.measure(write, upstream=transform):
+        for _ in transformed:
+            time.sleep(0.003)
+    total = time.perf_counter() - start
+    metrics.finish(stages)
+
+    for stats, delay in ((read, 0.004), (validate, 0.002), (transform, 0.001), (write, 0.003)):
+        assert(20 * delay <= stats.wall < 20 * delay + 0.05), stats
+    assert(sum(s.wall for s in stages.values()) <= total)
+    assert([s.rows_in for s in stages.values()] == [20, 20, 20, 20])
@@ -0,0 +1,101 @@
+import pytest
+import processor, synthetic
+import csv, json, os
+
+@pytest.fixture
+def small_ranges(monkeypatch):
+    """Let small test files be split into many byte ranges."""
+
+    monkeypatch.setattr(processor, "MIN_RANGE_BYTES", 256)
+
+def test_parallel_matches_serial(tmp_path, small_ranges, run_file):
+    """workers > 1 should give the same outputs as workers = 1."""
+
+    input_path = tmp_path / "sales.csv"
+    synthetic.write_sales_file(str(input_path), 2000, error_rate=0.1, seed=3)
+    serial, serial_outputs = run_file(input_path, tmp_path / "serial")
+    parallel, parallel_outputs = run_file(input_path, tmp_path / "parallel", workers=4)
+    assert((parallel.rows, parallel.valid, parallel.errors) == (serial.rows, serial.valid, serial.errors))
+    assert(parallel_outputs == serial_outputs)
+
+def test_parallel_falls_back_for_multiline_records(tmp_path, small_ranges, run_file):
+    """Newlines inside quoted fields can't be split on line boundaries: read serially, same outputs."""
+
+    input_path = tmp_path / "sales.csv"
+    with open(input_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(synthetic.FIELDS)
+        for i in range(200):
+            quantity = "abc" if i % 6 == 0 else str(i % 9 + 1)
+            writer.writerow(["2024-01-15", f"STORE{i % 5:03d}", f"Widget {i % 7}\nmulti-line note {i}", quantity, "9.99"])
+    serial, serial_outputs = run_file(input_path, tmp_path / "serial")
+    parallel, parallel_outputs = run_file(input_path, tmp_path / "parallel", workers=4)
+    assert(serial.rows == 200)
+    assert((parallel.rows, parallel.valid, parallel.errors) == (serial.rows, serial.valid, serial.errors))
+    assert(parallel_outputs == serial_outputs)
+
+def test_summary_counts_rows_not_errors(tmp_path, run_file):
+    """A row with two bad fields is one error record with two errors."""
+
+    input_path = tmp_path / "sales.csv"
+    input_path.write_text("date,store_id,product,quantity,price\n"
+                          "2024-01-15,STORE001,Widget A,10,29.99\n"
+                          "2024-01-15,,Widget A,abc,29.99\n")
+    result, outputs = run_file(input_path, tmp_path / "out")
+    assert((result.rows, result.valid, result.rejected, result.errors) == (2, 1, 1, 2))
+    summary = "".join(outputs["summary_report.txt"])
+    assert("- Total records: 2\n- Valid records: 1\n- Error records: 1\n- Errors: 2\n" in summary)
+
+def test_batch_summary_points_to_file_logs(tmp_path):
+    """The combined summary lists each file's error log, with no combined log to point to."""
+
+    inputs = tmp_path / "inputs"
+    inputs.mkdir()
+    for name in ("a", "b"):
+        synthetic.write_sales_file(str(inputs / f"{name}.csv"), 1000, error_rate=0.2, seed=ord(name))
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    results = processor.process_batch(processor.find_input_files([str(inputs)]), str(output_dir), workers=2)
+    assert(sum(r.errors for r in results) > 100)
+    with open(output_dir / "summary_report.txt") as f:
+        summary = f.read()
+    assert("more (see error log)" not in summary)
+    assert("- a: " in summary and "(see a/error_log.txt)" in summary)
+    assert(f"- Error records: {sum(r.rejected for r in results)}\n" in summary)
+
+def _batch_inputs(tmp_path, names):
+    inputs = tmp_path / "inputs"
+    inputs.mkdir()
+    for name in names:
+        synthetic.write_sales_file(str(inputs / f"{name}.csv"), 200, seed=ord(name))
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    return processor.find_input_files([str(inputs)]), output_dir
+
+def test_batch_skips_file_failing_with_any_error(tmp_path, monkeypatch):
+    """Any exception from one file should only fail that file, the summary is still written."""
+
+    paths, output_dir = _batch_inputs(tmp_path, "abc")
+    process = processor.process_sales_file
+    def flaky(input_path, *args, **kwargs):
+        if input_path.endswith("b.csv"):
+            raise ValueError("bad checkpoint")
+        return process(input_path, *args, **kwargs)
+    # the pool's workers are forked, so they see the patched function
+    monkeypatch.setattr(processor, "process_sales_file", flaky)
+    results = processor.process_batch(paths, str(output_dir), workers=2)
+    assert(sorted(os.path.basename(r.input_path) for r in results) == ["a.csv", "c.csv"])
+    with open(output_dir / processor.METRICS_FILE) as f:
+        assert([os.path.basename(p) for p in json.load(f)["failed"]] == ["b.csv"])
+    assert((output_dir / "summary_report.txt").exists())
+
+def test_batch_survives_broken_pool(tmp_path, monkeypatch):
+    """A worker dying breaks the pool: its files are recorded as failed instead of raising."""
+
+    paths, output_dir = _batch_inputs(tmp_path, "abc")
+    monkeypatch.setattr(processor, "process_sales_file", lambda *args, **kwargs: os._exit(1))
+    results = processor.process_batch(paths, str(output_dir), workers=1)
+    assert(results == [])
+    with open(output_dir / processor.METRICS_FILE) as f:
+        assert(sorted(json.load(f)["failed"]) == sorted(paths))
+    assert((output_dir / "summary_report.txt").exists())
@@ -0,0 +1,99 @@
+import pytest
+from processor import process_sales_file
+import exceptions, quarantine
+import json, os, shutil
+
+SAMPLE = os.path.join(os.path.dirname(__file__), "data", "sample_sales.csv")
+
+@pytest.fixture
+def quarantined(tmp_path):
+    """sample_sales.csv processed with quarantine, as (input path, output dir)."""
+
+    input_path = tmp_path / "sales.csv"
+    shutil.copyfile(SAMPLE, input_path)
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    process_sales_file(str(input_path), str(output_dir), quarantine_rejected=True)
+    return input_path, output_dir
+
+def _entries(output_dir):
+    with open(output_dir / quarantine.QUARANTINE_FILE) as f:
+        f.readline()
+        return [json.loads(line) for line in f]
+
+def _clean_rows(output_dir):
+    with open(output_dir / "clean_records.csv") as f:
+        return f.read().splitlines()[1:]
+
+def test_quarantine_keeps_rejected_rows(quarantined):
+    """Every rejected row should be quarantined with its line, offset and raw text."""
+
+    input_path, output_dir = quarantined
+    entries = _entries(output_dir)
+    assert([e["line"] for e in entries] == [3, 4, 5, 6])
+    data = input_path.read_bytes()
+    for e in entries:
+        assert(data[e["offset"]:].decode().startswith(e["raw"]))
+
+def test_reprocess_from_quarantine(quarantined):
+    """A row fixed in the quarantine should move to the clean CSV, the others stay."""
+
+    input_path, output_dir = quarantined
+    path = output_dir / quarantine.QUARANTINE_FILE
+    lines = path.read_text().splitlines(keepends=True)
+    entry = json.loads(lines[1])
+    entry["raw"] = entry["raw"].replace("invalid-date", "2024-01-16")
+    lines[1] = json.dumps(entry) + "\n"
+    path.write_text("".join(lines))
+
+    result = process_sales_file(str(input_path), str(output_dir), reprocess="quarantine")
+    assert((result.rows, result.valid, result.rejected) == (4, 1, 3))
+    assert(_clean_rows(output_dir)[-1].startswith("2024-01-16,STORE001,Widget A,3,"))
+    assert([e["line"] for e in _entries(output_dir)] == [4, 5, 6])
+
+def test_reprocess_from_input_fixed_in_place(quarantined):
+    """Rows fixed in the input without changing length should be re-read at their offsets."""
+
+    input_path, output_dir = quarantined
+    text = input_path.read_text()
+    input_path.write_text(text.replace(",-2,", ",02,").replace(",abc,", ",007,"))
+
+    result = process_sales_file(str(input_path), str(output_dir), reprocess="input")
+    assert((result.rows, result.valid, result.rejected) == (4, 2, 2))
+    assert([e["line"] for e in _entries(output_dir)] == [3, 5])
+    assert(len(_clean_rows(output_dir)) == 5)
+
+def test_reprocess_from_input_moved_rows_keep_raw_text(quarantined):
+    """A fix that makes a row longer moves the rows after it: they must keep their quarantined text."""
+
+    input_path, output_dir = quarantined
+    before = {e["line"]: e["raw"] for e in _entries(output_dir)}
+    text = input_path.read_text()
+    input_path.write_text(text.replace("invalid-date,STORE001,Widget A,", "2024-01-16,STORE001,Widget Alpha,")
+                              .replace(",-2,", ",2,").replace(",abc,", ",7,"))
+
+    result = process_sales_file(str(input_path), str(output_dir), reprocess="input")
+    assert((result.rows, result.valid, result.rejected) == (4, 1, 3))
+    assert(_clean_rows(output_dir)[-1].startswith("2024-01-16,STORE001,Widget Alpha,3,"))
+    after = {e["line"]: e["raw"] for e in _entries(output_dir)}
+    assert(after == {line: raw for line, raw in before.items() if line != 3})
+    with open(output_dir / "error_log.txt") as f:
+        assert(len(f.read().splitlines()) == 3)
+
+def test_reprocess_from_input_offset_mid_line(quarantined):
+    """An offset that no longer starts a row should fall back to the quarantined text."""
+
+    input_path, output_dir = quarantined
+    before = {e["line"]: e["raw"] for e in _entries(output_dir)}
+    # a longer row before every quarantined one shifts them all
+    input_path.write_text(input_path.read_text().replace("Gadget B,5,", "Gadget Beta,5,"))
+
+    result = process_sales_file(str(input_path), str(output_dir), reprocess="input")
+    assert((result.rows, result.valid, result.rejected) == (4, 0, 4))
+    assert({e["line"]: e["raw"] for e in _entries(output_dir)} == before)
+
+def test_reprocess_without_quarantine(tmp_path):
+    """Reprocessing needs an earlier quarantine run."""
+
+    with pytest.raises(exceptions.FileProcessingError):
+        process_sales_file(SAMPLE, str(tmp_path), reprocess="quarantine")
@@ -0,0 +1,36 @@
+import transformer, records
+import datetime, json
+
+def _sales(n, offset=0):
+    """Records over 7 stores and 5 products. Prices are multiples of 1/4 so float sums are exact in any order."""
+
+    day = datetime.date(2024, 1, 15)
+    return [records.SalesRecord(day, f"STORE{i % 7:03d}", f"Widget {i % 5}", i % 3 + 1, (i % 8 + 1) / 4)
+            for i in range(offset, offset + n)]
+
+def _values(aggregations):
+    return {name: a.values for name, a in aggregations.items()}
+
+def test_merged_partials_match_one_pass():
+    """Partials over consecutive slices, merged in any grouping, equal one pass over all the records."""
+
+    whole = transformer.aggregate(_sales(1000))
+    merged = transformer.aggregate(_sales(300))
+    rest = transformer.merge_aggregations(transformer.aggregate(_sales(400, 300)), transformer.aggregate(_sales(300, 700)))
+    transformer.merge_aggregations(merged, rest)
+    assert(_values(merged) == _values(whole))
+    for name, measure in (("by_store", "sales"), ("by_product", "units")):
+        assert(merged[name].top(3, measure) == whole[name].top(3, measure))
+
+def test_round_trip_keeps_ties_in_order():
+    """from_dict(to_dict(a)), through JSON, keeps the values and the order of groups with tied measures."""
+
+    aggregations = transformer.aggregate(_sales(35)) # every store and product ties on count
+    for name, aggregation in aggregations.items():
+        loaded = transformer.Aggregation.from_dict(json.loads(json.dumps(aggregation.to_dict())))
+        assert((loaded.group.name, loaded.group.key, loaded.names) == (name, aggregation.group.key, aggregation.names))
+        assert(loaded.values == aggregation.values and list(loaded.values) == list(aggregation.values))
+    stores = transformer.Aggregation.from_dict(json.loads(json.dumps(aggregations["by_store"].to_dict())))
+    assert(len({count for _, count in stores.top(7, "records")}) == 1)
+    assert(stores.top(3, "records") == aggregations["by_store"].top(3, "records"))
+    assert([key for key, _ in stores.top(3, "records")] == ["STORE000", "STORE001", "STORE002"])
@@ -1,7 +1,204 @@
 import logger
+import heapq, json, operator
 
 logger = logger.setup_logger(__name__, "debug")
 
+class Measure:
+    """
+    One aggregate value per group: "sum" of a record field, or "count" of records.
+    """
+    def __init__(self, name, op, field=None):
+        if op not in ("sum", "count"):
+            raise ValueError(f"Invalid measure op {op}")
+        if op == "sum" and field is None:
+            raise ValueError(f"Measure {name} needs a field to sum")
+        self.name = name
+        self.op = op
+        self.field = field
+
+class GroupBy:
+    """
+    Group records by a key field (None for a single overall group) and
+    compute the given measures for each group.
+    """
+    def __init__(self, name, key, measures):
+        self.name = name
+        self.key = key
+        self.measures = measures
+
+# every aggregate the summary report needs, computed in one scan
+REPORT_SPEC = [
+    GroupBy("totals", None, [Measure("sales", "sum", "total"), Measure("units", "sum", "quantity"), Measure("records", "count")]),
+    GroupBy("by_store", "store_id", [Measure("sales", "sum", "total"), Measure("records", "count")]),
+    GroupBy("by_product", "product", [Measure("units", "sum", "quantity"), Measure("sales", "sum", "total")]),
+]
+
+AGGREGATES_VERSION = 1
+
+class Aggregation:
+    """
+    Running measures for one GroupBy: group key -> list of measure values.
+
+    An Aggregation is a partial state: partials built from different
+    shards, files or days are combined with merge() and can be saved
+    and loaded through to_dict() / from_dict().
+    """
+    def __init__(self, group):
+        self.group = group
+        self.names = [m.name for m in group.measures]
+        self.values = {}
+        self._key = operator.attrgetter(group.key) if group.key else None
+        self._sums = [(i, operator.attrgetter(m.field)) for i, m in enumerate(group.measures) if m.op == "sum"]
+        self._counts = [i for i, m in enumerate(group.measures) if m.op == "count"]
+
+    def add(self, record):
+        """
+        Add one records.SalesRecord.
+        """
+        key = self._key(record) if self._key else None
+        acc = self.values.get(key)
+        if acc is None:
+            acc = self.values[key] = [0] * len(self.names)
+        for i, field in self._sums:
+            acc[i] += field(record)
+        for i in self._counts:
+            acc[i] += 1
+
+    def get(self, key, measure):
+        acc = self.values.get(key)
+        return acc[self.names.index(measure)] if acc else 0
+
+    def as_dict(self, measure):
+        """
+        Returns: Dict mapping group key to one measure
+        """
+        i = self.names.index(measure)
+        return {key: acc[i] for key, acc in self.values.items()}
+
+    def top(self, n, measure):
+        """
+        The n groups with the largest measure, using a heap of size n
+        instead of sorting every group.
+        Returns: List of (key, value), largest first
+        """
+        i = self.names.index(measure)
+        best = heapq.nlargest(n, self.values.items(), key=lambda item: item[1][i])
+        return [(key, acc[i]) for key, acc in best]
+
+    def merge(self, other):
+        """
+        Add another partial for the same GroupBy into this one.
+        Returns: The aggregation itself
+        Raises: ValueError if the two were built from different specs
+        """
+        if self.group.key != other.group.key or self.names != other.names:
+            raise ValueError(f"Cannot merge aggregation {other.group.name} into {self.group.name}")
+        for key, acc in other.values.items():
+            mine = self.values.get(key)
+            if mine is None:
+                self.values[key] = list(acc)
+            else:
+                for i, value in enumerate(acc):
+                    mine[i] += value
+        return self
+
+    def to_dict(self):
+        """
+        Returns: JSON-serializable dict holding the spec and the values
+        """
+        return {
+            "name": self.group.name,
+            "key": self.group.key,
+            "measures": [[m.name, m.op, m.field] for m in self.group.measures],
+            "values": [[key, acc] for key, acc in self.values.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        group = GroupBy(data["name"], data["key"], [Measure(*m) for m in data["measures"]])
+        aggregation = cls(group)
+        aggregation.values = {key: acc for key, acc in data["values"]}
+        return aggregation
+
+def new_aggregations(spec=REPORT_SPEC):
+    """
+    Returns: Dict mapping GroupBy name to an empty Aggregation
+    """
+    return {group.name: Aggregation(group) for group in spec}
+
+def iter_aggregate(records, aggregations):
+    """
+    Add each record to every aggregation and pass it on, so aggregates
+    are built while the records stream to a writer.
+    """
+    targets = list(aggregations.values())
+    for record in records:
+        for aggregation in targets:
+            aggregation.add(record)
+        yield record
+
+def aggregate(records, spec=REPORT_SPEC):
+    """
+    Compute every aggregate in spec in a single pass over records.
+    Returns: Dict mapping GroupBy name to its Aggregation
+    """
+    logger.debug("Aggregating records")
+    aggregations = new_aggregations(spec)
+    for _ in iter_aggregate(records, aggregations):
+        pass
+    return aggregations
+
+def merge_aggregations(target, other):
+    """
+    Merge one result of aggregate() into another, group by group.
+    Returns: target
+    """
+    for name, aggregation in other.items():
+        if name in target:
+            target[name].merge(aggregation)
+        else:
+            target[name] = Aggregation.from_dict(aggregation.to_dict())
+    return target
+
+def save_aggregations(filepath, aggregations):
+    """
+    Write the result of aggregate() to a JSON file so it can be merged later.
+    """
+    logger.debug(f"Saving aggregations to {filepath}")
+    data = {"version": AGGREGATES_VERSION, "groups": [a.to_dict() for a in aggregations.values()]}
+    try:
+        with open(filepath, "w") as f:
+            json.dump(data, f)
+    except OSError as e:
+        logger.error(e)
+        raise
+
+def load_aggregations(filepath):
+    """
+    Read aggregations written by save_aggregations.
+    Returns: Dict mapping GroupBy name to its Aggregation
+    """
+    logger.debug(f"Loading aggregations from {filepath}")
+    try:
+        with open(filepath) as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(e)
+        raise
+    if data.get("version") != AGGREGATES_VERSION:
+        raise ValueError(f"Unsupported aggregates version in {filepath}: {data.get('version')}")
+    return {group["name"]: Aggregation.from_dict(group) for group in data["groups"]}
+
+def combine_saved_aggregations(filepaths):
+    """
+    Load and merge saved aggregations, e.g. a month of daily partials.
+    Returns: Dict mapping GroupBy name to its merged Aggregation
+    """
+    combined = {}
+    for filepath in filepaths:
+        merge_aggregations(combined, load_aggregations(filepath))
+    return combined
+
 def calculate_totals(records):
     """
     Calculate line totals (quantity * price) for each record.
@@ -9,7 +206,7 @@ def calculate_totals(records):
     """
     logger.debug("Calculating line totals")
     for record in records:
-        record["total"] = record["quantity"] * record["price"]
+        record.total = record.quantity * record.price
     return records
 
 def aggregate_by_store(records):
@@ -18,15 +215,8 @@ def aggregate_by_store(records):
     Returns: Dict mapping store_id to total sales
     """
     logger.debug("Calculating store sales data")
-    store_sales = {}
-    for record in records:
-        store_id = record["store_id"]
-        sale_total = record["total"]
-        store_total = store_sales.get(store_id)
-        if store_total == None:
-            store_total = 0
-        store_sales.update({store_id : store_total+sale_total})
-    return store_sales
+    spec = [GroupBy("by_store", "store_id", [Measure("sales", "sum", "total")])]
+    return aggregate(records, spec)["by_store"].as_dict("sales")
 
 def aggregate_by_product(records):
     """
@@ -34,12 +224,5 @@ def aggregate_by_product(records):
     Returns: Dict mapping product to total quantity sold
     """
     logger.debug("Calculating sales by product")
-    product_sales = {}
-    for record in records:
-        product = record["product"]
-        sale_total = record["quantity"]
-        product_total = record.get("product") # returns 0 if product not added yet
-        if product_total == None:
-            product_total = 0
-        product_sales.update({product: sale_total+product_total})
-    return product_sales
\ No newline at end of file
+    spec = [GroupBy("by_product", "product", [Measure("units", "sum", "quantity")])]
+    return aggregate(records, spec)["by_product"].as_dict("units")
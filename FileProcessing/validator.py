@@ -1,94 +1,222 @@
-import logger, exceptions
-import datetime 
+import logger, exceptions, interning, records, error_collector
+import datetime, logging
 
 logger = logger.setup_logger(__name__, "info")
-errors = []
+
+REQUIRED_FIELDS = ("date", "store_id", "product", "quantity", "price")
+
+def _parse_date(value):
+    """
+    Parse a YYYY-MM-DD string.
+    Raises: ValueError if it is not a real date
+    """
+    try:
+        return datetime.date(int(value[:4]), int(value[5:7]), int(value[8:]))
+    except (TypeError, OverflowError) as e:
+        raise ValueError(e)
+
+def _parse_quantity(value):
+    """
+    Parse a positive integer quantity.
+    Raises: ValueError if it is not one
+    """
+    quantity = int(value)
+    if quantity <= 0:
+        raise ValueError(value)
+    return quantity
+
+def _parse_price(value):
+    """
+    Parse a positive price.
+    Raises: ValueError if it is not one
+    """
+    price = float(value)
+    if not price > 0: # also rejects nan
+        raise ValueError(value)
+    return price
+
+_INVALID = object() # cached verdict for a value that failed to parse
+
+def _parse_cached(cache, parse, value):
+    """
+    Parse a value, reusing the result for values seen before.
+    Raises: ValueError if the value (now or earlier) failed to parse
+    """
+    if cache is None:
+        return parse(value)
+    result = cache.get(value)
+    if result is None:
+        try:
+            result = parse(value)
+        except ValueError:
+            result = _INVALID
+        cache.put(value, result)
+    if result is _INVALID:
+        raise ValueError(value)
+    return result
+
+def _check_record(record: dict, line_number, cache=None):
+    """
+    Check a single raw sales record (a dict of strings).
+    cache is an optional interning.ParseCache.
+    Returns: Tuple of (records.SalesRecord or None if invalid, list of errors)
+    """
+    found = []
+    values = [record.get(field, "") for field in REQUIRED_FIELDS]
+    # catch missing fields
+    for field, value in zip(REQUIRED_FIELDS, values):
+        if value == "":
+            found.append(exceptions.MissingFieldError(field))
+    date, store_id, product, quantity, price = values
+
+    # validate date: YYYY-MM-DD
+    if date != "":
+        try:
+            date = _parse_cached(cache and cache.dates, _parse_date, date)
+        except ValueError:
+            found.append(exceptions.InvalidDataError(date, "YYYY-MM-DD", "date"))
+
+    # validate quantity
+    if quantity != "":
+        try:
+            quantity = _parse_cached(cache and cache.quantities, _parse_quantity, quantity)
+        except ValueError:
+            found.append(exceptions.InvalidDataError(quantity, "positive integer", "quantity"))
+
+    # validate price
+    if price != "":
+        try:
+            price = _parse_cached(cache and cache.prices, _parse_price, price)
+        except ValueError:
+            found.append(exceptions.InvalidDataError(price, "positive number", "price"))
+
+    if found:
+        # no per-error logging here: runs count errors, see error_collector
+        for e in found:
+            e.line_number = line_number
+        return None, found
+    return records.SalesRecord(date, store_id, product, quantity, price), found
 
 def validate_sales_record(record: dict, line_number):
     """
     Validate a single sales record.
-    
+
     Required fields: date, store_id, product, quantity, price
     Validation rules:
     - date must be in YYYY-MM-DD format
     - quantity must be a positive integer
     - price must be a positive number
-    
-    Returns: Validated record with converted types
+
+    Returns: Validated record with converted types (records.SalesRecord)
     Raises: InvalidDataError or MissingFieldError
     """
-    # assuming record is passed in as dict
-    date, store_id, product, quantity, price = record["date"], record["store_id"], record["product"], record["quantity"], record["price"]
-    # catch missing fields
-    if date == "":
-        e = exceptions.MissingFieldError("date")
-        logger.warning(e)
-        errors.append(e)
-    if store_id == "":
-        e = exceptions.MissingFieldError("store_id")
-        logger.warning(e)
-        errors.append(e)
-    if product == "":
-        e = exceptions.MissingFieldError("product")
-        logger.warning(e)
-        errors.append(e)
-    if quantity == "":
-        e = exceptions.MissingFieldError("quantity")
-        logger.warning(e)
-        errors.append(e)
-    if price == "":
-        e = exceptions.MissingFieldError("price")
-        logger.warning(e)
-        errors.append(e)
-    # validate date: YYYY-MM-DD
-    # using date object
-    logger.debug(f"Validating date: '{date}'")
-    try:
-        year, month, day = int(date[:4]), int(date[5:7]), int(date[8:])
-        logger.debug(f"Broke into year, month, day: '{year}', '{month}', '{day}'")
-        date = datetime.date(year, month, day)
-    except:
-        e = exceptions.InvalidDataError(date, "YYYY-MM-DD")
-        logger.warning(e)
-        errors.append(e)
-    
-    # validate quantity
-    try:
-        logger.debug(f"Validating quantity: '{quantity}'")
-        quantity = int(quantity)
-        assert(quantity > 0)
-    except ValueError as e:
-        raise exceptions.InvalidDataError(quantity, "positive integer")
-    except exceptions.InvalidDataError as e:
-        logger.error(e)
-        errors.append(e)
-        
+    validated, found = _check_record(record, line_number)
+    if found:
+        raise found[0]
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Record validation completed")
+    return validated
 
-    # validate price
-    try:
-        logger.debug(f"Validating price: '{price}'")
-        price = float(price)
-        assert(price > 0)
-    except ValueError as e:
-        raise exceptions.InvalidDataError(price, "positive number")
-    except exceptions.InvalidDataError as e:
-        logger.error(e)
-        errors.append(e)
-    
-    record["date"], record["store_id"], record["product"], record["quantity"], record["price"] = date, store_id, product, quantity, price
-    logger.debug(f"Record validation completed")
-
-def validate_all_records(records: list):
+class ValidationRun:
+    """
+    Valid records, errors and line numbering for one pass over a file or
+    over one shard of a file.
+
+    A run owns all of its state, so separate runs can be used from
+    several threads or processes at once. Runs over consecutive shards
+    are combined in file order with merge().
+
+    Parsed dates, quantities and prices are cached per distinct value in
+    self.cache (an interning.ParseCache), which readers can also use to
+    intern raw strings through self.cache.values.
+
+    Valid records are kept column-wise in a records.SalesBatch. Errors
+    go to an error_collector.ErrorCollector, which keeps counts and the
+    first max_error_samples errors and passes every error to error_sink.
+    Rejected records themselves go to reject_sink.write(line_number,
+    record, errors) if given (see report_writer.QuarantineWriter).
+    """
+    def __init__(self, cache_size=interning.DEFAULT_MAX_SIZE, max_error_samples=error_collector.DEFAULT_MAX_SAMPLES,
+                 error_sink=None, reject_sink=None):
+        self.cache = interning.ParseCache(cache_size)
+        self.reject_sink = reject_sink
+        self.valid_records = records.SalesBatch()
+        self.errors = error_collector.ErrorCollector(max_error_samples, error_sink)
+        self.lines = 0 # records seen
+        self.rejected = 0 # records with at least one error
+
+    def validate(self, record: dict, line_number=None):
+        """
+        Validate one record, numbering it after the records already seen
+        unless a line number is given.
+        Returns: True if the record is valid
+        """
+        self.lines += 1
+        if line_number is None:
+            line_number = self.lines
+        validated, found = _check_record(record, line_number, self.cache)
+        if found:
+            self.errors.extend(found)
+            self.rejected += 1
+            if self.reject_sink is not None:
+                self.reject_sink.write(line_number, record, found)
+            return False
+        self.valid_records.append(validated)
+        return True
+
+    @property
+    def accepted(self):
+        return self.lines - self.rejected
+
+    def iter_valid(self, raw_records):
+        """
+        Validate records as they stream past and yield the valid ones as
+        SalesRecords, without keeping them in valid_records.
+        """
+        for record in raw_records:
+            self.lines += 1
+            validated, found = _check_record(record, self.lines, self.cache)
+            if found:
+                self.errors.extend(found)
+                self.rejected += 1
+                if self.reject_sink is not None:
+                    self.reject_sink.write(self.lines, record, found)
+            else:
+                yield validated
+
+    def validate_all(self, raw_records):
+        """
+        Validate every record in an iterable.
+        Returns: The run itself
+        """
+        for record in raw_records:
+            self.validate(record)
+        return self
+
+    def merge(self, other):
+        """
+        Append a run over the records that come right after this run's.
+        The other run's sample error line numbers are shifted to file
+        positions, so it should not be used on its own afterwards. Errors
+        the other run sent to its sink are not passed on to this run's.
+        Returns: The run itself
+        """
+        self.valid_records.extend(other.valid_records)
+        self.errors.merge(other.errors, self.lines)
+        self.lines += other.lines
+        self.rejected += other.rejected
+        self.cache.add_counts(other.cache)
+        return self
+
+def validate_all_records(raw_records):
     """
     Validate all records, collecting errors instead of stopping.
-    
-    Returns: Tuple of (valid_records, error_list)
+
+    Returns: Tuple of (valid_records as a records.SalesBatch, errors as an
+    error_collector.ErrorCollector)
     """
-    errors.clear()
     logger.debug("Validating all records")
-    for i in range(len(records)):
-        record = records[i]
-        logger.debug(f"Validating record {record}")
-        validate_sales_record(record, i)
-    logger.info("All records validated")
-    return (records, errors)
\ No newline at end of file
+    run = ValidationRun().validate_all(raw_records)
+    logger.info(f"All records validated: {len(run.valid_records)} valid, {run.rejected} rejected")
+    run.errors.log_summary(logger)
+    return (run.valid_records, run.errors)